@@ -1,15 +1,16 @@
 import sys
-import json
 import re
 import os
+import time
 import threading
 import traceback
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QLineEdit, QPushButton, QTextEdit, 
                              QFileDialog, QProgressBar, QMessageBox, QFrame,
-                             QComboBox, QTabWidget, QRadioButton, QButtonGroup, QStackedWidget)
-from PyQt6.QtCore import Qt, pyqtSignal, QObject
-from PyQt6.QtGui import QDropEvent
+                             QComboBox, QTabWidget, QRadioButton, QButtonGroup, QStackedWidget,
+                             QSpinBox, QCheckBox)
+from PyQt6.QtCore import Qt, pyqtSignal, QObject, QTimer
+from PyQt6.QtGui import QDropEvent, QTextCursor
 
 # 尝试导入 darkdetect 用于系统主题检测
 try:
@@ -30,6 +31,97 @@ try:
 except ImportError:
     ws2_json_handler = None
 
+# 尝试导入 ws2_batch
+try:
+    import ws2_batch
+except ImportError:
+    ws2_batch = None
+
+# 尝试导入 ws2_text_index
+try:
+    import ws2_text_index
+except ImportError:
+    ws2_text_index = None
+
+# 尝试导入 ws2_profile
+try:
+    import ws2_profile
+except ImportError:
+    ws2_profile = None
+
+# 文本搜索最多显示的结果数
+SEARCH_RESULT_LIMIT = 500
+
+# 日志和进度的刷新间隔 (毫秒)；日志区域最多保留的行数
+UI_REFRESH_INTERVAL_MS = 100
+LOG_MAX_LINES = 20000
+
+class JobController:
+    """
+    一次批处理任务的进度和取消状态，由工作线程更新、界面定时读取 (不为每个文件发送信号)。
+    cancel() 后任务在当前文件完成时停止，已提交给进程池但未开始的文件不再处理。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self.total_files = None # None 为总数未知
+        self.total_bytes = 0
+        self.done_files = 0
+        self.done_bytes = 0
+        self.start_time = time.perf_counter()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def begin(self, total_files, total_bytes):
+        with self._lock:
+            self.total_files = total_files
+            self.total_bytes = total_bytes
+            self.done_files = 0
+            self.done_bytes = 0
+            self.start_time = time.perf_counter()
+
+    def advance(self, nbytes):
+        with self._lock:
+            self.done_files += 1
+            self.done_bytes += nbytes
+
+    def progress(self):
+        """返回 (已完成文件数, 文件总数或 None, 已处理字节数, 总字节数, 已用秒数)"""
+        with self._lock:
+            return (self.done_files, self.total_files, self.done_bytes, self.total_bytes,
+                    time.perf_counter() - self.start_time)
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+def format_progress(done_files, total_files, done_bytes, total_bytes, elapsed):
+    """'120/10000 个文件  45.6/380.2 MB  12.3 MB/s  剩余 00:27'"""
+    mb = 1 << 20
+    parts = [f"{done_files}/{total_files} 个文件" if total_files is not None else f"{done_files} 个文件"]
+    if total_bytes:
+        parts.append(f"{done_bytes / mb:.1f}/{total_bytes / mb:.1f} MB")
+    else:
+        parts.append(f"{done_bytes / mb:.1f} MB")
+    if elapsed > 0 and done_bytes:
+        parts.append(f"{done_bytes / mb / elapsed:.1f} MB/s")
+    # 剩余时间按字节估算 (文件大小差别大时比按文件数准确)，没有字节数时按文件数
+    remaining = None
+    if total_bytes and done_bytes:
+        remaining = elapsed * (total_bytes - done_bytes) / done_bytes
+    elif total_files and done_files:
+        remaining = elapsed * (total_files - done_files) / done_files
+    if remaining is not None and done_files < (total_files or 0):
+        parts.append(f"剩余 {format_duration(remaining)}")
+    return "  ".join(parts)
+
 class Logger(QObject):
     log_signal = pyqtSignal(str)
 
@@ -53,27 +145,86 @@ class WorkerThread(QObject):
         self.input_path = input_path
         self.output_path = output_path
         self.kwargs = kwargs
+        self.jobs = kwargs.get('jobs', 1)
+        self.controller = kwargs.get('controller')
+        # 预读深度，0 为不使用预读流水线
+        self.prefetch = kwargs.get('prefetch', 0)
+
+    def find_ws2_files(self, input_path):
+        # 使用预读时目录也并行列出 (网络共享目录)
+        if self.prefetch:
+            return ws2_batch.scan_ws2_files(input_path)
+        return disasm_ws2.find_ws2_files(input_path)
+
+    def new_pipeline(self):
+        return ws2_batch.IOPipeline(jobs=self.jobs, depth=self.prefetch)
+
+    @property
+    def cancelled(self):
+        return self.controller is not None and self.controller.cancelled
 
-    def detect_ws2_summary(self, file_paths):
-        summary = {
+    def track(self, results, paths=None):
+        """
+        转发 run_batch / IOPipeline 的结果并更新进度；paths 为输入文件列表 (用于总数和总字节数)，
+        未知时为 None。请求取消后不再取下一个结果，关闭 results 以停止未开始的文件。
+        """
+        sizes = {}
+        for path in paths or ():
+            try:
+                sizes[path] = os.path.getsize(path)
+            except OSError:
+                sizes[path] = 0
+        if self.controller:
+            self.controller.begin(None if paths is None else len(paths), sum(sizes.values()))
+        try:
+            for result in results:
+                if self.controller:
+                    nbytes = sizes.get(result.task[0])
+                    if nbytes is None:
+                        try:
+                            nbytes = os.path.getsize(result.task[0])
+                        except (OSError, TypeError):
+                            nbytes = 0
+                    self.controller.advance(nbytes)
+                yield result
+                if self.cancelled:
+                    break
+        finally:
+            results.close()
+
+    def new_ws2_summary(self):
+        return {
             'encrypted': 0,
             'decrypted': 0,
             'unknown': 0,
             'detect_failed': 0
         }
 
-        for file_path in file_paths:
-            try:
-                with open(file_path, 'rb') as f:
-                    mode = disasm_ws2.detect_ws2_type(f.read())
-                if mode in summary:
-                    summary[mode] += 1
-                else:
-                    summary['unknown'] += 1
-            except Exception:
-                summary['detect_failed'] += 1
+    def count_ws2_result(self, summary, result):
+        # 加密状态由任务读取文件时顺带检测，失败的任务没有检测结果
+        if summary is None:
+            return
+        if not result.ok:
+            summary['detect_failed'] += 1
+        elif result.value.mode in summary:
+            summary[result.value.mode] += 1
+        else:
+            summary['unknown'] += 1
 
-        return summary
+    def emit_job_output(self, result):
+        # 进程池模式下任务的标准输出被捕获，在此转发到日志
+        if result.output:
+            self.log_signal.emit(result.output.rstrip("\n"))
+
+    def plan_incremental(self, manifest_dir, tasks, describe):
+        """增量构建: 跳过输入和输出设置都未变化的任务，返回 (清单, 需要执行的任务, 对应指纹)"""
+        if not self.kwargs.get('incremental', True):
+            return None, tasks, [None] * len(tasks)
+        manifest = ws2_batch.BuildManifest(manifest_dir)
+        stale_tasks, fingerprints, reused = ws2_batch.split_fresh_tasks(manifest, tasks, describe)
+        if reused:
+            self.log_signal.emit(f"增量构建: 复用 {reused} 个未变化的文件，需要处理 {len(stale_tasks)} 个")
+        return manifest, stale_tasks, fingerprints
 
     def should_warn_mismatch(self, summary):
         encrypted_count = summary.get('encrypted', 0)
@@ -104,16 +255,22 @@ class WorkerThread(QObject):
         if unknown_count > 0:
             detail += f"，未知 {unknown_count}"
         if detect_failed_count > 0:
-            detail += f"，检测失败 {detect_failed_count}"
+            detail += f"，未检测 (任务失败) {detect_failed_count}"
         self.log_signal.emit(detail)
 
         if warn_mismatch and self.should_warn_mismatch(ws2_summary):
             self.log_signal.emit("提示: 当前批次中加密/解密数量差异很大，可能存在自动识别误判，请抽查结果。")
         
     def run(self):
+        profile = None
         try:
             if not disasm_ws2:
                 raise ImportError("找不到 disasm_ws2 模块")
+            if not ws2_batch:
+                raise ImportError("找不到 ws2_batch 模块")
+            if self.kwargs.get('profile') and ws2_profile:
+                profile = ws2_profile.enable()
+                start_time = time.perf_counter()
                 
             if self.mode == 'disasm':
                 self.run_disasm()
@@ -125,11 +282,22 @@ class WorkerThread(QObject):
                 self.run_json_extract()
             elif self.mode == 'json_import':
                 self.run_json_import()
+            elif self.mode == 'search':
+                self.run_search()
         except Exception as e:
             msg = f"发生异常: {str(e)}"
             self.log_signal.emit(msg)
             self.log_signal.emit(traceback.format_exc())
         finally:
+            if profile:
+                ws2_profile.disable()
+                self.log_signal.emit("各环节耗时:")
+                for line in profile.format_table(time.perf_counter() - start_time):
+                    self.log_signal.emit(line)
+            if self.cancelled:
+                done_files, total_files = self.controller.progress()[:2]
+                total_text = "" if total_files is None else f"/{total_files}"
+                self.log_signal.emit(f"任务已取消 (已完成 {done_files}{total_text} 个文件)")
             self.finished.emit()
             
     def run_disasm(self):
@@ -137,7 +305,7 @@ class WorkerThread(QObject):
         mode_map = {'auto': '自动识别', 'encrypted': '强制解密', 'decrypted': '强制跳过解密'}
         display_mode = mode_map.get(enc_mode, enc_mode)
         
-        ws2_files = disasm_ws2.find_ws2_files(self.input_path)
+        ws2_files = self.find_ws2_files(self.input_path)
         if not ws2_files:
             self.log_signal.emit(f"在 {self.input_path} 未找到 .ws2 文件")
             return
@@ -145,23 +313,35 @@ class WorkerThread(QObject):
         total = len(ws2_files)
         success_count = 0
         fail_count = 0
-        ws2_summary = self.detect_ws2_summary(ws2_files) if total > 1 and enc_mode == 'auto' else None
+        ws2_summary = self.new_ws2_summary() if total > 1 and enc_mode == 'auto' else None
         self.log_signal.emit(f"找到 {total} 个 .ws2 文件，开始反汇编 (模式: {display_mode})...")
         
-        for i, file_path in enumerate(ws2_files):
-            self.log_signal.emit(f"[{i+1}/{total}] 处理: {os.path.basename(file_path)}")
-            try:
-                lines = disasm_ws2.disassemble(file_path, encryption_mode=enc_mode)
-                out_path = disasm_ws2.write_disasm(self.output_path, file_path, lines)
-                self.log_signal.emit(f"  -> 输出: {out_path}")
+        pipeline = None
+        if self.prefetch:
+            os.makedirs(self.output_path, exist_ok=True)
+            pipeline = self.new_pipeline()
+            tasks = [(file_path, disasm_ws2.disasm_output_path(self.output_path, file_path), enc_mode)
+                     for file_path in ws2_files]
+            results = pipeline.run(ws2_batch.disasm_transform, tasks)
+        else:
+            tasks = [(file_path, self.output_path, enc_mode) for file_path in ws2_files]
+            results = ws2_batch.run_batch(ws2_batch.disasm_job, tasks, jobs=self.jobs)
+        for result in self.track(results, ws2_files):
+            self.log_signal.emit(f"[{result.index+1}/{total}] 处理: {os.path.basename(result.task[0])}")
+            self.emit_job_output(result)
+            self.count_ws2_result(ws2_summary, result)
+            if result.ok:
+                self.log_signal.emit(f"  -> 输出: {result.value.path}")
                 success_count += 1
-            except Exception as e:
-                self.log_signal.emit(f"  -> 失败: {str(e)}")
-                self.log_signal.emit(traceback.format_exc())
+            else:
+                self.log_signal.emit(f"  -> 失败: {result.error}")
+                self.log_signal.emit(result.traceback)
                 fail_count += 1
                 
         if total > 1:
             self.emit_batch_summary(success_count, fail_count, ws2_summary, warn_mismatch=(enc_mode == 'auto'))
+        if pipeline:
+            self.log_signal.emit(f"吞吐: {pipeline.throughput()}")
         self.log_signal.emit("反汇编任务完成！")
 
     def run_build(self):
@@ -174,49 +354,57 @@ class WorkerThread(QObject):
             files = []
             for root, _, filenames in os.walk(self.input_path):
                 for name in filenames:
-                    if name.lower().endswith(".asm.txt"):
+                    if name.lower().endswith((".asm.txt", ".ws2ir")):
                         files.append(os.path.join(root, name))
                         
         if not files:
-            self.log_signal.emit(f"在 {self.input_path} 未找到 .asm.txt 文件")
+            self.log_signal.emit(f"在 {self.input_path} 未找到 .asm.txt / .ws2ir 文件")
             return
             
         total = len(files)
         success_count = 0
         fail_count = 0
-        self.log_signal.emit(f"找到 {total} 个 .asm.txt 文件，开始构建 (模式: {display_mode})...")
+        self.log_signal.emit(f"找到 {total} 个 .asm.txt / .ws2ir 文件，开始构建 (模式: {display_mode})...")
         
         os.makedirs(self.output_path, exist_ok=True)
         
-        for i, asm_path in enumerate(files):
+        tasks = []
+        for asm_path in files:
             base_name = os.path.basename(asm_path)
-            self.log_signal.emit(f"[{i+1}/{total}] 构建: {base_name}")
-            
-            try:
-                if base_name.lower().endswith(".asm.txt"):
-                    out_name = base_name[:-8] # remove .asm.txt
-                else:
-                    out_name = base_name + ".ws2"
-                    
-                out_ws2_path = os.path.join(self.output_path, out_name)
-                
-                assembled_data = disasm_ws2.assemble_from_asm(asm_path)
-                
-                if build_mode == 'encrypted':
-                    final_data = disasm_ws2.encrypt_ws2(assembled_data)
+            if base_name.lower().endswith(".asm.txt"):
+                out_name = base_name[:-8] # remove .asm.txt
+            elif base_name.lower().endswith(".ws2ir"):
+                out_name = base_name[:-6] + ".ws2"
+            else:
+                out_name = base_name + ".ws2"
+            out_ws2_path = os.path.join(self.output_path, out_name)
+            tasks.append((asm_path, out_ws2_path, build_mode == 'encrypted'))
+        
+        manifest, tasks, fingerprints = self.plan_incremental(
+            self.output_path, tasks,
+            lambda task: ([task[0]], task[1], ['build', task[2]])
+        )
+        
+        try:
+            results = ws2_batch.run_batch(ws2_batch.build_job, tasks, jobs=self.jobs)
+            for result in self.track(results, [task[0] for task in tasks]):
+                self.log_signal.emit(f"[{result.index+1}/{len(tasks)}] 构建: {os.path.basename(result.task[0])}")
+                self.emit_job_output(result)
+                if result.ok:
+                    self.log_signal.emit(f"  -> 生成: {result.value.path}")
+                    success_count += 1
+                    if manifest and fingerprints[result.index]:
+                        manifest.record(result.value.path, fingerprints[result.index])
                 else:
-                    final_data = assembled_data
-                
-                with open(out_ws2_path, "wb") as f:
-                    f.write(final_data)
-                    
-                self.log_signal.emit(f"  -> 生成: {out_ws2_path}")
-                success_count += 1
-            except Exception as e:
-                self.log_signal.emit(f"  -> 失败: {str(e)}")
-                fail_count += 1
+                    self.log_signal.emit(f"  -> 失败: {result.error}")
+                    fail_count += 1
+        finally:
+            if manifest:
+                manifest.save()
                 
         if total > 1:
+            if total > len(tasks):
+                self.log_signal.emit(f"复用: {total - len(tasks)} 个文件未变化，已跳过")
             self.log_signal.emit(f"汇总: 成功 {success_count}，失败 {fail_count}")
         self.log_signal.emit("构建任务完成！")
 
@@ -227,7 +415,7 @@ class WorkerThread(QObject):
         if os.path.isfile(self.input_path):
             files = [self.input_path]
         else:
-            files = disasm_ws2.find_ws2_files(self.input_path)
+            files = self.find_ws2_files(self.input_path)
             
         if not files:
             self.log_signal.emit(f"在 {self.input_path} 未找到 .ws2 文件")
@@ -236,21 +424,38 @@ class WorkerThread(QObject):
         total = len(files)
         success_count = 0
         fail_count = 0
-        ws2_summary = self.detect_ws2_summary(files) if total > 1 else None
+        ws2_summary = self.new_ws2_summary() if total > 1 else None
+        # 只有需要汇总加密状态时才让任务检测输入，单个文件直接加解密
+        detect = ws2_summary is not None
         self.log_signal.emit(f"找到 {total} 个文件，开始{display_mode}...")
         
-        for i, file_path in enumerate(files):
-            self.log_signal.emit(f"[{i+1}/{total}] {display_mode}: {os.path.basename(file_path)}")
-            try:
-                out_path = disasm_ws2.process_file_encryption(file_path, self.output_path, tool_mode)
-                self.log_signal.emit(f"  -> 输出: {out_path}")
+        in_place = self.kwargs.get('in_place', False)
+        start_time = time.perf_counter()
+        total_bytes = 0
+        # 原地覆盖需要临时文件 + 原子替换，不使用预读流水线
+        if self.prefetch and not in_place:
+            os.makedirs(self.output_path, exist_ok=True)
+            tasks = [(file_path, disasm_ws2.encryption_output_path(self.output_path, file_path), tool_mode, detect)
+                     for file_path in files]
+            results = self.new_pipeline().run(ws2_batch.crypto_transform, tasks)
+        else:
+            tasks = [(file_path, self.output_path, tool_mode, in_place, detect) for file_path in files]
+            results = ws2_batch.run_batch(ws2_batch.crypto_job, tasks, jobs=self.jobs)
+        for result in self.track(results, files):
+            self.log_signal.emit(f"[{result.index+1}/{total}] {display_mode}: {os.path.basename(result.task[0])}")
+            self.emit_job_output(result)
+            self.count_ws2_result(ws2_summary, result)
+            if result.ok:
+                self.log_signal.emit(f"  -> 输出: {result.value.path}")
+                total_bytes += os.path.getsize(result.value.path)
                 success_count += 1
-            except Exception as e:
-                self.log_signal.emit(f"  -> 失败: {str(e)}")
+            else:
+                self.log_signal.emit(f"  -> 失败: {result.error}")
                 fail_count += 1
         
         if total > 1:
             self.emit_batch_summary(success_count, fail_count, ws2_summary)
+        self.log_signal.emit(f"吞吐: {ws2_batch.format_throughput(total_bytes, time.perf_counter() - start_time)}")
         self.log_signal.emit(f"{display_mode}任务完成！")
 
     def run_json_extract(self):
@@ -260,7 +465,7 @@ class WorkerThread(QObject):
         if os.path.isfile(self.input_path):
             files = [self.input_path]
         else:
-            files = disasm_ws2.find_ws2_files(self.input_path)
+            files = self.find_ws2_files(self.input_path)
             
         if not files:
             self.log_signal.emit(f"在 {self.input_path} 未找到 .ws2 文件")
@@ -269,44 +474,142 @@ class WorkerThread(QObject):
         total = len(files)
         success_count = 0
         fail_count = 0
-        ws2_summary = self.detect_ws2_summary(files) if total > 1 else None
-        self.log_signal.emit(f"找到 {total} 个文件，开始提取 JSON...")
+        ws2_summary = self.new_ws2_summary() if total > 1 else None
+        dedup = self.kwargs.get('dedup', False)
+        self.log_signal.emit(f"找到 {total} 个文件，开始提取 JSON{' (去重导出)' if dedup else ''}...")
         
+        if os.path.isdir(self.input_path) and self.output_path.lower().endswith(ws2_json_handler.MERGED_JSONL_SUFFIX):
+            self.run_merged_extract(files, dedup, ws2_summary)
+            return
+            
         # 假设 output_path 是目录
         is_output_dir = not self.output_path.lower().endswith(".json")
         if is_output_dir:
             os.makedirs(self.output_path, exist_ok=True)
             
-        for i, file_path in enumerate(files):
-            self.log_signal.emit(f"[{i+1}/{total}] 提取: {os.path.basename(file_path)}")
-            try:
-                entries = ws2_json_handler.extract_text_from_ws2(file_path)
-                
-                # 决定输出文件名
-                if total == 1 and not is_output_dir:
-                    out_json_path = self.output_path
+        tasks = []
+        for file_path in files:
+            # 决定输出文件名
+            if total == 1 and not is_output_dir:
+                out_json_path = self.output_path
+            else:
+                base_name = os.path.basename(file_path)
+                if base_name.lower().endswith(".ws2"):
+                    json_name = base_name[:-4] + ".json"
                 else:
-                    base_name = os.path.basename(file_path)
-                    if base_name.lower().endswith(".ws2"):
-                        json_name = base_name[:-4] + ".json"
-                    else:
-                        json_name = base_name + ".json"
-                    out_json_path = os.path.join(self.output_path, json_name)
-                    
-                with open(out_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(entries, f, ensure_ascii=False, indent=2)
-                    
-                self.log_signal.emit(f"  -> 生成: {out_json_path}")
+                    json_name = base_name + ".json"
+                out_json_path = os.path.join(self.output_path, json_name)
+            tasks.append((file_path, out_json_path, 'auto', dedup))
+            
+        strings = {}
+        pipeline = None
+        if self.prefetch:
+            pipeline = self.new_pipeline()
+            results = pipeline.run(ws2_batch.json_extract_transform, tasks)
+        else:
+            results = ws2_batch.run_batch(ws2_batch.json_extract_job, tasks, jobs=self.jobs)
+        for result in self.track(results, files):
+            self.log_signal.emit(f"[{result.index+1}/{total}] 提取: {os.path.basename(result.task[0])}")
+            self.emit_job_output(result)
+            self.count_ws2_result(ws2_summary, result)
+            if result.ok:
+                self.log_signal.emit(f"  -> 生成: {result.value.path}")
+                if result.value.strings:
+                    ws2_json_handler.merge_strings(strings, result.value.strings)
                 success_count += 1
-            except Exception as e:
-                self.log_signal.emit(f"  -> 失败: {str(e)}")
-                self.log_signal.emit(traceback.format_exc())
+            else:
+                self.log_signal.emit(f"  -> 失败: {result.error}")
+                self.log_signal.emit(result.traceback)
                 fail_count += 1
                 
+        if dedup:
+            table_path = ws2_json_handler.string_table_path(tasks[0][1])
+            added = ws2_json_handler.write_string_table(table_path, strings)
+            self.log_signal.emit(f"字符串表: {table_path} (共 {len(strings)} 条不重复文本，新增 {added} 条)")
+            
         if total > 1:
             self.emit_batch_summary(success_count, fail_count, ws2_summary)
+        if pipeline:
+            self.log_signal.emit(f"吞吐: {pipeline.throughput()}")
         self.log_signal.emit("JSON 提取任务完成！")
 
+    def run_merged_extract(self, files, dedup, ws2_summary):
+        """目录 -> 单个合并 .jsonl，每个脚本一行"""
+        total = len(files)
+        success_count = 0
+        fail_count = 0
+        out_dir = os.path.dirname(os.path.abspath(self.output_path))
+        os.makedirs(out_dir, exist_ok=True)
+        
+        strings = {}
+        results = ws2_batch.run_merged_extract(files, self.input_path, self.output_path, jobs=self.jobs, dedup=dedup)
+        for result in self.track(results, files):
+            self.log_signal.emit(f"[{result.index+1}/{total}] 提取: {result.task[1]}")
+            self.emit_job_output(result)
+            self.count_ws2_result(ws2_summary, result)
+            if result.ok:
+                if result.value.strings:
+                    ws2_json_handler.merge_strings(strings, result.value.strings)
+                success_count += 1
+            else:
+                self.log_signal.emit(f"  -> 失败: {result.error}")
+                self.log_signal.emit(result.traceback)
+                fail_count += 1
+        if self.cancelled:
+            # 未全部完成时不替换合并 JSON
+            self.log_signal.emit(f"已取消，未写出合并 JSON: {self.output_path}")
+            return
+        self.log_signal.emit(f"合并 JSON: {self.output_path}")
+        
+        if dedup:
+            table_path = ws2_json_handler.string_table_path(self.output_path)
+            added = ws2_json_handler.write_string_table(table_path, strings)
+            self.log_signal.emit(f"字符串表: {table_path} (共 {len(strings)} 条不重复文本，新增 {added} 条)")
+            
+        if total > 1:
+            self.emit_batch_summary(success_count, fail_count, ws2_summary)
+        self.log_signal.emit("JSON 提取任务完成！")
+
+    def run_merged_import(self, json_input, build_mode):
+        """目录 + 单个合并 JSON -> 目录，边读取合并 JSON 边分发每个脚本的导入任务"""
+        os.makedirs(self.output_path, exist_ok=True)
+        manifest = ws2_batch.BuildManifest(self.output_path) if self.kwargs.get('incremental', True) else None
+        plan = ws2_batch.MergedImport(self.input_path, json_input, self.output_path,
+                                      output_encrypt_mode=build_mode, manifest=manifest)
+        success_count = 0
+        fail_count = 0
+        ws2_summary = self.new_ws2_summary()
+        self.log_signal.emit(f"从合并 JSON 导入: {os.path.basename(json_input)}")
+        
+        try:
+            results = ws2_batch.run_batch(ws2_batch.json_import_section_job, plan.tasks(), jobs=self.jobs)
+            for result in self.track(results):
+                self.log_signal.emit(f"[{result.index+1}] 导入: {os.path.relpath(result.task[0], self.input_path)}")
+                self.emit_job_output(result)
+                self.count_ws2_result(ws2_summary, result)
+                if result.ok:
+                    self.log_signal.emit(f"  -> 生成: {result.value.path}")
+                    success_count += 1
+                    if manifest:
+                        manifest.record(result.value.path, plan.fingerprints[result.value.path])
+                else:
+                    self.log_signal.emit(f"  -> 失败: {result.error}")
+                    self.log_signal.emit(result.traceback)
+                    fail_count += 1
+        finally:
+            if manifest:
+                manifest.save()
+                
+        for key in plan.missing:
+            self.log_signal.emit(f"警告: 合并 JSON 中没有脚本 {key} 的文本 (跳过)")
+        for key in plan.extra:
+            self.log_signal.emit(f"警告: 合并 JSON 中的 {key} 找不到对应的 WS2 文件 (忽略)")
+        if plan.reused:
+            self.log_signal.emit(f"复用: {plan.reused} 个文件未变化，已跳过")
+        self.log_signal.emit(f"缺少文本: {len(plan.missing)} 个脚本，多余文本: {len(plan.extra)} 节")
+        self.emit_batch_summary(success_count, fail_count, ws2_summary)
+        self.log_signal.emit("JSON 导入任务完成！")
+
     def run_json_import(self):
         if not ws2_json_handler:
             raise ImportError("找不到 ws2_json_handler 模块")
@@ -337,7 +640,8 @@ class WorkerThread(QObject):
         else:
             # 目录模式
             if not os.path.isdir(json_input):
-                self.log_signal.emit("错误: WS2 是目录，但 JSON 是文件")
+                # 合并 JSON: 整个目录的文本在一个文件中
+                self.run_merged_import(json_input, build_mode)
                 return
                 
             os.makedirs(self.output_path, exist_ok=True)
@@ -363,29 +667,72 @@ class WorkerThread(QObject):
         total = len(tasks)
         success_count = 0
         fail_count = 0
-        ws2_summary = self.detect_ws2_summary([ws for ws, _, _ in tasks]) if total > 1 else None
         if total == 0:
             self.log_signal.emit("未找到匹配的 WS2 和 JSON 文件对")
             return
             
         self.log_signal.emit(f"找到 {total} 个匹配任务，开始导入 JSON...")
         
-        for i, (ws, js, out) in enumerate(tasks):
-            self.log_signal.emit(f"[{i+1}/{total}] 导入: {os.path.basename(ws)} + {os.path.basename(js)}")
-            try:
-                # 传递 output_encrypt_mode 以便根据 GUI 设置决定是否加密输出
-                ws2_json_handler.import_text_to_ws2(ws, js, out, output_encrypt_mode=build_mode)
-                self.log_signal.emit(f"  -> 生成: {out}")
-                success_count += 1
-            except Exception as e:
-                self.log_signal.emit(f"  -> 失败: {str(e)}")
-                self.log_signal.emit(traceback.format_exc())
-                fail_count += 1
+        # 传递 output_encrypt_mode 以便根据 GUI 设置决定是否加密输出
+        job_tasks = [(ws, js, out, build_mode) for ws, js, out in tasks]
+        manifest_dir = os.path.dirname(os.path.abspath(job_tasks[0][2])) if os.path.isfile(ws2_input) else self.output_path
+        manifest, job_tasks, fingerprints = self.plan_incremental(
+            manifest_dir, job_tasks,
+            lambda task: (ws2_batch.json_import_inputs(task[0], task[1]), task[2], ['json_import', task[3]])
+        )
+        ws2_summary = self.new_ws2_summary() if len(job_tasks) > 1 else None
+        
+        try:
+            results = ws2_batch.run_batch(ws2_batch.json_import_job, job_tasks, jobs=self.jobs)
+            for result in self.track(results, [task[0] for task in job_tasks]):
+                ws, js, _, _ = result.task
+                self.log_signal.emit(f"[{result.index+1}/{len(job_tasks)}] 导入: {os.path.basename(ws)} + {os.path.basename(js)}")
+                self.emit_job_output(result)
+                self.count_ws2_result(ws2_summary, result)
+                if result.ok:
+                    self.log_signal.emit(f"  -> 生成: {result.value.path}")
+                    success_count += 1
+                    if manifest and fingerprints[result.index]:
+                        manifest.record(result.value.path, fingerprints[result.index])
+                else:
+                    self.log_signal.emit(f"  -> 失败: {result.error}")
+                    self.log_signal.emit(result.traceback)
+                    fail_count += 1
+        finally:
+            if manifest:
+                manifest.save()
                 
         if total > 1:
+            if total > len(job_tasks):
+                self.log_signal.emit(f"复用: {total - len(job_tasks)} 个文件未变化，已跳过")
             self.emit_batch_summary(success_count, fail_count, ws2_summary)
         self.log_signal.emit("JSON 导入任务完成！")
 
+    def run_search(self):
+        if not ws2_text_index:
+            raise ImportError("找不到 ws2_text_index 模块")
+
+        if not os.path.isdir(self.input_path):
+            self.log_signal.emit(f"错误: 搜索目录不存在: {self.input_path}")
+            return
+
+        query = self.kwargs.get('query', '')
+        speaker = self.kwargs.get('speaker') or None
+
+        with ws2_text_index.TextIndex(self.input_path) as index:
+            self.log_signal.emit("更新文本索引...")
+            stats = index.update(jobs=self.jobs)
+            for path, error in stats.failed:
+                self.log_signal.emit(f"  -> 索引失败 {os.path.basename(path)}: {error}")
+            self.log_signal.emit(f"索引: 更新 {stats.indexed}，未变化 {stats.reused}，移除 {stats.removed}，失败 {len(stats.failed)}")
+            hits = index.search(query, speaker=speaker, limit=SEARCH_RESULT_LIMIT)
+
+        for hit in hits:
+            self.log_signal.emit(ws2_text_index.format_hit(hit))
+        if len(hits) >= SEARCH_RESULT_LIMIT:
+            self.log_signal.emit(f"结果过多，只显示前 {SEARCH_RESULT_LIMIT} 条")
+        self.log_signal.emit(f"搜索完成，找到 {len(hits)} 条结果")
+
 class DragDropLineEdit(QLineEdit):
     file_dropped = pyqtSignal(str)
 
@@ -423,9 +770,18 @@ class WS2ToolkitGUI(QWidget):
         
         self.init_ui()
         
+        # 日志先放入缓冲区，由定时器批量写入日志区域 (大批量任务时不为每行刷新界面)
+        self.controller = None
+        self.pending_log = []
+        self.pending_log_lock = threading.Lock()
+        self.ui_timer = QTimer(self)
+        self.ui_timer.setInterval(UI_REFRESH_INTERVAL_MS)
+        self.ui_timer.timeout.connect(self.refresh_status)
+        self.ui_timer.start()
+        
         # 重定向 stdout
         self.logger = Logger()
-        self.logger.log_signal.connect(self.append_log)
+        self.logger.log_signal.connect(self.append_log, Qt.ConnectionType.DirectConnection)
         sys.stdout = self.logger
         sys.stderr = self.logger
         
@@ -453,6 +809,26 @@ class WS2ToolkitGUI(QWidget):
         header_layout.addWidget(QLabel("主题:"))
         header_layout.addWidget(self.theme_combo)
         
+        # 并行进程数 (1 为顺序处理)
+        self.jobs_spin = QSpinBox()
+        self.jobs_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.jobs_spin.setValue(1)
+        self.jobs_spin.setToolTip("批量任务使用的并行进程数，1 为顺序处理")
+        header_layout.addWidget(QLabel("并行进程:"))
+        header_layout.addWidget(self.jobs_spin)
+        
+        # 预读深度 (0 为关闭): 读取后续文件、写出已完成的文件与解码并行，适合网络共享目录
+        self.prefetch_spin = QSpinBox()
+        self.prefetch_spin.setRange(0, 64)
+        self.prefetch_spin.setValue(0)
+        self.prefetch_spin.setToolTip("反汇编、加密/解密 (非原地) 和 JSON 提取时预读的文件数，0 为关闭；适合网络共享目录")
+        header_layout.addWidget(QLabel("预读:"))
+        header_layout.addWidget(self.prefetch_spin)
+        
+        self.profile_check = QCheckBox("耗时统计")
+        self.profile_check.setToolTip("任务结束时在日志中输出读取/检测/解密/解码/写出等各环节的耗时汇总")
+        header_layout.addWidget(self.profile_check)
+        
         main_layout.addLayout(header_layout)
         
         # --- 标签页 ---
@@ -473,6 +849,11 @@ class WS2ToolkitGUI(QWidget):
         tools_tab = QWidget()
         self.setup_tools_tab(tools_tab)
         self.tabs.addTab(tools_tab, "WS2加解密 (WS2 Crypto)")
+
+        # --- 搜索标签页 ---
+        search_tab = QWidget()
+        self.setup_search_tab(search_tab)
+        self.tabs.addTab(search_tab, "文本搜索 (Search)")
         
         # --- 日志区域 ---
         log_label = QLabel("日志:")
@@ -483,11 +864,24 @@ class WS2ToolkitGUI(QWidget):
         self.log_text.setObjectName("LogConsole")
         main_layout.addWidget(self.log_text)
         
-        # 状态栏
+        self.log_text.document().setMaximumBlockCount(LOG_MAX_LINES)
+        
+        # 状态栏: 进度条 (文件总数未知时为不确定进度)、进度/剩余时间、取消按钮
+        self.status_widget = QWidget()
+        status_layout = QHBoxLayout()
+        status_layout.setContentsMargins(0, 0, 0, 0)
+        self.status_widget.setLayout(status_layout)
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 0) # 不确定进度模式
-        self.progress_bar.hide()
-        main_layout.addWidget(self.progress_bar)
+        status_layout.addWidget(self.progress_bar, 1)
+        self.progress_label = QLabel("")
+        status_layout.addWidget(self.progress_label)
+        self.btn_cancel = ModernButton("取消")
+        self.btn_cancel.setToolTip("当前文件完成后停止任务")
+        self.btn_cancel.clicked.connect(self.cancel_worker)
+        status_layout.addWidget(self.btn_cancel)
+        self.status_widget.hide()
+        main_layout.addWidget(self.status_widget)
 
     def setup_extract_tab(self, tab):
         layout = QVBoxLayout()
@@ -508,11 +902,13 @@ class WS2ToolkitGUI(QWidget):
         self.extract_mode_combo = QComboBox()
         self.extract_mode_combo.addItems(["自动识别 (Auto)", "已加密 (Encrypted)", "未加密 (Decrypted)"])
         opts_layout.addWidget(self.extract_mode_combo)
+        self.extract_dedup_check = QCheckBox("去重导出 (重复文本写入共享 strings.json)")
+        opts_layout.addWidget(self.extract_dedup_check)
         opts_layout.addStretch()
         layout.addLayout(opts_layout)
 
         # 输出
-        self.extract_output_edit = self.create_file_selector(layout, "输出目录:", is_input=False)
+        self.extract_output_edit = self.create_file_selector(layout, "输出目录 (填写 .jsonl 文件则合并为一个文件):", is_input=False)
         
         layout.addSpacing(20)
         
@@ -563,6 +959,10 @@ class WS2ToolkitGUI(QWidget):
         self.build_mode_combo = QComboBox()
         self.build_mode_combo.addItems(["加密输出 (Encrypted)", "不加密 (Decrypted)"])
         common_layout.addWidget(self.build_mode_combo)
+        
+        self.build_incremental_check = QCheckBox("增量构建 (跳过未变化的文件)")
+        self.build_incremental_check.setChecked(True)
+        common_layout.addWidget(self.build_incremental_check)
         common_layout.addStretch()
         
         layout.addWidget(common_group)
@@ -679,6 +1079,9 @@ class WS2ToolkitGUI(QWidget):
         # 输出
         self.tool_output_edit = self.create_file_selector(layout, "输出目录:", is_input=False)
         
+        self.tool_in_place_check = QCheckBox("原地处理 (直接覆盖输入文件，忽略输出目录)")
+        layout.addWidget(self.tool_in_place_check)
+        
         layout.addSpacing(10)
         
         # 按钮
@@ -687,6 +1090,40 @@ class WS2ToolkitGUI(QWidget):
         layout.addWidget(self.btn_tool)
         layout.addStretch()
 
+    def setup_search_tab(self, tab):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(15, 15, 15, 15)
+        tab.setLayout(layout)
+        
+        # 搜索范围
+        self.search_dir_edit = self.create_file_selector(layout, "WS2 目录:", is_input=False)
+        
+        # 搜索条件
+        query_layout = QHBoxLayout()
+        query_layout.addWidget(QLabel("搜索文本:"))
+        self.search_query_edit = QLineEdit()
+        self.search_query_edit.setPlaceholderText("输入台词、选项或名字的一部分...")
+        self.search_query_edit.returnPressed.connect(self.run_search)
+        query_layout.addWidget(self.search_query_edit)
+        query_layout.addWidget(QLabel("说话人:"))
+        self.search_speaker_edit = QLineEdit()
+        self.search_speaker_edit.setPlaceholderText("可选")
+        self.search_speaker_edit.returnPressed.connect(self.run_search)
+        query_layout.addWidget(self.search_speaker_edit)
+        layout.addLayout(query_layout)
+        
+        desc_label = QLabel("说明: 首次搜索会为目录建立索引 (.ws2_text_index.sqlite3)，之后只重新索引有变化的文件。结果输出到日志。")
+        desc_label.setWordWrap(True)
+        layout.addWidget(desc_label)
+        
+        layout.addSpacing(10)
+        
+        # 按钮
+        self.btn_search = ModernButton("搜索", is_primary=True)
+        self.btn_search.clicked.connect(self.run_search)
+        layout.addWidget(self.btn_search)
+        layout.addStretch()
+
     def setup_json_tab(self, tab):
         pass
 
@@ -788,18 +1225,20 @@ class WS2ToolkitGUI(QWidget):
         mode_idx = self.build_mode_combo.currentIndex()
         mode_key = ['encrypted', 'decrypted'][mode_idx]
             
-        self.start_worker('build', input_path, output_path, build_mode=mode_key)
+        self.start_worker('build', input_path, output_path, build_mode=mode_key,
+                          incremental=self.build_incremental_check.isChecked())
 
     def run_tool(self):
         input_path = self.tool_input_edit.text().strip()
         output_path = self.tool_output_edit.text().strip()
+        in_place = self.tool_in_place_check.isChecked()
         
-        if not input_path or not output_path:
+        if not input_path or (not output_path and not in_place):
             QMessageBox.warning(self, "提示", "请选择输入和输出路径")
             return
             
         mode_key = 'decrypt' if self.tool_radio_decrypt.isChecked() else 'encrypt'
-        self.start_worker('tool', input_path, output_path, tool_mode=mode_key)
+        self.start_worker('tool', input_path, output_path, tool_mode=mode_key, in_place=in_place)
 
     def run_json_extract(self):
         input_path = self.extract_input_edit.text().strip()
@@ -812,7 +1251,8 @@ class WS2ToolkitGUI(QWidget):
         mode_idx = self.extract_mode_combo.currentIndex()
         mode_key = ['auto', 'encrypted', 'decrypted'][mode_idx]
         
-        self.start_worker('json_extract', input_path, output_path, disasm_mode=mode_key)
+        self.start_worker('json_extract', input_path, output_path, disasm_mode=mode_key,
+                          dedup=self.extract_dedup_check.isChecked())
 
     def run_json_import(self):
         ws2_input = self.json_imp_ws2_edit.text().strip()
@@ -826,12 +1266,39 @@ class WS2ToolkitGUI(QWidget):
         mode_idx = self.build_mode_combo.currentIndex()
         mode_key = ['encrypted', 'decrypted'][mode_idx]
             
-        self.start_worker('json_import', ws2_input, output_path, json_input=json_input, build_mode=mode_key)
+        self.start_worker('json_import', ws2_input, output_path, json_input=json_input, build_mode=mode_key,
+                          incremental=self.build_incremental_check.isChecked())
+
+    def run_search(self):
+        if not self.btn_search.isEnabled():
+            return
+        search_dir = self.search_dir_edit.text().strip()
+        query = self.search_query_edit.text().strip()
+        speaker = self.search_speaker_edit.text().strip()
+        
+        if not search_dir:
+            QMessageBox.warning(self, "提示", "请选择要搜索的 WS2 目录")
+            return
+        if not query and not speaker:
+            QMessageBox.warning(self, "提示", "请输入搜索文本或说话人")
+            return
+            
+        self.start_worker('search', search_dir, "", query=query, speaker=speaker)
 
     def start_worker(self, mode, input_path, output_path, **kwargs):
         self.set_ui_enabled(False)
-        self.progress_bar.show()
+        self.refresh_status()
         self.log_text.clear()
+        self.controller = JobController()
+        self.progress_bar.setRange(0, 0)
+        self.progress_label.setText("")
+        # 文本搜索只有一步索引更新，不支持中途取消
+        self.btn_cancel.setEnabled(mode != 'search')
+        self.status_widget.show()
+        kwargs.setdefault('controller', self.controller)
+        kwargs.setdefault('jobs', self.jobs_spin.value())
+        kwargs.setdefault('prefetch', self.prefetch_spin.value())
+        kwargs.setdefault('profile', self.profile_check.isChecked())
         
         self.thread = threading.Thread(target=self.worker_target, args=(mode, input_path, output_path), kwargs=kwargs)
         self.thread.daemon = True
@@ -839,14 +1306,26 @@ class WS2ToolkitGUI(QWidget):
         
     def worker_target(self, mode, input_path, output_path, **kwargs):
         worker = WorkerThread(mode, input_path, output_path, **kwargs)
-        worker.log_signal.connect(self.append_log)
+        worker.log_signal.connect(self.append_log, Qt.ConnectionType.DirectConnection)
         worker.finished.connect(self.on_finished)
         worker.run()
 
+    def cancel_worker(self):
+        if self.controller:
+            self.controller.cancel()
+            self.btn_cancel.setEnabled(False)
+            self.progress_label.setText(self.progress_label.text() + "  正在取消...")
+
     def on_finished(self):
-        self.progress_bar.hide()
+        self.refresh_status()
+        cancelled = self.controller.cancelled
+        self.controller = None
+        self.status_widget.hide()
         self.set_ui_enabled(True)
-        QMessageBox.information(self, "完成", "任务已完成")
+        if cancelled:
+            QMessageBox.information(self, "已取消", "任务已取消")
+        else:
+            QMessageBox.information(self, "完成", "任务已完成")
 
     def set_ui_enabled(self, enabled):
         self.btn_disasm.setEnabled(enabled)
@@ -854,6 +1333,10 @@ class WS2ToolkitGUI(QWidget):
         self.btn_tool.setEnabled(enabled)
         self.btn_json_extract.setEnabled(enabled)
         self.btn_json_import.setEnabled(enabled)
+        self.btn_search.setEnabled(enabled)
+        self.jobs_spin.setEnabled(enabled)
+        self.prefetch_spin.setEnabled(enabled)
+        self.profile_check.setEnabled(enabled)
         self.extract_input_edit.setEnabled(enabled)
         self.build_asm_input_edit.setEnabled(enabled)
         self.tool_input_edit.setEnabled(enabled)
@@ -861,7 +1344,36 @@ class WS2ToolkitGUI(QWidget):
         self.json_imp_json_edit.setEnabled(enabled)
 
     def append_log(self, text):
-        self.log_text.append(text)
+        # 可能在工作线程中调用，只放入缓冲区
+        with self.pending_log_lock:
+            self.pending_log.append(text)
+
+    def refresh_status(self):
+        """定时器回调: 写入缓冲的日志，更新进度条和进度文字"""
+        with self.pending_log_lock:
+            lines, self.pending_log = self.pending_log, []
+        if lines:
+            # 以纯文本一次插入整批日志，日志区域原本在底部时保持滚动到底部
+            scroll_bar = self.log_text.verticalScrollBar()
+            at_bottom = scroll_bar.value() >= scroll_bar.maximum()
+            cursor = QTextCursor(self.log_text.document())
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            text = "\n".join(lines)
+            cursor.insertText(text if self.log_text.document().isEmpty() else "\n" + text)
+            if at_bottom:
+                scroll_bar.setValue(scroll_bar.maximum())
+
+        if self.controller is None:
+            return
+        done_files, total_files, done_bytes, total_bytes, elapsed = self.controller.progress()
+        if total_files is not None:
+            self.progress_bar.setRange(0, max(1, total_files))
+            self.progress_bar.setValue(done_files)
+        if total_files is not None or done_files:
+            text = format_progress(done_files, total_files, done_bytes, total_bytes, elapsed)
+            if self.controller.cancelled:
+                text += "  正在取消..."
+            self.progress_label.setText(text)
         
     def detect_system_theme(self):
         self.theme_combo.setCurrentText("跟随系统")
@@ -892,7 +1404,7 @@ class WS2ToolkitGUI(QWidget):
         QTabBar::tab:selected { background: #ffffff; color: #3498db; font-weight: bold; }
         QTextEdit#LogConsole { background-color: #fcfcfc; color: #333333; border: 1px solid #e1e4e8; font-family: 'Consolas', monospace; font-size: 9pt; }
         QWidget#LogHeader { background-color: #f1f1f1; border-bottom: 1px solid #ddd; }
-        QComboBox { padding: 4px; color: #333; background: #fff; border: 1px solid #ced4da; border-radius: 4px; }
+        QComboBox, QSpinBox { padding: 4px; color: #333; background: #fff; border: 1px solid #ced4da; border-radius: 4px; }
         """
         
         dark_qss = """
@@ -912,7 +1424,7 @@ class WS2ToolkitGUI(QWidget):
         QTabBar::tab:selected { background: #2d2d2d; color: #bb86fc; font-weight:bold; }
         QTextEdit#LogConsole { background-color: #1a1a1a; color: #e0e0e0; border: 1px solid #444; font-family: 'Consolas', monospace; font-size: 9pt; }
         QWidget#LogHeader { background-color: #252525; border-bottom: 1px solid #444; }
-        QComboBox { padding: 4px; color: #e0e0e0; background: #333; border: 1px solid #555; border-radius: 4px; }
+        QComboBox, QSpinBox { padding: 4px; color: #e0e0e0; background: #333; border: 1px solid #555; border-radius: 4px; }
         QComboBox QAbstractItemView { background-color: #2d2d2d; color: #e0e0e0; selection-background-color: #bb86fc; selection-color: #121212; }
         """
 
@@ -930,7 +1442,7 @@ class WS2ToolkitGUI(QWidget):
         QTabBar::tab:selected { color: #00ffcc; border: 1px solid #00ffcc; }
         QTextEdit#LogConsole { background-color: #0f0f1f; color: #00ffcc; border: 1px solid #00ffcc; }
         QWidget#LogHeader { background-color: #121225; border-bottom: 1px solid #00ffcc; }
-        QComboBox { background: #0d0d15; color: #00ffcc; border: 1px solid #00ffcc; }
+        QComboBox, QSpinBox { background: #0d0d15; color: #00ffcc; border: 1px solid #00ffcc; }
         QComboBox QAbstractItemView { background-color: #0d0d15; color: #00ffcc; selection-background-color: #ff0055; }
         """
         
@@ -942,6 +1454,8 @@ class WS2ToolkitGUI(QWidget):
             self.setStyleSheet(light_qss)
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = WS2ToolkitGUI()
     window.show()
@@ -2,14 +2,21 @@
 #
 # 使用方法:
 # 1. 反汇编 (WS2 -> ASM):
-#    python disasm_ws2.py <输入文件或目录> [输出目录]
+#    python disasm_ws2.py <输入文件或目录> [输出目录] [--ir]
+#    --ir: 输出二进制中间格式 .ws2ir 代替 .asm.txt
 #
 # 2. 汇编 (ASM -> WS2):
 #    python disasm_ws2.py --assemble <输入asm文件> <输出ws2文件> [加密模式]
+#    输入可以是 .asm.txt 或 .ws2ir
 #    加密模式: --encrypt (默认, 加密输出) 或 --no-encrypt (不加密输出)
 #
 # 3. 加密/解密工具:
 #    python disasm_ws2.py --tool <encrypt|decrypt> <输入文件或目录> <输出目录>
+#    python disasm_ws2.py --tool <encrypt|decrypt> <输入文件或目录> --in-place  (原地覆盖输入文件)
+#
+# 批量任务 (1, 3) 可追加 --jobs N 使用 N 个进程并行处理
+# 追加 --prefetch N 预读后续 N 个文件、异步写出 (适合网络共享目录；不支持 --ir 和 --in-place)
+# 追加 --no-detect-cache 不使用检测缓存
 #
 
 import struct
@@ -17,6 +24,17 @@ import os
 import sys
 import json
 import ast
+import mmap
+import array
+import bisect
+import time
+import hashlib
+import sqlite3
+import tempfile
+import contextlib
+from collections import namedtuple
+
+import ws2_profile
 
 OPCODE_NAMES = {
     0x01: "Condition",
@@ -310,161 +328,350 @@ OPCODES = {
     "254": [6, 8, -1],
 }
 
+# 由特殊逻辑处理的 opcode (指针 / 选项 / 文件结束)，不走签名表
+SPECIAL_OPCODES = {0x01, 0x02, 0x06, 0x0F, 0xE6, 0xFF}
+
+# 定长类型 -> struct 格式字符
+FIXED_TYPE_FORMATS = {0: "B", 1: "H", 2: "H", 3: "I", 4: "I", 5: "f"}
+
+_STEP_FIXED = 0
+_STEP_STRING = 1
+_STEP_M8 = 2
+_STEP_ARRAY = 3
+_STEP_VALUE = 4
+
+class OpcodeSignature:
+    """
+    预编译的 opcode 参数签名。
+    连续的定长参数合并为一个 struct.Struct，签名全部定长时 fixed 为该 Struct，
+    一次 unpack_from/pack 即可完成解码/编码；只有字符串和计数数组 (type 7) 需要逐个处理。
+    """
+    def __init__(self, opcode, signature):
+        self.opcode = opcode
+        self.signature = signature
+        self.name = OPCODE_NAMES.get(opcode, f"Unk{opcode:02X}")
+
+        steps = []
+        run = []
+
+        def flush_run():
+            if run:
+                fmt = "<" + "".join(FIXED_TYPE_FORMATS[t] for t in run)
+                steps.append((_STEP_FIXED, tuple(run), struct.Struct(fmt)))
+                run.clear()
+
+        i = 0
+        while i < len(signature):
+            type_code = signature[i]
+            if type_code == -1:
+                break
+            if type_code in FIXED_TYPE_FORMATS:
+                run.append(type_code)
+                i += 1
+                continue
+            flush_run()
+            if type_code == 7:
+                next_type = signature[i + 1] if i + 1 < len(signature) else None
+                steps.append((_STEP_ARRAY, next_type, None))
+                i += 2
+                continue
+            if type_code in (6, 9, 10):
+                steps.append((_STEP_STRING, type_code, None))
+            elif type_code == 8:
+                steps.append((_STEP_M8, type_code, None))
+            else:
+                steps.append((_STEP_VALUE, type_code, None))
+            i += 1
+        flush_run()
+
+        self.steps = steps
+        self.fixed = None
+        self.fixed_types = ()
+        if not steps:
+            self.fixed = struct.Struct("<")
+        elif len(steps) == 1 and steps[0][0] == _STEP_FIXED:
+            self.fixed_types = steps[0][1]
+            self.fixed = steps[0][2]
+
+    def decode(self, reader):
+        """读取参数列表，数据不足时抛出 EOFError"""
+        data = reader.data
+        fixed = self.fixed
+        if fixed is not None:
+            offset = reader.offset
+            end = offset + fixed.size
+            if end > len(data):
+                raise EOFError("文件结束")
+            reader.offset = end
+            return list(fixed.unpack_from(data, offset))
+
+        args = []
+        for kind, type_code, st in self.steps:
+            if kind == _STEP_FIXED:
+                offset = reader.offset
+                end = offset + st.size
+                if end > len(data):
+                    raise EOFError("文件结束")
+                reader.offset = end
+                args.extend(st.unpack_from(data, offset))
+            elif kind == _STEP_STRING:
+                raw, _, _, terminated = reader.read_string_bytes()
+                args.append(_decode_string_for_disasm(raw, terminated))
+            elif kind == _STEP_M8:
+                args.append("<M8>")
+            elif kind == _STEP_ARRAY:
+                count = reader.read_byte()
+                items = []
+                if type_code is not None:
+                    for _ in range(count):
+                        items.append(read_value_for_disasm(reader, type_code))
+                args.append({"count": count, "items": items})
+            else:
+                args.append(read_value_for_disasm(reader, type_code))
+        return args
+
+    def skip(self, reader):
+        """检测用: 跳过参数，数组缺少元素类型时返回 False"""
+        fixed = self.fixed
+        if fixed is not None:
+            reader.offset += fixed.size
+            if reader.offset > len(reader.data):
+                raise EOFError("文件结束")
+            return True
+
+        for kind, type_code, st in self.steps:
+            if kind == _STEP_FIXED:
+                reader.offset += st.size
+                if reader.offset > len(reader.data):
+                    raise EOFError("文件结束")
+            elif kind == _STEP_STRING:
+                if not _skip_detect_string(reader):
+                    raise EOFError("字符串未终止")
+            elif kind == _STEP_ARRAY:
+                count = reader.read_byte()
+                if type_code is None:
+                    return False
+                for _ in range(count):
+                    _skip_detect_value(reader, type_code)
+            elif kind == _STEP_VALUE:
+                _skip_detect_value(reader, type_code)
+        return True
+
+    def encode(self, args):
+        """编码参数列表 (不含 opcode 字节)"""
+        fixed = self.fixed
+        if fixed is not None and len(args) >= len(self.fixed_types):
+            return fixed.pack(*[float(value) if type_code == 5 else int(value)
+                                for type_code, value in zip(self.fixed_types, args)])
+
+        out = bytearray()
+        arg_index = 0
+        for kind, type_code, st in self.steps:
+            if kind == _STEP_FIXED:
+                values = args[arg_index:arg_index + len(type_code)]
+                if len(values) < len(type_code):
+                    raise IndexError("list index out of range")
+                out.extend(st.pack(*[float(value) if t == 5 else int(value)
+                                     for t, value in zip(type_code, values)]))
+                arg_index += len(type_code)
+            elif kind == _STEP_ARRAY:
+                arr = args[arg_index]
+                count = int(arr.get("count", 0))
+                items = arr.get("items", [])
+                out.append(count)
+                for idx in range(count):
+                    out.extend(encode_value(type_code, items[idx]))
+                arg_index += 1
+            else:
+                out.extend(encode_value(type_code, args[arg_index]))
+                arg_index += 1
+        return bytes(out)
+
+# 256 项签名表，按 opcode 整数直接索引；未定义的 opcode 为 None
+OPCODE_TABLE = [None] * 256
+for _key, _signature in OPCODES.items():
+    OPCODE_TABLE[int(_key)] = OpcodeSignature(int(_key), _signature)
+del _key, _signature
+
+OPCODE_DISPLAY_NAMES = [OPCODE_NAMES.get(op, f"Unk{op:02X}") for op in range(256)]
+OPCODE_IS_UNKNOWN = [name.startswith("Unk") for name in OPCODE_DISPLAY_NAMES]
+# 汇编文本中的两位十六进制 opcode (大小写均可) -> 整数
+_HEX_DIGITS = "0123456789ABCDEFabcdef"
+HEX_OPCODES = {a + b: int(a + b, 16) for a in _HEX_DIGITS for b in _HEX_DIGITS}
+
 def ror2(byte_val):
     return ((byte_val >> 2) | (byte_val << 6)) & 0xFF
 
-def decrypt_ws2(data):
-    return bytes([ror2(b) for b in data])
-
 def rol2(byte_val):
     return ((byte_val << 2) | (byte_val >> 6)) & 0xFF
 
+# 逐字节无状态的循环移位，预先生成 256 项查找表，整块数据交给 bytes.translate 在 C 层完成
+ROR2_TABLE = bytes(ror2(b) for b in range(256))
+ROL2_TABLE = bytes(rol2(b) for b in range(256))
+
+def decrypt_ws2(data):
+    with ws2_profile.stage("decrypt", len(data)):
+        return bytes(data).translate(ROR2_TABLE)
+
 def encrypt_ws2(data):
-    return bytes([rol2(b) for b in data])
+    with ws2_profile.stage("encrypt", len(data)):
+        return bytes(data).translate(ROL2_TABLE)
 
-def detect_ws2_type(data):
-    if not data:
-        return 'unknown'
-        
-    def skip_string(reader, test_data):
-        while reader.offset + 1 < len(test_data):
-            if test_data[reader.offset] == 0 and test_data[reader.offset + 1] == 0:
-                reader.offset += 2
-                return True
-            reader.offset += 2
+# 检测时加密假设按块惰性解密，明文文件通常只需解密开头一小块
+DETECT_CHUNK_SIZE = 0x10000
+# 加密数据分块解密时每块的大小
+DECRYPT_CHUNK_SIZE = 1 << 20
+# 流式写出汇编文本 / 汇编结果时的缓冲大小
+ASM_WRITE_CHUNK_SIZE = 1 << 20
+# 加解密工具流式处理时每块的大小
+CRYPTO_CHUNK_SIZE = 1 << 20
+
+def _skip_detect_string(reader):
+    end = find_string_terminator(reader.data, reader.offset)
+    if end == -1:
         return False
+    reader.offset = end + 2
+    return True
+
+def _skip_detect_value(reader, type_code):
+    if type_code == 0:
+        reader.read_byte()
+    elif type_code in [1, 2]:
+        reader.read_word()
+    elif type_code in [3, 4, 5]:
+        reader.offset += 4
+        if reader.offset > len(reader.data):
+            raise EOFError("文件结束")
+    elif type_code in [6, 9, 10]:
+        if not _skip_detect_string(reader):
+            raise EOFError("字符串未终止")
+    elif type_code == 8:
+        return
+    else:
+        raise ValueError(f"Unknown type_code {type_code}")
+
+def _skip_detect_operands(reader, opcode):
+    """跳过 opcode 之后的操作数，遇到非法 opJump 等无法继续解析的情况时返回 False"""
+    if opcode == 0x01:
+        val = reader.read_byte()
+        if val in [2, 128, 129, 130, 192] or (val == 3 and reader.peek_byte() in [50, 51, 127, 128]):
+            _skip_detect_value(reader, 1)
+            _skip_detect_value(reader, 5)
+            _skip_detect_value(reader, 4)
+            _skip_detect_value(reader, 4)
+        return True
 
-    def skip_value(reader, test_data, type_code):
-        if type_code == 0:
+    if opcode in [0x02, 0x06]:
+        _skip_detect_value(reader, 4)
+        return True
+
+    if opcode == 0x0F:
+        count = reader.read_byte()
+        for _ in range(count):
+            _skip_detect_value(reader, 1)
+            _skip_detect_value(reader, 6)
             reader.read_byte()
-        elif type_code in [1, 2]:
-            reader.read_word()
-        elif type_code in [3, 4, 5]:
-            reader.offset += 4
-            if reader.offset > len(test_data):
-                raise EOFError("文件结束")
-        elif type_code in [6, 9, 10]:
-            if not skip_string(reader, test_data):
-                raise EOFError("字符串未终止")
-        elif type_code == 8:
-            return
-        else:
-            raise ValueError(f"Unknown type_code {type_code}")
+            reader.read_byte()
+            reader.read_byte()
+            op_jump = reader.read_byte()
+            if op_jump == 6:
+                _skip_detect_value(reader, 4)
+            elif op_jump == 7:
+                _skip_detect_value(reader, 6)
+            else:
+                return False
+        return True
 
-    # 辅助函数：检查数据的合法性（通过Opcode判断）
-    def analyze_validity(test_data, limit=20):
-        try:
-            reader = BinaryReader(test_data)
-            valid_opcodes = 0
-            known_opcodes = 0
-            unknown_opcodes = 0
-            instructions_checked = 0
-            special_opcodes = {0x01, 0x02, 0x06, 0x0F, 0xE6, 0xFF}
-            last_opcode = None
-
-            def invalid_result():
-                return {
-                    'score': -1,
-                    'valid_opcodes': valid_opcodes,
-                    'known_opcodes': known_opcodes,
-                    'unknown_opcodes': unknown_opcodes,
-                    'reached_end': False,
-                    'ends_with_ff': False
-                }
-            
-            while limit is None or instructions_checked < limit:
-                if reader.offset >= len(test_data):
-                    break
-                opcode = reader.read_byte()
-                last_opcode = opcode
-                opcode_str = str(opcode)
-                if opcode_str not in OPCODES and opcode not in special_opcodes:
-                    return invalid_result()
-                
-                valid_opcodes += 1
-                opcode_name = OPCODE_NAMES.get(opcode, f"Unk{opcode:02X}")
-                if opcode_name.startswith("Unk"):
-                    unknown_opcodes += 1
-                else:
-                    known_opcodes += 1
-                instructions_checked += 1
-                
-                if opcode == 0x01:
-                    val = reader.read_byte()
-                    if val in [2, 128, 129, 130, 192] or (val == 3 and reader.peek_byte() in [50, 51, 127, 128]):
-                        skip_value(reader, test_data, 1)
-                        skip_value(reader, test_data, 5)
-                        skip_value(reader, test_data, 4)
-                        skip_value(reader, test_data, 4)
-                    continue
+    if opcode == 0xE6:
+        _skip_detect_value(reader, 4)
+        _skip_detect_value(reader, 4)
+        return True
 
-                if opcode in [0x02, 0x06]:
-                    skip_value(reader, test_data, 4)
-                    continue
+    if opcode == 0xFF:
+        _skip_detect_value(reader, 4)
+        reader.read_byte()
+        reader.read_byte()
+        reader.read_byte()
+        reader.read_byte()
+        return True
 
-                if opcode == 0x0F:
-                    count = reader.read_byte()
-                    for _ in range(count):
-                        skip_value(reader, test_data, 1)
-                        skip_value(reader, test_data, 6)
-                        reader.read_byte()
-                        reader.read_byte()
-                        reader.read_byte()
-                        op_jump = reader.read_byte()
-                        if op_jump == 6:
-                            skip_value(reader, test_data, 4)
-                        elif op_jump == 7:
-                            skip_value(reader, test_data, 6)
-                        else:
-                            return invalid_result()
-                    continue
+    return OPCODE_TABLE[opcode].skip(reader)
 
-                if opcode == 0xE6:
-                    skip_value(reader, test_data, 4)
-                    skip_value(reader, test_data, 4)
-                    continue
+class _ValidityScan:
+    """
+    按指令逐条推进的合法性扫描 (一个加密假设)。
+    encrypted=True 时按需分块解密，只有扫描推进到的部分才会被解密。
+    """
+    def __init__(self, data, encrypted=False):
+        self.source = data
+        self.total = len(data)
+        self.encrypted = encrypted
+        if encrypted:
+            self.reader = BinaryReader(bytearray(decrypt_ws2(data[:DETECT_CHUNK_SIZE])))
+        else:
+            self.reader = BinaryReader(data)
+        self.valid_opcodes = 0
+        self.known_opcodes = 0
+        self.unknown_opcodes = 0
+        self.last_opcode = None
+        self.state = None # None: 扫描中, 'done': 到达末尾, 'invalid': 非法指令, 'error': 解析异常
+
+    def _grow(self):
+        buf = self.reader.data
+        if len(buf) >= self.total:
+            return False
+        size = min(self.total, len(buf) * 2)
+        # 分块追加，避免整段切片/解密的临时副本
+        while len(buf) < size:
+            end = min(size, len(buf) + DECRYPT_CHUNK_SIZE)
+            buf.extend(self.source[len(buf):end].translate(ROR2_TABLE))
+        return True
 
-                if opcode == 0xFF:
-                    skip_value(reader, test_data, 4)
-                    reader.read_byte()
-                    reader.read_byte()
-                    reader.read_byte()
-                    reader.read_byte()
+    def step(self):
+        """解析一条指令，扫描已结束时返回 False"""
+        if self.state is not None:
+            return False
+        reader = self.reader
+        start = reader.offset
+        while True:
+            # 已解密部分不足以判断时 (越界/停在缓冲区末尾)，扩展后重新解析这条指令
+            if start >= len(reader.data):
+                if self._grow():
                     continue
+                self.state = 'done'
+                return False
+            reader.offset = start
+            try:
+                opcode = reader.read_byte()
+                if OPCODE_TABLE[opcode] is None and opcode not in SPECIAL_OPCODES:
+                    self.state = 'invalid'
+                    return False
+                operands_ok = _skip_detect_operands(reader, opcode)
+            except EOFError:
+                if self._grow():
+                    continue
+                self.state = 'error'
+                return False
+            except Exception:
+                self.state = 'error'
+                return False
+            if reader.offset >= len(reader.data) and self._grow():
+                continue
+            break
 
-                signature = OPCODES[opcode_str]
-                i = 0
-                while i < len(signature):
-                    type_code = signature[i]
-                    if type_code == -1:
-                        break
-                    if type_code == 7:
-                        count = reader.read_byte()
-                        next_type = signature[i + 1] if i + 1 < len(signature) else None
-                        if next_type is None:
-                            return invalid_result()
-                        for _ in range(count):
-                            skip_value(reader, test_data, next_type)
-                        i += 2
-                        continue
-                    skip_value(reader, test_data, type_code)
-                    i += 1
-            reached_end = reader.offset >= len(test_data) and valid_opcodes > 0
-            ends_with_ff = reached_end and last_opcode == 0xFF
-            score = valid_opcodes + known_opcodes * 4 - unknown_opcodes * 6
-            if reached_end:
-                score += 10000
-            if ends_with_ff:
-                score += 20000
-            return {
-                'score': score,
-                'valid_opcodes': valid_opcodes,
-                'known_opcodes': known_opcodes,
-                'unknown_opcodes': unknown_opcodes,
-                'reached_end': reached_end,
-                'ends_with_ff': ends_with_ff
-            }
-        except:
+        self.last_opcode = opcode
+        self.valid_opcodes += 1
+        if OPCODE_IS_UNKNOWN[opcode]:
+            self.unknown_opcodes += 1
+        else:
+            self.known_opcodes += 1
+        if not operands_ok:
+            self.state = 'invalid'
+            return False
+        return True
+
+    def result(self):
+        if self.state == 'error':
             return {
                 'score': 0,
                 'valid_opcodes': 0,
@@ -473,52 +680,115 @@ def detect_ws2_type(data):
                 'reached_end': False,
                 'ends_with_ff': False
             }
+        if self.state == 'invalid':
+            return {
+                'score': -1,
+                'valid_opcodes': self.valid_opcodes,
+                'known_opcodes': self.known_opcodes,
+                'unknown_opcodes': self.unknown_opcodes,
+                'reached_end': False,
+                'ends_with_ff': False
+            }
+        reached_end = self.reader.offset >= self.total and self.valid_opcodes > 0
+        ends_with_ff = reached_end and self.last_opcode == 0xFF
+        score = self.valid_opcodes + self.known_opcodes * 4 - self.unknown_opcodes * 6
+        if reached_end:
+            score += 10000
+        if ends_with_ff:
+            score += 20000
+        return {
+            'score': score,
+            'valid_opcodes': self.valid_opcodes,
+            'known_opcodes': self.known_opcodes,
+            'unknown_opcodes': self.unknown_opcodes,
+            'reached_end': reached_end,
+            'ends_with_ff': ends_with_ff
+        }
+
+def analyze_validity(test_data, limit=20):
+    """检查数据的合法性（通过Opcode判断），limit 为 None 时扫描到结尾"""
+    scan = _ValidityScan(test_data)
+    while limit is None or scan.valid_opcodes < limit:
+        if not scan.step():
+            break
+    return scan.result()
 
+def _sample_scores(data):
+    """旧版的分级抽样打分 (20/100/500 条指令)，仅在完整扫描结果完全相同时用于最终裁决"""
     def check_validity(test_data, limit=20):
         return analyze_validity(test_data, limit)['score']
 
     # 初始检查（前20条指令）
     score_plain = check_validity(data, limit=20)
-    
+
     decrypted_sample = decrypt_ws2(data[:2000])
     score_encrypted = check_validity(decrypted_sample, limit=20)
-    
+
     # 如果得分相同且都大于0，尝试深入检查（增加检查指令数）
     if score_plain == score_encrypted and score_plain > 0:
         score_plain = check_validity(data, limit=100)
         score_encrypted = check_validity(decrypted_sample, limit=100)
-        
-    # 再次平局，尝试完整解密（如果文件不大）或更深入检查
+
+    # 再次平局，尝试更大的样本和更深入检查
     if score_plain == score_encrypted and score_plain > 0:
         score_plain = check_validity(data, limit=500)
         decrypted_sample_large = decrypt_ws2(data[:10000])
         score_encrypted = check_validity(decrypted_sample_large, limit=500)
 
-    plain_full = analyze_validity(data, limit=None)
-    encrypted_full = analyze_validity(decrypt_ws2(data), limit=None)
+    return score_plain, score_encrypted
+
+def detect_ws2_type(data):
+    return _detect_ws2(data)[0]
+
+def _detect_ws2(data):
+    """返回 (检测结果, 检测过程中已完整解密的数据或 None)，供 open_ws2 复用解密缓冲区"""
+    if not data:
+        return 'unknown', None
+
+    # 两种假设并行逐条推进，一方解析失败后立即停止 (不再为它解密/扫描)，
+    # 另一方继续扫描到结尾或失败为止，以得到与完整扫描一致的结果
+    plain_scan = _ValidityScan(data)
+    encrypted_scan = _ValidityScan(data, encrypted=True)
+    while plain_scan.step() | encrypted_scan.step():
+        pass
+
+    plain_full = plain_scan.result()
+    encrypted_full = encrypted_scan.result()
+    decrypted = encrypted_scan.reader.data
+    if len(decrypted) < len(data):
+        decrypted = None
 
     if plain_full['ends_with_ff'] != encrypted_full['ends_with_ff']:
-        return 'decrypted' if plain_full['ends_with_ff'] else 'encrypted'
+        return ('decrypted' if plain_full['ends_with_ff'] else 'encrypted'), decrypted
 
     if plain_full['reached_end'] != encrypted_full['reached_end']:
-        return 'decrypted' if plain_full['reached_end'] else 'encrypted'
+        return ('decrypted' if plain_full['reached_end'] else 'encrypted'), decrypted
 
     if plain_full['unknown_opcodes'] != encrypted_full['unknown_opcodes']:
-        return 'decrypted' if plain_full['unknown_opcodes'] < encrypted_full['unknown_opcodes'] else 'encrypted'
+        return ('decrypted' if plain_full['unknown_opcodes'] < encrypted_full['unknown_opcodes'] else 'encrypted'), decrypted
 
     if plain_full['known_opcodes'] != encrypted_full['known_opcodes']:
-        return 'decrypted' if plain_full['known_opcodes'] > encrypted_full['known_opcodes'] else 'encrypted'
+        return ('decrypted' if plain_full['known_opcodes'] > encrypted_full['known_opcodes'] else 'encrypted'), decrypted
 
     if encrypted_full['score'] != plain_full['score']:
-        return 'encrypted' if encrypted_full['score'] > plain_full['score'] else 'decrypted'
+        return ('encrypted' if encrypted_full['score'] > plain_full['score'] else 'decrypted'), decrypted
 
+    score_plain, score_encrypted = _sample_scores(data)
     if score_encrypted > score_plain:
-        return 'encrypted'
+        return 'encrypted', decrypted
     else:
         # 默认为解密状态（或者无法判断时当作普通文件）
-        return 'decrypted'
+        return 'decrypted', decrypted
+
+WORD_STRUCT = struct.Struct('<H')
+INT_STRUCT = struct.Struct('<I')
+FLOAT_STRUCT = struct.Struct('<f')
 
 class BinaryReader:
+    """
+    小端二进制读取器。data 可以是 bytes / bytearray / mmap，
+    数值直接用 unpack_from 在原缓冲区上读取，不产生切片。
+    """
     def __init__(self, data):
         self.data = data
         self.offset = 0
@@ -538,21 +808,21 @@ class BinaryReader:
     def read_word(self):
         if self.offset + 2 > len(self.data):
             raise EOFError("文件结束")
-        v = struct.unpack('<H', self.data[self.offset:self.offset+2])[0]
+        v = WORD_STRUCT.unpack_from(self.data, self.offset)[0]
         self.offset += 2
         return v
         
     def read_int(self):
         if self.offset + 4 > len(self.data):
             raise EOFError("文件结束")
-        v = struct.unpack('<I', self.data[self.offset:self.offset+4])[0]
+        v = INT_STRUCT.unpack_from(self.data, self.offset)[0]
         self.offset += 4
         return v
         
     def read_float(self):
         if self.offset + 4 > len(self.data):
             raise EOFError("文件结束")
-        v = struct.unpack('<f', self.data[self.offset:self.offset+4])[0]
+        v = FLOAT_STRUCT.unpack_from(self.data, self.offset)[0]
         self.offset += 4
         return v
         
@@ -566,21 +836,24 @@ class BinaryReader:
 
     def read_string_bytes(self):
         start = self.offset
-        terminated = False
-        while self.offset + 1 < len(self.data):
-            if self.data[self.offset] == 0 and self.data[self.offset + 1] == 0:
-                terminated = True
-                break
-            self.offset += 2
-        end = self.offset
-        if not terminated and self.offset < len(self.data):
-            if self.offset + 1 == len(self.data):
-                end = len(self.data)
-                self.offset = len(self.data)
-        raw = self.data[start:end]
-        if terminated:
-            self.offset += 2
-        return raw, start, end, terminated
+        end = find_string_terminator(self.data, start)
+        if end != -1:
+            self.offset = end + 2
+            return self.data[start:end], start, end, True
+        # 未终止: 读到数据末尾 (包括奇数长度的尾字节)
+        end = max(start, len(self.data))
+        self.offset = end
+        return self.data[start:end], start, end, False
+
+def find_string_terminator(data, start):
+    """
+    查找从 start 起按 2 字节对齐的 UTF-16LE 终止符 00 00，返回其偏移，找不到返回 -1。
+    用 find 整块搜索，落在奇数位置的匹配 (跨越两个字符) 跳过后继续查找。
+    """
+    pos = data.find(b"\x00\x00", start)
+    while pos != -1 and (pos - start) & 1:
+        pos = data.find(b"\x00\x00", pos + 1)
+    return pos
 
 def _decode_string_for_disasm(raw, terminated):
     if not terminated:
@@ -593,36 +866,71 @@ def _decode_string_for_disasm(raw, terminated):
         return {"raw": raw.hex().upper(), "terminated": True}
     return text
 
-def disassemble(file_path, encryption_mode='auto'):
-    lines = []
-    with open(file_path, 'rb') as f:
-        raw_data = f.read()
-        
-    if encryption_mode == 'auto':
-        encryption_mode = detect_ws2_type(raw_data)
-        lines.append(f"; 检测模式: {encryption_mode}")
-        
-    if encryption_mode == 'encrypted':
-        data = decrypt_ws2(raw_data)
-        lines.append("; 来源: 已加密 (Encrypted)")
-    else:
-        data = raw_data
-        lines.append("; 来源: 未加密 (Decrypted)")
-        
+# 解码后的指令记录
+# opcode 为整数时 args 为类型化参数 (指针为整数偏移，字符串为 str 或 {"raw", "terminated"})；
+# opcode 为 "RAW" 时 args 为无法解析的剩余字节；opcode 为 "EOF" 时 args 为遇到文件结束的 opcode
+Instruction = namedtuple("Instruction", ["offset", "opcode", "size", "args"])
+
+# 性能分析中的 opcode 类别，未列出的已知 opcode 为 "other"
+OPCODE_CLASSES = {
+    0x14: "text", 0x15: "text", 0x0F: "choice",
+    0x01: "branch", 0x02: "branch", 0x06: "branch", 0xE6: "branch",
+    0x04: "file", 0x07: "file", 0xFF: "end",
+}
+
+def opcode_class(opcode):
+    if opcode == "RAW" or opcode == "EOF":
+        return "raw"
+    if OPCODE_IS_UNKNOWN[opcode]:
+        return "unknown"
+    return OPCODE_CLASSES.get(opcode, "other")
+
+def decode_instructions(data):
+    """逐条解码明文 WS2 数据，生成 Instruction 记录"""
+    profile = ws2_profile.active()
+    if profile is None:
+        return _decode_instructions(data)
+    return _profiled_decode(data, profile)
+
+def _profiled_decode(data, profile):
+    # 只计 next() 内的耗时，不含调用方处理每条指令的时间
+    instructions = _decode_instructions(data)
+    clock = time.perf_counter
+    while True:
+        start = clock()
+        try:
+            instr = next(instructions)
+        except StopIteration:
+            profile.record("decode", clock() - start)
+            return
+        elapsed = clock() - start
+        profile.record("decode", elapsed, instr.size)
+        profile.add_opcode(opcode_class(instr.opcode), elapsed, instr.size)
+        yield instr
+
+def _decode_instructions(data):
     reader = BinaryReader(data)
-    
-    lines.append(f"解密后大小: {len(data)}")
-    
+
     while reader.offset < len(data):
         start_offset = reader.offset
-        try:
-            opcode = reader.read_byte()
-        except EOFError:
-            break
-            
-        opcode_str = str(opcode)
-        opcode_name = OPCODE_NAMES.get(opcode, f"Unk{opcode:02X}")
-        
+        opcode = data[start_offset]
+        reader.offset = start_offset + 1
+
+        # 普通 Opcode: 按预编译签名解码
+        if opcode not in SPECIAL_OPCODES:
+            signature = OPCODE_TABLE[opcode]
+            if signature is None:
+                yield Instruction(start_offset, "RAW", len(data) - start_offset, data[start_offset:])
+                return
+            try:
+                args = signature.decode(reader)
+            except EOFError:
+                yield Instruction(start_offset, "RAW", len(data) - start_offset, data[start_offset:])
+                yield Instruction(start_offset, "EOF", 0, opcode)
+                return
+            yield Instruction(start_offset, opcode, reader.offset - start_offset, args)
+            continue
+
         args = []
         eof_hit = False
 
@@ -635,37 +943,17 @@ def disassemble(file_path, encryption_mode='auto'):
                 if val in [2, 128, 129, 130, 192] or (val == 3 and peek_val in [50, 51, 127, 128]):
                     args.append(read_value_for_disasm(reader, 1)) # Word
                     args.append(read_value_for_disasm(reader, 5)) # Float
-                    
-                    ptr1 = read_value_for_disasm(reader, 4) # Int (Pointer)
-                    if ptr1 != 0:
-                        ptr1 = f"loc_{ptr1:08X}"
-                    args.append(ptr1)
-                    
-                    ptr2 = read_value_for_disasm(reader, 4) # Int (Pointer)
-                    if ptr2 != 0:
-                        ptr2 = f"loc_{ptr2:08X}"
-                    args.append(ptr2)
+                    args.append(read_value_for_disasm(reader, 4)) # Int (Pointer)
+                    args.append(read_value_for_disasm(reader, 4)) # Int (Pointer)
             except EOFError:
                 eof_hit = True
 
-        elif opcode == 0x02: # Jump2
+        elif opcode == 0x02 or opcode == 0x06: # Jump2 / Jump
             try:
-                ptr = read_value_for_disasm(reader, 4)
-                if ptr != 0:
-                    ptr = f"loc_{ptr:08X}"
-                args.append(ptr)
+                args.append(read_value_for_disasm(reader, 4)) # Int (Pointer)
             except EOFError:
                 eof_hit = True
 
-        elif opcode == 0x06: # Jump
-            try:
-                ptr = read_value_for_disasm(reader, 4)
-                if ptr != 0:
-                    ptr = f"loc_{ptr:08X}"
-                args.append(ptr)
-            except EOFError:
-                eof_hit = True
-                
         elif opcode == 0x0F: # ShowChoice
             try:
                 count = reader.read_byte()
@@ -675,23 +963,20 @@ def disassemble(file_path, encryption_mode='auto'):
                     choice_item = {}
                     choice_item["id"] = read_value_for_disasm(reader, 1) # Word
                     choice_item["text"] = read_value_for_disasm(reader, 6) # String
-                    
+
                     choice_item["op1"] = reader.read_byte()
                     choice_item["op2"] = reader.read_byte()
                     choice_item["op3"] = reader.read_byte()
                     opJump = reader.read_byte()
                     choice_item["opJump"] = opJump
-                    
+
                     if opJump == 6:
-                        ptr = read_value_for_disasm(reader, 4) # Int
-                        if ptr != 0:
-                            ptr = f"loc_{ptr:08X}"
-                        choice_item["pointer"] = ptr
+                        choice_item["pointer"] = read_value_for_disasm(reader, 4) # Int (Pointer)
                     elif opJump == 7:
                         choice_item["file"] = read_value_for_disasm(reader, 6) # String
                     else:
                         choice_item["error"] = f"Unknown opJump {opJump}"
-                        
+
                     choices.append(choice_item)
                 args.append(choices)
             except EOFError:
@@ -699,15 +984,8 @@ def disassemble(file_path, encryption_mode='auto'):
 
         elif opcode == 0xE6: # ConditionalJump
             try:
-                ptr1 = read_value_for_disasm(reader, 4)
-                if ptr1 != 0:
-                    ptr1 = f"loc_{ptr1:08X}"
-                args.append(ptr1)
-                
-                ptr2 = read_value_for_disasm(reader, 4)
-                if ptr2 != 0:
-                    ptr2 = f"loc_{ptr2:08X}"
-                args.append(ptr2)
+                args.append(read_value_for_disasm(reader, 4)) # Int (Pointer)
+                args.append(read_value_for_disasm(reader, 4)) # Int (Pointer)
             except EOFError:
                 eof_hit = True
 
@@ -721,62 +999,292 @@ def disassemble(file_path, encryption_mode='auto'):
             except EOFError:
                 eof_hit = True
 
-        elif opcode_str not in OPCODES:
-            remaining = data[start_offset:]
-            lines.append(f"loc_{start_offset:08X}: RAW {remaining.hex()}")
-            break
-            
-        else:
-            signature = OPCODES[opcode_str]
-            i = 0
-                
-            while i < len(signature):
-                type_code = signature[i]
-                if type_code == -1:
-                    break
-                if type_code == 7:
-                    try:
-                        count = reader.read_byte()
-                    except EOFError:
-                        remaining = data[start_offset:]
-                        lines.append(f"loc_{start_offset:08X}: RAW {remaining.hex()}")
-                        eof_hit = True
-                        break
-                    next_type = signature[i + 1] if i + 1 < len(signature) else None
-                    items = []
-                    if next_type is not None:
-                        for _ in range(count):
-                            try:
-                                val = read_value_for_disasm(reader, next_type)
-                            except EOFError:
-                                remaining = data[start_offset:]
-                                lines.append(f"loc_{start_offset:08X}: RAW {remaining.hex()}")
-                                eof_hit = True
-                                break
-                            items.append(val)
-                    args.append({"count": count, "items": items})
-                    if eof_hit:
-                        break
-                    i += 2
-                    continue
-                try:
-                    val = read_value_for_disasm(reader, type_code)
-                except EOFError:
-                    remaining = data[start_offset:]
-                    lines.append(f"loc_{start_offset:08X}: RAW {remaining.hex()}")
-                    eof_hit = True
-                    break
-                if val is not None:
-                    args.append(val)
-                i += 1
-                
         if eof_hit:
-            lines.append(f"loc_{start_offset:08X}: 在Opcode {opcode:02X} 处遇到EOF")
-            break
-            
-        args_json = json.dumps(args, ensure_ascii=False)
-        lines.append(f"loc_{start_offset:08X}: {opcode:02X} ({opcode_name}) {args_json}")
-    return lines
+            yield Instruction(start_offset, "EOF", 0, opcode)
+            return
+
+        yield Instruction(start_offset, opcode, reader.offset - start_offset, args)
+
+def format_pointer(ptr):
+    if ptr != 0:
+        return f"loc_{ptr:08X}"
+    return ptr
+
+def label_args(opcode, args):
+    """返回将指针参数替换为 loc_ 标签后的参数列表 (不修改原列表)"""
+    if opcode == 0x01:
+        if len(args) > 4:
+            args = list(args)
+            args[3] = format_pointer(args[3])
+            args[4] = format_pointer(args[4])
+    elif opcode == 0x02 or opcode == 0x06:
+        args = [format_pointer(args[0])]
+    elif opcode == 0xE6:
+        args = [format_pointer(args[0]), format_pointer(args[1])]
+    elif opcode == 0x0F:
+        choices = []
+        for choice in args[1]:
+            if "pointer" in choice:
+                choice = dict(choice)
+                choice["pointer"] = format_pointer(choice["pointer"])
+            choices.append(choice)
+        args = [args[0], choices]
+    return args
+
+def format_instruction(instr):
+    """将 Instruction 记录格式化为一行汇编文本"""
+    if instr.opcode == "RAW":
+        return f"loc_{instr.offset:08X}: RAW {instr.args.hex()}"
+    if instr.opcode == "EOF":
+        return f"loc_{instr.offset:08X}: 在Opcode {instr.args:02X} 处遇到EOF"
+    opcode_name = OPCODE_DISPLAY_NAMES[instr.opcode]
+    args_json = json.dumps(label_args(instr.opcode, instr.args), ensure_ascii=False)
+    return f"loc_{instr.offset:08X}: {instr.opcode:02X} ({opcode_name}) {args_json}"
+
+def decrypt_ws2_into(data):
+    """将 data (bytes / mmap) 分块解密到一个新的 bytearray 中，不产生整份中间副本"""
+    out = bytearray(len(data))
+    for pos in range(0, len(data), DECRYPT_CHUNK_SIZE):
+        chunk = data[pos:pos + DECRYPT_CHUNK_SIZE]
+        out[pos:pos + len(chunk)] = chunk.translate(ROR2_TABLE)
+    return out
+
+# 检测缓存: 按 (路径, 大小, 修改时间, 首尾内容哈希) 记住自动检测的结果，跨进程、跨运行复用
+DETECT_CACHE_ENV = "WS2_DETECT_CACHE"
+DETECT_CACHE_DISABLE_ENV = "WS2_NO_DETECT_CACHE"
+DETECT_CACHE_MAX_ENTRIES = 50000
+DETECT_CACHE_SAMPLE_SIZE = 0x10000
+# 命中时 last_used 距今超过该间隔才更新，多数命中只读数据库 (淘汰按最近使用时间，精度到小时已足够)
+DETECT_CACHE_TOUCH_INTERVAL_NS = 3600 * 10**9
+
+def user_cache_dir():
+    """工具的用户缓存目录 (检测缓存、只读游戏目录的索引)"""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "AdvHD_WS2_Toolkit")
+
+def default_detect_cache_path():
+    path = os.environ.get(DETECT_CACHE_ENV)
+    if path:
+        return path
+    return os.path.join(user_cache_dir(), "detect_cache.sqlite3")
+
+def set_detect_cache_enabled(enabled):
+    """开关检测缓存；通过环境变量传递，进程池中的子进程同样生效"""
+    if enabled:
+        os.environ.pop(DETECT_CACHE_DISABLE_ENV, None)
+    else:
+        os.environ[DETECT_CACHE_DISABLE_ENV] = "1"
+
+def detect_cache_enabled():
+    return not os.environ.get(DETECT_CACHE_DISABLE_ENV)
+
+def content_digest(data):
+    """快速内容哈希: 只取开头和结尾各一段，配合大小和修改时间判断文件是否变化"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(struct.pack("<Q", len(data)))
+    h.update(data[:DETECT_CACHE_SAMPLE_SIZE])
+    if len(data) > DETECT_CACHE_SAMPLE_SIZE:
+        h.update(data[max(DETECT_CACHE_SAMPLE_SIZE, len(data) - DETECT_CACHE_SAMPLE_SIZE):])
+    return h.hexdigest()
+
+class DetectCache:
+    """
+    SQLite 检测缓存，超过 max_entries 条时按最近使用时间淘汰。
+    使用 WAL 模式，多个进程池工作进程同时查询时读操作不互相阻塞。
+    缓存出错 (数据库损坏、目录不可写等) 时自动停用，不影响正常处理。
+    """
+    def __init__(self, path=None, max_entries=DETECT_CACHE_MAX_ENTRIES):
+        self.path = path or default_detect_cache_path()
+        self.max_entries = max_entries
+        self.conn = None
+        self.failed = False
+
+    def _connect(self):
+        if self.conn is None and not self.failed:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                # 同一进程内可能在不同的线程中使用 (GUI 工作线程、预读流水线)，但不会同时使用
+                conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS detect_cache ("
+                    "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                    "digest TEXT, mode TEXT, last_used INTEGER)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS detect_cache_last_used ON detect_cache (last_used)")
+                conn.commit()
+                self.conn = conn
+            except (sqlite3.Error, OSError):
+                self.failed = True
+        return self.conn
+
+    def lookup(self, file_path, st, data):
+        """返回缓存的检测结果，未命中或文件已变化时返回 None"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        key = os.path.abspath(file_path)
+        try:
+            row = conn.execute(
+                "SELECT size, mtime_ns, digest, mode, last_used FROM detect_cache WHERE path = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns or row[2] != content_digest(data):
+                return None
+            now = time.time_ns()
+            if now - row[4] > DETECT_CACHE_TOUCH_INTERVAL_NS:
+                conn.execute("UPDATE detect_cache SET last_used = ? WHERE path = ?", (now, key))
+                conn.commit()
+        except sqlite3.Error:
+            self.failed = True
+            return None
+        return row[3]
+
+    def store(self, file_path, st, data, mode):
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO detect_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(file_path), st.st_size, st.st_mtime_ns, content_digest(data), mode, time.time_ns())
+            )
+            conn.execute(
+                "DELETE FROM detect_cache WHERE path IN "
+                "(SELECT path FROM detect_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+        except sqlite3.Error:
+            self.failed = True
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+_detect_cache = None
+
+def get_detect_cache():
+    """当前进程的检测缓存实例；缓存被禁用时返回 None"""
+    global _detect_cache
+    if not detect_cache_enabled():
+        return None
+    if _detect_cache is None:
+        _detect_cache = DetectCache()
+    return _detect_cache
+
+def detect_ws2_file(file_path, st, data):
+    """
+    带缓存的自动检测。st 为文件的 os.stat 结果，data 为文件原始内容。
+    返回 (检测结果, 检测过程中已完整解密的数据或 None)。
+    """
+    cache = get_detect_cache()
+    if cache is not None:
+        mode = cache.lookup(file_path, st, data)
+        if mode is not None:
+            return mode, None
+    mode, decrypted = _detect_ws2(data)
+    if cache is not None:
+        cache.store(file_path, st, data, mode)
+    return mode, decrypted
+
+@contextlib.contextmanager
+def open_ws2(file_path, encryption_mode='auto'):
+    """
+    打开 .ws2 文件，得到 (明文数据, 加密模式)；auto 时加密模式为检测结果。
+    未加密文件直接在 mmap 上检测和解码；加密文件只解密一次到一个缓冲区。
+    auto 的检测结果会写入检测缓存，文件未变化时下次直接复用。
+    明文数据只在 with 块内有效。
+    """
+    with ws2_profile.stage("read"):
+        f = open(file_path, 'rb')
+        try:
+            st = os.fstat(f.fileno())
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else None
+        except BaseException:
+            f.close()
+            raise
+    ws2_profile.count_bytes("read", st.st_size)
+    raw_data = mapped if mapped is not None else b""
+    with f:
+        try:
+            yield decode_ws2_data(raw_data, encryption_mode, file_path, st)
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+def decode_ws2_data(data, encryption_mode='auto', file_path=None, st=None):
+    """
+    同 open_ws2，输入为已读入内存的文件内容，返回 (明文数据, 加密模式)。
+    给出 file_path 和 st (os.stat 结果) 时 auto 检测使用检测缓存。
+    """
+    decrypted = None
+    if encryption_mode == 'auto':
+        with ws2_profile.stage("detect", len(data)):
+            if file_path is not None and st is not None:
+                encryption_mode, decrypted = detect_ws2_file(file_path, st, data)
+            else:
+                encryption_mode, decrypted = _detect_ws2(data)
+
+    if encryption_mode == 'encrypted':
+        # 检测时已完整解密的缓冲区直接复用
+        if decrypted is None:
+            with ws2_profile.stage("decrypt", len(data)):
+                decrypted = decrypt_ws2_into(data)
+        return decrypted, encryption_mode
+    return data, encryption_mode
+
+def disassemble(file_path, encryption_mode='auto'):
+    return disassemble_with_mode(file_path, encryption_mode)[0]
+
+def disassemble_with_mode(file_path, encryption_mode='auto'):
+    """反汇编并返回 (文本行, 加密模式)；auto 时加密模式为检测结果"""
+    with open_ws2(file_path, encryption_mode) as (data, detected_mode):
+        lines = list(_disasm_lines(data, encryption_mode, detected_mode))
+    return lines, detected_mode
+
+def disassemble_iter(file_path, encryption_mode='auto'):
+    """逐行生成反汇编文本，不保留整份文本列表"""
+    with open_ws2(file_path, encryption_mode) as (data, detected_mode):
+        yield from _disasm_lines(data, encryption_mode, detected_mode)
+
+def disassemble_to_file(file_path, output_dir, encryption_mode='auto'):
+    """反汇编并边解码边写入 .asm.txt，返回 (输出路径, 加密模式)"""
+    with open_ws2(file_path, encryption_mode) as (data, detected_mode):
+        out_path = write_disasm(output_dir, file_path, _disasm_lines(data, encryption_mode, detected_mode))
+    return out_path, detected_mode
+
+def disassemble_data(data, encryption_mode='auto', file_path=None, st=None):
+    """反汇编已读入内存的文件内容，返回 (逐行生成的反汇编文本, 加密模式)"""
+    plain, detected_mode = decode_ws2_data(data, encryption_mode, file_path, st)
+    return _disasm_lines(plain, encryption_mode, detected_mode), detected_mode
+
+def _disasm_lines(data, encryption_mode, detected_mode):
+    if encryption_mode == 'auto':
+        yield f"; 检测模式: {detected_mode}"
+
+    if detected_mode == 'encrypted':
+        yield "; 来源: 已加密 (Encrypted)"
+    else:
+        yield "; 来源: 未加密 (Decrypted)"
+
+    yield f"解密后大小: {len(data)}"
+
+    profile = ws2_profile.active()
+    if profile is None:
+        for instr in decode_instructions(data):
+            yield format_instruction(instr)
+        return
+    clock = time.perf_counter
+    for instr in decode_instructions(data):
+        start = clock()
+        line = format_instruction(instr)
+        profile.record("format", clock() - start, instr.size)
+        yield line
 
 def read_value(reader, type_code):
     if type_code == 0:
@@ -818,251 +1326,285 @@ def encode_value(type_code, value):
         return b""
     raise ValueError(f"Unknown type code {type_code}")
 
+POINTER_OPCODES = {0x01, 0x02, 0x06, 0x0F, 0xE6}
+
+def encode_instruction(opcode, args):
+    """
+    编码一条指令。
+    返回 (指令字节, 指针修正列表)，指针位置先写 0，修正列表元素为 (指令内偏移, 指针参数)。
+    """
+    instr_bytes = bytearray()
+    fixups = []
+    instr_bytes.append(opcode)
+
+    if opcode == 0xFF:
+        instr_bytes.extend(encode_value(4, args[0]))
+        instr_bytes.append(int(args[1]))
+        instr_bytes.append(int(args[2]))
+        instr_bytes.append(int(args[3]))
+        instr_bytes.append(int(args[4]))
 
+    elif opcode == 0x01:
+        val = args[0]
+        instr_bytes.append(int(val))
+        if val in [2, 128, 129, 130, 192] or (val == 3 and len(args) > 1):
+            instr_bytes.extend(encode_value(1, args[1]))
+            instr_bytes.extend(encode_value(5, args[2]))
+            fixups.append((len(instr_bytes), args[3]))
+            instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
+            fixups.append((len(instr_bytes), args[4]))
+            instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
+
+    elif opcode == 0x02 or opcode == 0x06:
+        fixups.append((len(instr_bytes), args[0]))
+        instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
+
+    elif opcode == 0xE6:
+        fixups.append((len(instr_bytes), args[0]))
+        instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
+        fixups.append((len(instr_bytes), args[1]))
+        instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
+
+    elif opcode == 0x0F:
+        count = int(args[0])
+        instr_bytes.append(count)
+        for choice in args[1]:
+            instr_bytes.extend(encode_value(1, choice["id"]))
+            instr_bytes.extend(encode_value(6, choice["text"]))
+            instr_bytes.append(int(choice["op1"]))
+            instr_bytes.append(int(choice["op2"]))
+            instr_bytes.append(int(choice["op3"]))
+            instr_bytes.append(int(choice["opJump"]))
+            if choice["opJump"] == 6:
+                fixups.append((len(instr_bytes), choice["pointer"]))
+                instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
+            elif choice["opJump"] == 7:
+                instr_bytes.extend(encode_value(6, choice["file"]))
+
+    else:
+        signature = OPCODE_TABLE[opcode]
+        if signature is None:
+            raise ValueError(f"Unknown opcode {opcode:02X}")
+        instr_bytes.extend(signature.encode(args))
+
+    return instr_bytes, fixups
+
+
+
+# json 的 C 扫描器: 从指定位置解析一个 JSON 值，返回 (值, 结束位置)
+_scan_json = json.JSONDecoder().scan_once
 
 def parse_args(args_part):
+    """
+    解析汇编行的参数部分。
+    反汇编器输出的参数都是单个严格 JSON 数组，直接交给 C 扫描器解析，
+    省去 json.loads 的包装开销；扫描失败或有多余内容 (手工编辑) 时才走 json.loads / ast.literal_eval。
+    """
     args_part = args_part.strip()
     if not args_part or args_part == "(End)":
         return []
+    if args_part[0] == "[":
+        try:
+            value, end = _scan_json(args_part, 0)
+        except (StopIteration, ValueError):
+            pass
+        else:
+            if end == len(args_part):
+                return value
     try:
         return json.loads(args_part)
     except json.JSONDecodeError:
         return ast.literal_eval(args_part)
 
+def iter_asm(lines):
+    """
+    逐行解析汇编文本，生成 (标签名, 指令字节, 指令内指针修正)。
+    标签名为 None 表示该行没有定义标签；单独的标签行指令字节为空。
+    指针位置写占位符，修正项为 (指令内偏移, 指针参数)，由调用方在标签收集完后回填。
+    """
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+
+        # 解析独立的标签定义
+        if line.endswith(":") and not " " in line:
+             yield line[:-1], b"", ()
+             continue
+
+        if ":" not in line:
+            continue
+
+        # 处理行首可能的标签 "loc_XXXX: 00 ..."
+        prefix, rest = line.split(":", 1)
+        prefix = prefix.strip()
+        # 如果前缀看起来像标签 (以 loc_ 开头)，记录它
+        label = prefix if prefix.startswith("loc_") else None
+
+        # 继续解析指令
+        rest = rest.strip()
+        if not rest:
+            if label is not None:
+                yield label, b"", ()
+            continue
+
+        parts = rest.split(" ", 1)
+        op_hex = parts[0].strip()
+
+        if op_hex == "RAW":
+            raw_bytes = bytes.fromhex(parts[1].strip()) if len(parts) > 1 else b""
+            yield label, raw_bytes, ()
+            continue
+
+        opcode = HEX_OPCODES.get(op_hex)
+        if opcode is None:
+            if label is not None:
+                yield label, b"", ()
+            continue
+
+        # 移除 (OpcodeName)
+        args_str = ""
+        if len(parts) > 1:
+            args_str = parts[1].strip()
+            if args_str.startswith("("):
+                 end_paren = args_str.find(")")
+                 if end_paren != -1:
+                     args_str = args_str[end_paren+1:].strip()
+
+        args = []
+        if args_str:
+            try:
+                args = parse_args(args_str)
+            except Exception as e:
+                print(f"Error parsing line: {line}")
+                raise e
+
+        instr_bytes, instr_fixups = encode_instruction(opcode, args)
+        yield label, instr_bytes, instr_fixups
+
 def assemble_from_asm(asm_path):
-    # 第一遍扫描: 收集标签并计算大小
+    with ws2_profile.stage("assemble"):
+        return _assemble_from_asm(asm_path)
+
+def _assemble_from_asm(asm_path):
+    # 单遍编码: 指针先写占位符并记录修正位置，全部标签收集完后统一回填
     out_buffer = bytearray()
     labels = {} # name -> offset
-    temp_instructions = [] # (opcode, args, offset)
-    
+    fixups = [] # (输出偏移, 指针参数)
+
     with open(asm_path, "r", encoding="utf-8") as f:
-        current_offset = 0
-        for line in f:
-            line = line.rstrip("\n")
-            if not line:
-                continue
-            
-            # 解析独立的标签定义
-            if line.endswith(":") and not " " in line:
-                 label_name = line[:-1]
-                 labels[label_name] = current_offset
-                 continue
-                 
-            if ":" not in line:
-                continue
-            
-            # 处理行首可能的标签 "loc_XXXX: 00 ..."
-            prefix, rest = line.split(":", 1)
-            prefix = prefix.strip()
-            # 如果前缀看起来像标签 (以 loc_ 开头)，记录它
-            if prefix.startswith("loc_"):
-                labels[prefix] = current_offset
-            
-            # 继续解析指令
-            rest = rest.strip()
-            if not rest:
-                continue
-                
-            parts = rest.split(" ", 1)
-            op_hex = parts[0].strip()
-            
-            if op_hex == "RAW":
-                if len(parts) > 1:
-                    raw_bytes = bytes.fromhex(parts[1].strip())
-                    out_buffer.extend(raw_bytes)
-                    current_offset += len(raw_bytes)
-                    temp_instructions.append({
-                        "opcode": "RAW",
-                        "args": raw_bytes,
-                        "offset": current_offset - len(raw_bytes),
-                        "size": len(raw_bytes)
-                    })
-                continue
-                
-            if len(op_hex) != 2 or any(c not in "0123456789ABCDEFabcdef" for c in op_hex):
-                continue
-                
-            opcode = int(op_hex, 16)
-            
-            # 移除 (OpcodeName)
-            args_str = ""
-            if len(parts) > 1:
-                args_str = parts[1].strip()
-                if args_str.startswith("("):
-                     end_paren = args_str.find(")")
-                     if end_paren != -1:
-                         args_str = args_str[end_paren+1:].strip()
-            
-            args = []
-            if args_str:
-                try:
-                    args = parse_args(args_str)
-                except Exception as e:
-                    print(f"Error parsing line: {line}")
-                    raise e
-            
-            # 计算大小
-            instr_bytes = bytearray()
-            instr_bytes.append(opcode)
-            
-            start_instr_offset = current_offset
-            
-            # ... 特殊情况 ...
-            if opcode == 0xFF:
-                 instr_bytes.extend(encode_value(4, args[0]))
-                 instr_bytes.append(int(args[1]))
-                 instr_bytes.append(int(args[2]))
-                 instr_bytes.append(int(args[3]))
-                 instr_bytes.append(int(args[4]))
-            
-            elif opcode == 0x01:
-                 val = args[0]
-                 instr_bytes.append(int(val))
-                 if val in [2, 128, 129, 130, 192] or (val == 3 and len(args) > 1):
-                     instr_bytes.extend(encode_value(1, args[1]))
-                     instr_bytes.extend(encode_value(5, args[2]))
-                     # 指针 (可能是标签)
-                     instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
-                     instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
-            
-            elif opcode == 0x02 or opcode == 0x06:
-                 # 指针 (可能是标签)
-                 instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
-                 
-            elif opcode == 0xE6:
-                 # 指针
-                 instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
-                 instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
-
-            elif opcode == 0x0F:
-                 count = int(args[0])
-                 instr_bytes.append(count)
-                 for choice in args[1]:
-                     instr_bytes.extend(encode_value(1, choice["id"]))
-                     instr_bytes.extend(encode_value(6, choice["text"]))
-                     instr_bytes.append(int(choice["op1"]))
-                     instr_bytes.append(int(choice["op2"]))
-                     instr_bytes.append(int(choice["op3"]))
-                     instr_bytes.append(int(choice["opJump"]))
-                     if choice["opJump"] == 6:
-                          instr_bytes.extend(b"\x00\x00\x00\x00") # 占位符
-                     elif choice["opJump"] == 7:
-                          instr_bytes.extend(encode_value(6, choice["file"]))
-            
-            else:
-                signature = OPCODES.get(str(opcode))
-                if signature is None:
-                    raise ValueError(f"Unknown opcode {opcode:02X}")
-                
-                arg_index = 0
-                i = 0
-                while i < len(signature):
-                    type_code = signature[i]
-                    if type_code == -1:
-                        break
-                    if type_code == 7:
-                        arr = args[arg_index]
-                        count = int(arr.get("count", 0))
-                        items = arr.get("items", [])
-                        instr_bytes.append(count)
-                        next_type = signature[i + 1]
-                        for idx in range(count):
-                            instr_bytes.extend(encode_value(next_type, items[idx]))
-                        arg_index += 1
-                        i += 2
-                        continue
-                    
-                    value = args[arg_index]
-                    instr_bytes.extend(encode_value(type_code, value))
-                    arg_index += 1
-                    i += 1
-
-            current_offset += len(instr_bytes)
-            temp_instructions.append({
-                "opcode": opcode,
-                "args": args,
-                "offset": start_instr_offset,
-                "size": len(instr_bytes)
-            })
-
-    # 第二遍扫描: 使用解析后的标签进行编码
-    final_buffer = bytearray()
-    
-    for instr in temp_instructions:
-        if instr["opcode"] == "RAW":
-            final_buffer.extend(instr["args"]) # args 此时是 bytes
-            continue
-            
-        opcode = instr["opcode"]
-        args = instr["args"]
-        
-        final_buffer.append(opcode)
-        
-        if opcode == 0xFF:
-             final_buffer.extend(encode_value(4, args[0]))
-             final_buffer.append(int(args[1]))
-             final_buffer.append(int(args[2]))
-             final_buffer.append(int(args[3]))
-             final_buffer.append(int(args[4]))
-        
-        elif opcode == 0x01:
-             val = args[0]
-             final_buffer.append(int(val))
-             if val in [2, 128, 129, 130, 192] or (val == 3 and len(args) > 1):
-                 final_buffer.extend(encode_value(1, args[1]))
-                 final_buffer.extend(encode_value(5, args[2]))
-                 final_buffer.extend(encode_pointer(args[3], labels))
-                 final_buffer.extend(encode_pointer(args[4], labels))
-        
-        elif opcode == 0x02 or opcode == 0x06:
-             final_buffer.extend(encode_pointer(args[0], labels))
-             
-        elif opcode == 0xE6:
-             final_buffer.extend(encode_pointer(args[0], labels))
-             final_buffer.extend(encode_pointer(args[1], labels))
-
-        elif opcode == 0x0F:
-             count = int(args[0])
-             final_buffer.append(count)
-             for choice in args[1]:
-                 final_buffer.extend(encode_value(1, choice["id"]))
-                 final_buffer.extend(encode_value(6, choice["text"]))
-                 final_buffer.append(int(choice["op1"]))
-                 final_buffer.append(int(choice["op2"]))
-                 final_buffer.append(int(choice["op3"]))
-                 final_buffer.append(int(choice["opJump"]))
-                 if choice["opJump"] == 6:
-                      final_buffer.extend(encode_pointer(choice["pointer"], labels))
-                 elif choice["opJump"] == 7:
-                      final_buffer.extend(encode_value(6, choice["file"]))
-        
-        else:
-            # 标准编码
-            signature = OPCODES.get(str(opcode))
-            arg_index = 0
-            i = 0
-            while i < len(signature):
-                type_code = signature[i]
-                if type_code == -1:
-                    break
-                if type_code == 7:
-                    arr = args[arg_index]
-                    count = int(arr.get("count", 0))
-                    items = arr.get("items", [])
-                    final_buffer.append(count)
-                    next_type = signature[i + 1]
-                    for idx in range(count):
-                        final_buffer.extend(encode_value(next_type, items[idx]))
-                    arg_index += 1
-                    i += 2
-                    continue
-                
-                value = args[arg_index]
-                final_buffer.extend(encode_value(type_code, value))
-                arg_index += 1
-                i += 1
-                
-    return bytes(final_buffer)
+        for label, instr_bytes, instr_fixups in iter_asm(f):
+            base = len(out_buffer)
+            if label is not None:
+                labels[label] = base
+            out_buffer.extend(instr_bytes)
+            for pos, ptr in instr_fixups:
+                fixups.append((base + pos, ptr))
+
+    # 回填指针
+    for pos, ptr in fixups:
+        out_buffer[pos:pos + 4] = encode_pointer(ptr, labels)
+
+    return bytes(out_buffer)
+
+_FIXUP_LITERAL = 0
+_FIXUP_LOC = 1
+_FIXUP_NAMED = 2
+
+_UPPER_HEX_DIGITS = frozenset("0123456789ABCDEF")
+
+def parse_loc_label(name):
+    """反汇编器生成的标签 loc_XXXXXXXX -> 原偏移；其他写法 (如 loc_10、loc_0000000a) 返回 None"""
+    if len(name) == 12 and name.startswith("loc_") and _UPPER_HEX_DIGITS.issuperset(name[4:]):
+        return int(name[4:], 16)
+    return None
+
+def _encode_loc_pointer(key, label_keys, label_offsets, named_labels):
+    # 顺序颠倒的 loc_ 标签总是在数组中的同名标签之后定义，字典优先
+    if named_labels:
+        name = f"loc_{key:08X}"
+        if name in named_labels:
+            return INT_STRUCT.pack(named_labels[name])
+    i = bisect.bisect_left(label_keys, key)
+    if i < len(label_keys) and label_keys[i] == key:
+        return INT_STRUCT.pack(label_offsets[i])
+    return encode_pointer(f"loc_{key:08X}", named_labels)
+
+def assemble_to_file(asm_path, out_path, encrypt=True):
+    """
+    流式汇编到文件: 指令字节按块 (可选加密后) 写出，
+    内存中只保留标签偏移和待回填的指针，最后 seek 回去逐个回填。
+    输出与 assemble_from_asm (+ encrypt_ws2) 逐字节一致。
+    反汇编输出的 loc_XXXXXXXX 标签按原偏移递增，以整数数组保存、二分查找；
+    其他名称或顺序颠倒的标签放在字典中 (同名标签以后出现的为准，与 assemble_from_asm 相同)。
+    """
+    label_keys = array.array("Q") # 递增的 loc_ 标签原偏移
+    label_offsets = array.array("Q") # 对应的输出偏移
+    named_labels = {} # 其他标签: name -> 输出偏移
+    fixup_offsets = array.array("Q") # 待回填指针的输出偏移
+    fixup_kinds = array.array("B") # _FIXUP_LITERAL / _FIXUP_LOC / _FIXUP_NAMED
+    fixup_values = array.array("Q") # 字面值 / loc_ 标签原偏移 / named_fixups 中的下标
+    named_fixups = [] # 其他形式的指针参数
+    pending = bytearray()
+    written = 0
+
+    try:
+        with ws2_profile.stage("assemble"), \
+             open(asm_path, "r", encoding="utf-8") as f, open(out_path, "wb") as out:
+            for label, instr_bytes, instr_fixups in iter_asm(f):
+                base = written + len(pending)
+                if label is not None:
+                    key = parse_loc_label(label)
+                    if key is not None and label_keys and key == label_keys[-1]:
+                        label_offsets[-1] = base
+                    elif key is not None and (not label_keys or key > label_keys[-1]):
+                        label_keys.append(key)
+                        label_offsets.append(base)
+                    else:
+                        named_labels[label] = base
+                pending.extend(instr_bytes)
+                for pos, ptr in instr_fixups:
+                    fixup_offsets.append(base + pos)
+                    key = parse_loc_label(ptr) if isinstance(ptr, str) else None
+                    if key is not None:
+                        fixup_kinds.append(_FIXUP_LOC)
+                        fixup_values.append(key)
+                    elif isinstance(ptr, str):
+                        fixup_kinds.append(_FIXUP_NAMED)
+                        fixup_values.append(len(named_fixups))
+                        named_fixups.append(ptr)
+                    else:
+                        fixup_kinds.append(_FIXUP_LITERAL)
+                        fixup_values.append(INT_STRUCT.unpack(encode_pointer(ptr, {}))[0])
+                if len(pending) >= ASM_WRITE_CHUNK_SIZE:
+                    _write_chunk(out, pending, encrypt)
+                    written += len(pending)
+                    pending.clear()
+            _write_chunk(out, pending, encrypt)
+
+            # 回填指针
+            for pos, kind, value in zip(fixup_offsets, fixup_kinds, fixup_values):
+                if kind == _FIXUP_LITERAL:
+                    ptr_bytes = INT_STRUCT.pack(value)
+                elif kind == _FIXUP_LOC:
+                    ptr_bytes = _encode_loc_pointer(value, label_keys, label_offsets, named_labels)
+                else:
+                    # 非 loc_XXXXXXXX 形式的标签只会在字典中
+                    ptr_bytes = encode_pointer(named_fixups[value], named_labels)
+                out.seek(pos)
+                out.write(ptr_bytes.translate(ROL2_TABLE) if encrypt else ptr_bytes)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(out_path)
+        raise
+    return out_path
+
+def _write_chunk(out, chunk, encrypt):
+    if encrypt:
+        with ws2_profile.stage("encrypt", len(chunk)):
+            chunk = chunk.translate(ROL2_TABLE)
+    with ws2_profile.stage("write", len(chunk)):
+        out.write(chunk)
 
 def encode_pointer(val, labels):
     if isinstance(val, str):
@@ -1077,9 +1619,49 @@ def encode_pointer(val, labels):
     except:
         return b"\x00\x00\x00\x00"
 
+def rebuild_instructions(data, instructions, replacements=None):
+    """
+    在内存中按解码记录重建明文数据，不经过汇编文本。
+    data: 解码所用的明文数据；replacements: 指令下标 -> 新参数 (仅需重新编码被修改的指令)。
+    未修改的指令直接复制原字节，所有指针按新的指令偏移修正；
+    指针目标不是指令起点时与汇编器一致写 0。
+    """
+    with ws2_profile.stage("assemble"):
+        return _rebuild_instructions(data, instructions, replacements or {})
 
+def _rebuild_instructions(data, instructions, replacements):
+    out = bytearray()
+    labels = {} # 原偏移 -> 新偏移
+    fixups = [] # (输出偏移, 原指针值)
 
+    for i, instr in enumerate(instructions):
+        labels[instr.offset] = len(out)
+        opcode = instr.opcode
+        if opcode == "RAW":
+            out.extend(instr.args)
+            continue
+        if opcode == "EOF":
+            continue
 
+        if i in replacements or opcode in POINTER_OPCODES:
+            instr_bytes, instr_fixups = encode_instruction(opcode, replacements.get(i, instr.args))
+            base = len(out)
+            out.extend(instr_bytes)
+            for pos, ptr in instr_fixups:
+                fixups.append((base + pos, ptr))
+        else:
+            out.extend(data[instr.offset:instr.offset + instr.size])
+
+    for pos, ptr in fixups:
+        if ptr != 0:
+            if ptr in labels:
+                ptr = labels[ptr]
+            else:
+                print(f"Warning: Label loc_{ptr:08X} not found, using 0")
+                ptr = 0
+        struct.pack_into("<I", out, pos, ptr)
+
+    return bytes(out)
 
 def find_ws2_files(input_path):
     if os.path.isfile(input_path):
@@ -1091,56 +1673,166 @@ def find_ws2_files(input_path):
                 ws2_files.append(os.path.join(root, name))
     return ws2_files
 
+def disasm_output_path(output_dir, file_path):
+    return os.path.join(output_dir, os.path.basename(file_path) + ".asm.txt")
+
 def write_disasm(output_dir, file_path, lines):
     os.makedirs(output_dir, exist_ok=True)
-    base = os.path.basename(file_path)
-    out_path = os.path.join(output_dir, base + ".asm.txt")
-    with open(out_path, "w", encoding="utf-8") as f:
-        for line in lines:
-            f.write(line + "\n")
+    out_path = disasm_output_path(output_dir, file_path)
+    # lines 可以是生成器，出错时删除写了一半的文件
+    try:
+        with ws2_profile.stage("write"), \
+             open(out_path, "w", encoding="utf-8", buffering=ASM_WRITE_CHUNK_SIZE) as f:
+            for line in lines:
+                f.write(line + "\n")
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(out_path)
+        raise
+    if ws2_profile.active():
+        ws2_profile.count_bytes("write", os.path.getsize(out_path))
     return out_path
 
 def process_file_encryption(file_path, output_dir, mode):
     """
     mode: 'encrypt' or 'decrypt'
     """
-    os.makedirs(output_dir, exist_ok=True)
-    
-    with open(file_path, 'rb') as f:
-        data = f.read()
-        
-    if mode == 'encrypt':
-        out_data = encrypt_ws2(data)
-    else: # decrypt
-        out_data = decrypt_ws2(data)
-        
+    return process_file_encryption_with_mode(file_path, output_dir, mode, detect=False)[0]
+
+def encryption_output_path(output_dir, file_path):
     base_name = os.path.basename(file_path)
     # 确保后缀为 .ws2
     if not base_name.lower().endswith(".ws2"):
-        out_name = base_name + ".ws2"
+        return os.path.join(output_dir, base_name + ".ws2")
+    return os.path.join(output_dir, base_name)
+
+def process_file_encryption_with_mode(file_path, output_dir, mode, detect=False, in_place=False):
+    """
+    同 process_file_encryption，返回 (输出路径, 输入文件的检测结果)；
+    只有 detect 为 True 时才检测 (需要整份扫描，远慢于加解密本身)，否则检测结果为 None。
+    输入经 mmap 按 CRYPTO_CHUNK_SIZE 分块变换后写入临时文件，完成后原子替换为输出文件，
+    内存占用与文件大小无关；in_place 为 True 时忽略 output_dir，直接替换输入文件。
+    """
+    if in_place:
+        out_path = file_path
     else:
-        out_name = base_name
-        
-    out_path = os.path.join(output_dir, out_name)
-    with open(out_path, 'wb') as f:
-        f.write(out_data)
-        
-    return out_path
+        os.makedirs(output_dir, exist_ok=True)
+        out_path = encryption_output_path(output_dir, file_path)
+
+    table = ROL2_TABLE if mode == 'encrypt' else ROR2_TABLE
+    stage = "encrypt" if mode == 'encrypt' else "decrypt"
+    fd, tmp_path = tempfile.mkstemp(prefix=".ws2_", suffix=".tmp", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        with open(file_path, 'rb') as f, os.fdopen(fd, 'wb') as out:
+            with ws2_profile.stage("read"):
+                st = os.fstat(f.fileno())
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else None
+            ws2_profile.count_bytes("read", st.st_size)
+            try:
+                data = mapped if mapped is not None else b""
+                if detect:
+                    with ws2_profile.stage("detect", len(data)):
+                        detected_mode = detect_ws2_file(file_path, st, data)[0]
+                else:
+                    detected_mode = None
+                for pos in range(0, len(data), CRYPTO_CHUNK_SIZE):
+                    with ws2_profile.stage(stage, min(CRYPTO_CHUNK_SIZE, len(data) - pos)):
+                        chunk = data[pos:pos + CRYPTO_CHUNK_SIZE].translate(table)
+                    with ws2_profile.stage("write", len(chunk)):
+                        out.write(chunk)
+            finally:
+                if mapped is not None:
+                    mapped.close()
+            # 临时文件默认只有属主可读写，改为与输入文件相同的权限
+            os.chmod(tmp_path, st.st_mode & 0o777)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+    return out_path, detected_mode
 
 def print_usage():
     print("AdvHD WS2 Toolkit CLI")
     print("---------------------")
     print("使用方法:")
     print("1. 反汇编 (WS2 -> ASM):")
-    print("   python disasm_ws2.py <输入文件或目录> [输出目录]")
+    print("   python disasm_ws2.py <输入文件或目录> [输出目录] [--ir]")
+    print("   --ir: 输出二进制中间格式 .ws2ir (构建更快)")
     print("")
     print("2. 汇编 (ASM -> WS2):")
-    print("   python disasm_ws2.py --assemble <输入asm文件> <输出ws2文件> [--no-encrypt]")
+    print("   python disasm_ws2.py --assemble <输入asm或ws2ir文件> <输出ws2文件> [--no-encrypt]")
     print("")
     print("3. 加密/解密工具:")
     print("   python disasm_ws2.py --tool <encrypt|decrypt> <输入文件或目录> <输出目录>")
+    print("   python disasm_ws2.py --tool <encrypt|decrypt> <输入文件或目录> --in-place  (原地覆盖)")
+    print("")
+    print("批量任务 (1, 3) 可追加 --jobs N 使用 N 个进程并行处理 (默认 1)")
+    print("追加 --prefetch N 预读后续 N 个文件并异步写出，适合网络共享目录 (不支持 --ir 和 --in-place)")
+    print("追加 --no-detect-cache 不使用检测缓存 (每次重新检测加密状态)")
+    print("追加 --profile 在结束时输出各环节耗时汇总，--pstats <文件> 同时写出 cProfile 结果")
+
+def pop_jobs_arg(argv):
+    """从参数列表中移除 --jobs N 并返回 N，未指定时为 1"""
+    if "--jobs" not in argv:
+        return 1
+    idx = argv.index("--jobs")
+    if idx + 1 >= len(argv):
+        raise ValueError("--jobs 需要一个整数参数")
+    jobs = int(argv[idx + 1])
+    del argv[idx:idx + 2]
+    return max(1, jobs)
+
+def pop_prefetch_arg(argv):
+    """从参数列表中移除 --prefetch N 并返回 N，未指定时为 0 (不预读)"""
+    if "--prefetch" not in argv:
+        return 0
+    idx = argv.index("--prefetch")
+    if idx + 1 >= len(argv):
+        raise ValueError("--prefetch 需要一个整数参数")
+    depth = int(argv[idx + 1])
+    del argv[idx:idx + 2]
+    return max(0, depth)
+
+def pop_profile_args(argv):
+    """从参数列表中移除 --profile 和 --pstats <文件>，返回 (是否计时, pstats 文件或 None)"""
+    profiling = "--profile" in argv
+    if profiling:
+        argv.remove("--profile")
+    pstats_path = None
+    if "--pstats" in argv:
+        idx = argv.index("--pstats")
+        if idx + 1 >= len(argv):
+            raise ValueError("--pstats 需要一个文件路径")
+        pstats_path = argv[idx + 1]
+        del argv[idx:idx + 2]
+    return profiling or pstats_path is not None, pstats_path
+
+def start_profiling(pstats_path=None):
+    """启用计时，并在程序退出时打印汇总表"""
+    import atexit
+    ws2_profile.enable(cprofile=pstats_path is not None)
+    atexit.register(ws2_profile.print_report, pstats_path, time.perf_counter())
 
 if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    try:
+        jobs = pop_jobs_arg(sys.argv)
+        prefetch = pop_prefetch_arg(sys.argv)
+        profiling, pstats_path = pop_profile_args(sys.argv)
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+    if profiling:
+        start_profiling(pstats_path)
+
+    if "--no-detect-cache" in sys.argv:
+        sys.argv.remove("--no-detect-cache")
+        set_detect_cache_enabled(False)
+
     if len(sys.argv) < 2:
         print_usage()
         sys.exit(1)
@@ -1159,26 +1851,29 @@ if __name__ == '__main__':
             should_encrypt = False
             
         try:
-            assembled = assemble_from_asm(asm_path)
-            
             if should_encrypt:
-                final_data = encrypt_ws2(assembled)
                 print("模式: 加密输出")
             else:
-                final_data = assembled
                 print("模式: 不加密输出")
-                
-            with open(output_ws2, "wb") as f:
-                f.write(final_data)
+
+            if asm_path.lower().endswith(".ws2ir"):
+                import ws2_ir
+                ws2_ir.assemble_ir_to_file(asm_path, output_ws2, encrypt=should_encrypt)
+            else:
+                assemble_to_file(asm_path, output_ws2, encrypt=should_encrypt)
             print(f"成功生成: {output_ws2}")
         except Exception as e:
             print(f"错误: {str(e)}")
             sys.exit(1)
             
     elif sys.argv[1] == "--tool":
-        if len(sys.argv) < 5:
+        in_place = "--in-place" in sys.argv
+        if in_place:
+            sys.argv.remove("--in-place")
+        if len(sys.argv) < (4 if in_place else 5):
             print("错误: 参数不足")
             print("用法: python disasm_ws2.py --tool <encrypt|decrypt> <输入文件或目录> <输出目录>")
+            print("      python disasm_ws2.py --tool <encrypt|decrypt> <输入文件或目录> --in-place")
             sys.exit(1)
             
         mode = sys.argv[2]
@@ -1187,27 +1882,47 @@ if __name__ == '__main__':
             sys.exit(1)
             
         input_path = sys.argv[3]
-        output_dir = sys.argv[4]
+        output_dir = None if in_place else sys.argv[4]
         
         if not os.path.exists(input_path):
             print(f"错误: 输入路径不存在: {input_path}")
             sys.exit(1)
             
-        files = find_ws2_files(input_path)
+        import ws2_batch
+
+        use_pipeline = prefetch > 0 and not in_place
+        files = ws2_batch.scan_ws2_files(input_path) if use_pipeline else find_ws2_files(input_path)
         if not files:
             print(f"在 {input_path} 未找到 .ws2 文件")
             sys.exit(1)
-            
+
         print(f"开始{mode}任务，共 {len(files)} 个文件...")
-        for file_path in files:
-            try:
-                out = process_file_encryption(file_path, output_dir, mode)
-                print(f"处理: {os.path.basename(file_path)} -> {out}")
-            except Exception as e:
-                print(f"失败 {file_path}: {str(e)}")
+        start_time = time.perf_counter()
+        total_bytes = 0
+        if use_pipeline:
+            os.makedirs(output_dir, exist_ok=True)
+            pipeline = ws2_batch.IOPipeline(jobs=jobs, depth=prefetch)
+            tasks = [(file_path, encryption_output_path(output_dir, file_path), mode) for file_path in files]
+            results = pipeline.run(ws2_batch.crypto_transform, tasks)
+        else:
+            tasks = [(file_path, output_dir, mode, in_place) for file_path in files]
+            results = ws2_batch.run_batch(ws2_batch.crypto_job, tasks, jobs=jobs)
+        for result in results:
+            file_path = result.task[0]
+            if result.output:
+                print(result.output, end="")
+            if result.ok:
+                total_bytes += os.path.getsize(result.value.path)
+                print(f"处理: {os.path.basename(file_path)} -> {result.value.path}")
+            else:
+                print(f"失败 {file_path}: {result.error}")
+        print(f"吞吐: {ws2_batch.format_throughput(total_bytes, time.perf_counter() - start_time)}")
                 
     else:
         # 默认反汇编模式
+        use_ir = "--ir" in sys.argv
+        if use_ir:
+            sys.argv.remove("--ir")
         input_path = sys.argv[1]
         output_dir = sys.argv[2] if len(sys.argv) >= 3 else "ws2_disasm"
         
@@ -1215,16 +1930,31 @@ if __name__ == '__main__':
             print(f"错误: 输入路径不存在: {input_path}")
             sys.exit(1)
             
-        ws2_files = find_ws2_files(input_path)
+        import ws2_batch
+
+        use_pipeline = prefetch > 0 and not use_ir
+        ws2_files = ws2_batch.scan_ws2_files(input_path) if use_pipeline else find_ws2_files(input_path)
         if not ws2_files:
             print(f"在 {input_path} 未找到 .ws2 文件")
             sys.exit(1)
-            
+
         print(f"找到 {len(ws2_files)} 个 .ws2 文件，开始反汇编...")
-        for file_path in ws2_files:
-            try:
-                lines = disassemble(file_path, encryption_mode='auto')
-                out_path = write_disasm(output_dir, file_path, lines)
-                print(f"输出: {out_path}")
-            except Exception as e:
-                print(f"失败 {file_path}: {str(e)}")
+        if use_pipeline:
+            os.makedirs(output_dir, exist_ok=True)
+            pipeline = ws2_batch.IOPipeline(jobs=jobs, depth=prefetch)
+            tasks = [(file_path, disasm_output_path(output_dir, file_path), 'auto') for file_path in ws2_files]
+            results = pipeline.run(ws2_batch.disasm_transform, tasks)
+        else:
+            tasks = [(file_path, output_dir, 'auto') for file_path in ws2_files]
+            job = ws2_batch.disasm_ir_job if use_ir else ws2_batch.disasm_job
+            results = ws2_batch.run_batch(job, tasks, jobs=jobs)
+        for result in results:
+            file_path = result.task[0]
+            if result.output:
+                print(result.output, end="")
+            if result.ok:
+                print(f"输出: {result.value.path}")
+            else:
+                print(f"失败 {file_path}: {result.error}")
+        if use_pipeline:
+            print(f"吞吐: {pipeline.throughput()}")
@@ -0,0 +1,577 @@
+# WS2 批处理执行器
+#
+# 将反汇编 / 构建 / 加解密 / JSON 提取 / JSON 导入按文件分发执行，
+# 结果按输入顺序逐个返回。jobs > 1 时使用进程池并行，jobs <= 1 时在当前进程内顺序执行。
+
+import os
+import io
+import json
+import time
+import queue
+import asyncio
+import threading
+import traceback
+import sqlite3
+import hashlib
+import contextlib
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import disasm_ws2
+import ws2_json_handler
+import ws2_ir
+import ws2_profile
+
+# index: 任务序号; task: 任务参数元组; ok/value: 是否成功及返回值;
+# error/traceback: 失败信息; output: 任务执行期间的标准输出 (仅进程池模式)
+BatchResult = namedtuple("BatchResult", ["index", "task", "ok", "value", "error", "traceback", "output"])
+
+# 任务返回值: path 为输出路径; mode 为输入 .ws2 的加密模式 (由任务读取文件时顺带得到，构建任务为 None);
+# strings 为去重提取得到的 字符串 ID -> 原文 (由主进程合并写入共享字符串表，其他任务为 None)
+JobOutput = namedtuple("JobOutput", ["path", "mode", "strings"], defaults=(None,))
+
+# 增量构建清单，保存在输出目录中；格式或构建逻辑变化时递增版本号使旧清单失效
+BUILD_MANIFEST_NAME = ".ws2_build_manifest.json"
+BUILD_MANIFEST_VERSION = 1
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+def disasm_job(file_path, output_dir, encryption_mode='auto'):
+    return JobOutput(*disasm_ws2.disassemble_to_file(file_path, output_dir, encryption_mode=encryption_mode))
+
+def disasm_ir_job(file_path, output_dir, encryption_mode='auto'):
+    return JobOutput(*ws2_ir.disassemble_to_ir(file_path, output_dir, encryption_mode=encryption_mode))
+
+def build_job(asm_path, out_path, encrypt=True):
+    # .ws2ir 直接回填构建，其余按汇编文本处理
+    if asm_path.lower().endswith(ws2_ir.IR_SUFFIX):
+        return JobOutput(ws2_ir.assemble_ir_to_file(asm_path, out_path, encrypt=encrypt), None)
+    return JobOutput(disasm_ws2.assemble_to_file(asm_path, out_path, encrypt=encrypt), None)
+
+def crypto_job(file_path, output_dir, mode, in_place=False, detect=False):
+    # detect 为 True 时顺带检测输入的加密状态 (用于批量汇总)，否则结果中 mode 为 None
+    return JobOutput(*disasm_ws2.process_file_encryption_with_mode(file_path, output_dir, mode,
+                                                                   detect=detect, in_place=in_place))
+
+def format_throughput(total_bytes, seconds):
+    """批处理吞吐量: '12.3 MB / 0.45 s = 27.3 MB/s'"""
+    mb = total_bytes / (1024 * 1024)
+    rate = mb / seconds if seconds > 0 else 0.0
+    return f"{mb:.1f} MB / {seconds:.2f} s = {rate:.1f} MB/s"
+
+def json_extract_job(file_path, out_json_path, encryption_mode='auto', dedup=False):
+    entries, mode = ws2_json_handler.extract_text_with_mode(file_path, encryption_mode=encryption_mode)
+    strings = None
+    if dedup:
+        entries, strings = ws2_json_handler.dedup_entries(entries)
+    with ws2_profile.stage("write"), open(out_json_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return JobOutput(out_json_path, mode, strings)
+
+def text_records_job(file_path, encryption_mode='auto'):
+    # 文本索引用: 返回 (文本记录列表, 加密模式)
+    return ws2_json_handler.extract_text_records(file_path, encryption_mode=encryption_mode)
+
+# 合并 JSON 提取任务的返回值: line 为该脚本在合并 JSONL 中的一行; mode / strings 同 JobOutput
+SectionOutput = namedtuple("SectionOutput", ["line", "mode", "strings"])
+
+def json_extract_section_job(file_path, key, encryption_mode='auto', dedup=False):
+    entries, mode = ws2_json_handler.extract_text_with_mode(file_path, encryption_mode=encryption_mode)
+    strings = None
+    if dedup:
+        entries, strings = ws2_json_handler.dedup_entries(entries)
+    return SectionOutput(ws2_json_handler.merged_line(key, entries), mode, strings)
+
+def json_import_section_job(ws2_path, entries, out_path, output_encrypt_mode='auto', strings_path=None):
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    mode = ws2_json_handler.import_entries_to_ws2(ws2_path, entries, out_path,
+                                                  output_encrypt_mode=output_encrypt_mode, strings_path=strings_path)
+    return JobOutput(out_path, mode)
+
+def run_merged_extract(ws2_files, root_dir, merged_path, jobs=1, dedup=False, encryption_mode='auto'):
+    """
+    提取所有脚本的文本到一个合并 JSONL，按输入顺序逐行写出，生成每个文件的 BatchResult。
+    全部完成后才替换目标文件；去重时由调用方合并 result.value.strings 写入字符串表。
+    """
+    tasks = [(path, ws2_json_handler.script_key(path, root_dir), encryption_mode, dedup) for path in ws2_files]
+    tmp_path = merged_path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for result in run_batch(json_extract_section_job, tasks, jobs=jobs):
+                if result.ok:
+                    f.write(result.value.line + "\n")
+                yield result
+        os.replace(tmp_path, merged_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+class MergedImport:
+    """
+    合并 JSON 导入计划。
+    tasks() 边读合并 JSON 边生成 json_import_section_job 的任务，输出路径保持脚本的相对路径；
+    读完后 missing 为没有对应文本的脚本，extra 为找不到脚本的文本键。
+    给定 manifest 时跳过脚本、文本和输出设置都未变化的任务 (计入 reused)，指纹记录在 fingerprints[输出路径]。
+    """
+    def __init__(self, ws2_dir, merged_path, out_dir, output_encrypt_mode='auto', manifest=None):
+        self.ws2_dir = ws2_dir
+        self.merged_path = merged_path
+        self.out_dir = out_dir
+        self.output_encrypt_mode = output_encrypt_mode
+        self.manifest = manifest
+        self.missing = []
+        self.extra = []
+        self.reused = 0
+        self.fingerprints = {}
+
+    def tasks(self):
+        scripts = {ws2_json_handler.script_key(path, self.ws2_dir): path
+                   for path in disasm_ws2.find_ws2_files(self.ws2_dir)}
+        strings_path = ws2_json_handler.string_table_path(self.merged_path)
+        if not os.path.exists(strings_path):
+            strings_path = None
+        seen = set()
+
+        for key, entries in ws2_json_handler.iter_merged_entries(self.merged_path):
+            ws2_path = scripts.get(key)
+            if ws2_path is None:
+                self.extra.append(key)
+                continue
+            seen.add(key)
+            out_path = os.path.join(self.out_dir, *key.split("/"))
+            if self.manifest is not None:
+                entries_digest = hashlib.blake2b(
+                    json.dumps(entries, ensure_ascii=False, sort_keys=True).encode('utf-8'), digest_size=16
+                ).hexdigest()
+                inputs = [ws2_path] + ([strings_path] if strings_path else [])
+                fingerprint = build_fingerprint(inputs, ['json_import_merged', self.output_encrypt_mode, entries_digest])
+                if self.manifest.is_fresh(out_path, fingerprint):
+                    self.reused += 1
+                    continue
+                self.fingerprints[out_path] = fingerprint
+            yield (ws2_path, entries, out_path, self.output_encrypt_mode, strings_path)
+
+        self.missing = sorted(key for key in scripts if key not in seen)
+
+def json_import_inputs(ws2_path, json_path):
+    """增量构建指纹用: 导入任务依赖的输入文件 (含共享字符串表)"""
+    inputs = [ws2_path, json_path]
+    table_path = ws2_json_handler.string_table_path(json_path)
+    if os.path.exists(table_path):
+        inputs.append(table_path)
+    return inputs
+
+def json_import_job(ws2_path, json_path, out_path, output_encrypt_mode='auto'):
+    mode = ws2_json_handler.import_text_to_ws2(ws2_path, json_path, out_path, output_encrypt_mode=output_encrypt_mode)
+    return JobOutput(out_path, mode)
+
+def _call_job(func, task, capture_output=False, profile=None):
+    """
+    返回 (ok, value, error, traceback, output)。
+    profile 不为 None 时 (子进程中) 单独计时，profile 为 True 时同时记录 cProfile，
+    返回值末尾追加 (计时快照, cProfile 结果文件)，失败时为 None。
+    """
+    output = io.StringIO() if capture_output else None
+    redirect = contextlib.redirect_stdout(output) if capture_output else contextlib.nullcontext()
+    profiled = None
+    try:
+        with redirect:
+            if profile is None:
+                value = func(*task)
+            else:
+                value, snapshot, stats_path = ws2_profile.run_job(func, task, profile)
+                profiled = (snapshot, stats_path)
+        result = (True, value, None, None, output.getvalue() if output else "")
+    except Exception as e:
+        result = (False, None, str(e), traceback.format_exc(), output.getvalue() if output else "")
+    if profile is not None:
+        result += (profiled,)
+    return result
+
+def run_batch(func, tasks, jobs=1):
+    """
+    对每个任务参数元组执行 func(*task)，按输入顺序生成 BatchResult。
+    jobs 为 None 时使用 CPU 核数；进程池模式下最多提前提交 jobs * 2 个任务。
+    tasks 可以是生成器，此时任务按需逐个取出 (如边解析合并 JSON 边分发)。
+    """
+    task_count = len(tasks) if hasattr(tasks, "__len__") else None
+    if jobs is None:
+        jobs = default_jobs()
+
+    if jobs <= 1 or (task_count is not None and task_count <= 1):
+        for index, task in enumerate(tasks):
+            yield BatchResult(index, task, *_call_job(func, task))
+        return
+
+    workers = jobs if task_count is None else min(jobs, task_count)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    task_iter = iter(enumerate(tasks))
+    # 顺序模式下任务直接计入当前的 Profile；进程池模式下由子进程计时后合并
+    profile = ws2_profile.active()
+    profile_arg = None if profile is None else profile.cprofile_enabled
+
+    def submit_next():
+        for index, task in task_iter:
+            pending.append((index, task, executor.submit(_call_job, func, task, True, profile_arg)))
+            return True
+        return False
+
+    try:
+        for _ in range(workers * 2):
+            if not submit_next():
+                break
+        while pending:
+            index, task, future = pending.popleft()
+            try:
+                result = future.result()
+            except Exception as e:
+                result = (False, None, str(e), traceback.format_exc(), "")
+            if len(result) > 5:
+                if result[5] is not None:
+                    snapshot, stats_path = result[5]
+                    profile.merge(snapshot)
+                    if stats_path:
+                        profile.add_cprofile_file(stats_path)
+                result = result[:5]
+            submit_next()
+            yield BatchResult(index, task, *result)
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+# 预读流水线 (适合网络共享目录): I/O 线程提前读入后续文件、异步写出已完成的文件，与解码并行。
+# 变换函数 func(data, st, 输入路径, *参数) 处理已读入内存的文件内容，返回 (输出字节, JobOutput)，
+# JobOutput.path 由流水线填为输出路径。
+PREFETCH_IO_THREADS = 4
+
+# files / read_bytes / written_bytes: 已完成的文件数和读写字节数; seconds: 从开始到最后一个结果的耗时
+PipelineStats = namedtuple("PipelineStats", ["files", "read_bytes", "written_bytes", "seconds"])
+
+def _read_file(path):
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        data = f.read()
+    return data, st, time.perf_counter() - start
+
+def _write_file(path, data):
+    start = time.perf_counter()
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+        raise
+    return time.perf_counter() - start
+
+class IOPipeline:
+    """
+    tasks 为 (输入路径, 输出路径, *参数)，run() 按输入顺序生成 BatchResult。
+    同时在处理中的文件 (已读入、处理中、等待写出) 最多 depth 个；
+    jobs > 1 时变换在进程池中执行，否则在一个单独的线程中执行。
+    """
+    def __init__(self, jobs=1, depth=8, io_threads=PREFETCH_IO_THREADS):
+        self.jobs = jobs or default_jobs()
+        self.depth = max(1, depth)
+        self.io_threads = io_threads
+        self.stats = PipelineStats(0, 0, 0, 0.0)
+        self._cancelled = False
+
+    def cancel(self):
+        """不再开始新的文件，已在处理中的文件照常完成"""
+        self._cancelled = True
+
+    def throughput(self):
+        return format_throughput(self.stats.read_bytes + self.stats.written_bytes, self.stats.seconds)
+
+    def run(self, func, tasks):
+        results = queue.Queue()
+        done = object()
+
+        def loop_thread():
+            try:
+                asyncio.run(self._main(func, tasks, results))
+            except BaseException as e:
+                results.put(e)
+            finally:
+                results.put(done)
+
+        self._cancelled = False
+        thread = threading.Thread(target=loop_thread, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = results.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # 调用方提前结束迭代时停止提交新文件，等待处理中的文件完成
+            self._cancelled = True
+            thread.join()
+
+    async def _main(self, func, tasks, results):
+        loop = asyncio.get_running_loop()
+        io_pool = ThreadPoolExecutor(max_workers=self.io_threads)
+        cpu_pool = ProcessPoolExecutor(max_workers=self.jobs) if self.jobs > 1 else ThreadPoolExecutor(max_workers=1)
+        # 线程模式下变换直接计入当前的 Profile；进程池模式下由子进程计时后合并
+        profile = ws2_profile.active()
+        profile_arg = None if profile is None or self.jobs <= 1 else profile.cprofile_enabled
+        slots = asyncio.Semaphore(self.depth)
+        pending = deque()
+        start = time.perf_counter()
+        counters = [0, 0, 0] # 文件数, 读取字节数, 写出字节数
+        # 读写耗时先在事件循环中累计，结束后再计入 Profile (线程模式下变换线程同时在使用 Profile)
+        io_seconds = {"read": [0.0, 0, 0], "write": [0.0, 0, 0]}
+
+        def add_io(stage, seconds, nbytes):
+            entry = io_seconds[stage]
+            entry[0] += seconds
+            entry[1] += nbytes
+            entry[2] += 1
+
+        async def process(index, task):
+            in_path, out_path = task[0], task[1]
+            try:
+                data, st, read_seconds = await loop.run_in_executor(io_pool, _read_file, in_path)
+                counters[1] += len(data)
+                add_io("read", read_seconds, len(data))
+
+                result = await loop.run_in_executor(cpu_pool, _call_job, func, (data, st, in_path) + tuple(task[2:]),
+                                                    self.jobs > 1, profile_arg)
+                del data
+                if len(result) > 5:
+                    if result[5] is not None:
+                        snapshot, stats_path = result[5]
+                        profile.merge(snapshot)
+                        if stats_path:
+                            profile.add_cprofile_file(stats_path)
+                    result = result[:5]
+                ok, value, error, tb, output = result
+                if ok:
+                    out_bytes, value = value
+                    write_seconds = await loop.run_in_executor(io_pool, _write_file, out_path, out_bytes)
+                    counters[2] += len(out_bytes)
+                    add_io("write", write_seconds, len(out_bytes))
+                    value = value._replace(path=out_path)
+                counters[0] += 1
+                return BatchResult(index, task, ok, value, error, tb, output)
+            except Exception as e:
+                return BatchResult(index, task, False, None, str(e), traceback.format_exc(), "")
+            finally:
+                slots.release()
+
+        try:
+            for index, task in enumerate(tasks):
+                await slots.acquire()
+                if self._cancelled:
+                    slots.release()
+                    break
+                pending.append(asyncio.ensure_future(process(index, task)))
+                while pending and pending[0].done():
+                    results.put(pending.popleft().result())
+            while pending:
+                results.put(await pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+            io_pool.shutdown(wait=True)
+            cpu_pool.shutdown(wait=True)
+            if profile is not None:
+                for stage, (seconds, nbytes, calls) in io_seconds.items():
+                    if calls:
+                        profile.add(stage, seconds, nbytes, calls)
+            self.stats = PipelineStats(counters[0], counters[1], counters[2], time.perf_counter() - start)
+
+def scan_ws2_files(input_path, threads=PREFETCH_IO_THREADS):
+    """
+    同 disasm_ws2.find_ws2_files，各子目录由线程池并行列出 (网络共享上每次列目录都有往返延迟)。
+    返回顺序与 find_ws2_files (os.walk 自顶向下) 相同，开启预读不改变处理顺序。
+    """
+    if os.path.isfile(input_path):
+        return [input_path]
+
+    def list_dir(path):
+        dirs, files = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    # 与 os.walk 相同，不进入指向目录的符号链接
+                    if not entry.is_symlink():
+                        dirs.append(entry.path)
+                elif entry.name.lower().endswith(".ws2"):
+                    files.append(entry.path)
+        return dirs, files
+
+    listings = {} # 目录 -> (子目录, .ws2 文件)，均按 scandir 顺序
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = deque([(input_path, pool.submit(list_dir, input_path))])
+        while futures:
+            path, future = futures.popleft()
+            try:
+                dirs, files = future.result()
+            except OSError:
+                dirs, files = [], []
+            listings[path] = (dirs, files)
+            futures.extend((d, pool.submit(list_dir, d)) for d in dirs)
+
+    # 按 os.walk 的顺序排列: 先是目录本身的文件，再依次深入各子目录
+    found = []
+    stack = [input_path]
+    while stack:
+        dirs, files = listings[stack.pop()]
+        found.extend(files)
+        stack.extend(reversed(dirs))
+    return found
+
+def disasm_transform(data, st, file_path, encryption_mode='auto'):
+    lines, mode = disasm_ws2.disassemble_data(data, encryption_mode, file_path, st)
+    # 与 write_disasm 的文本模式输出一致，换行符为 os.linesep
+    with ws2_profile.stage("format"):
+        text = "".join(line + os.linesep for line in lines).encode('utf-8')
+    return text, JobOutput(None, mode)
+
+def json_extract_transform(data, st, file_path, encryption_mode='auto', dedup=False):
+    try:
+        plain, mode = disasm_ws2.decode_ws2_data(data, encryption_mode, file_path, st)
+        with ws2_profile.stage("text"):
+            records = list(ws2_json_handler.iter_text_records(disasm_ws2.decode_instructions(plain)))
+    except Exception as e:
+        raise RuntimeError(f"反汇编失败: {str(e)}")
+    entries = ws2_json_handler.entries_from_records(records)
+    strings = None
+    if dedup:
+        entries, strings = ws2_json_handler.dedup_entries(entries)
+    # 与 json_extract_job 的文本模式输出一致
+    with ws2_profile.stage("text"):
+        text = json.dumps(entries, ensure_ascii=False, indent=2).replace("\n", os.linesep).encode('utf-8')
+    return text, JobOutput(None, mode, strings)
+
+def crypto_transform(data, st, file_path, mode, detect=False):
+    detected_mode = None
+    if detect:
+        with ws2_profile.stage("detect", len(data)):
+            detected_mode = disasm_ws2.detect_ws2_file(file_path, st, data)[0]
+    with ws2_profile.stage("encrypt" if mode == 'encrypt' else "decrypt", len(data)):
+        out = data.translate(disasm_ws2.ROL2_TABLE if mode == 'encrypt' else disasm_ws2.ROR2_TABLE)
+    return out, JobOutput(None, detected_mode)
+
+def hash_file(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _dir_database_writable(root_dir, path):
+    # SQLite 写入时还要在同目录创建日志文件，目录本身也需可写
+    return os.access(root_dir, os.W_OK) and (not os.path.exists(path) or os.access(path, os.W_OK))
+
+def dir_database_fallback_path(root_dir, name):
+    """目录不可写时使用的数据库路径: 用户缓存目录下按目录绝对路径区分"""
+    digest = hashlib.blake2b(os.path.abspath(root_dir).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(disasm_ws2.user_cache_dir(), "indexes", f"{digest}{name}")
+
+def connect_dir_database(root_dir, name, db_path=None):
+    """
+    打开保存目录分析结果的 SQLite 数据库 (文本索引、交叉引用缓存)，返回 (连接, 路径)。
+    默认为目录下的 name；游戏目录只读 (光盘、只读共享等) 时改用 dir_database_fallback_path。
+    db_path 指定时直接使用。
+    """
+    if db_path:
+        return sqlite3.connect(db_path, timeout=10), db_path
+    path = os.path.join(root_dir, name)
+    if _dir_database_writable(root_dir, path):
+        try:
+            return sqlite3.connect(path, timeout=10), path
+        except sqlite3.OperationalError:
+            pass
+    path = dir_database_fallback_path(root_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return sqlite3.connect(path, timeout=10), path
+
+def build_fingerprint(input_paths, settings):
+    """输入文件内容哈希 + 输出设置 -> 构建指纹"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(settings).encode('utf-8'))
+    for path in input_paths:
+        h.update(hash_file(path).encode('ascii'))
+    return h.hexdigest()
+
+class BuildManifest:
+    """
+    增量构建清单。
+    记录每个输出文件的构建指纹以及生成时的大小和修改时间，
+    指纹一致且输出文件未被改动时可直接复用上次的结果。
+    """
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.path = os.path.join(self.directory, BUILD_MANIFEST_NAME)
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == BUILD_MANIFEST_VERSION:
+                self.entries = data.get("entries", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def _key(self, out_path):
+        return os.path.relpath(os.path.abspath(out_path), self.directory).replace(os.sep, "/")
+
+    def is_fresh(self, out_path, fingerprint):
+        entry = self.entries.get(self._key(out_path))
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return False
+        try:
+            st = os.stat(out_path)
+        except OSError:
+            return False
+        return entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+
+    def record(self, out_path, fingerprint):
+        st = os.stat(out_path)
+        self.entries[self._key(out_path)] = {
+            "fingerprint": fingerprint,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+        }
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": BUILD_MANIFEST_VERSION, "entries": self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+def split_fresh_tasks(manifest, tasks, describe):
+    """
+    describe(task) 返回 (输入路径列表, 输出路径, 输出设置)。
+    返回 (需要执行的任务, 对应的构建指纹, 复用的任务数)；无法计算指纹的任务照常执行，指纹为 None。
+    """
+    stale_tasks = []
+    fingerprints = []
+    reused = 0
+    for task in tasks:
+        input_paths, out_path, settings = describe(task)
+        try:
+            fingerprint = build_fingerprint(input_paths, settings)
+        except OSError:
+            fingerprint = None
+        if fingerprint is not None and manifest.is_fresh(out_path, fingerprint):
+            reused += 1
+            continue
+        stale_tasks.append(task)
+        fingerprints.append(fingerprint)
+    return stale_tasks, fingerprints, reused
@@ -0,0 +1,636 @@
+# WS2 性能测试
+#
+# 按 OPCODES 签名表生成确定性的合成脚本 (可控制大小、台词密度、选项数量和加密)，并对各处理环节计时。
+# pipeline 的结果可写入 JSON，用于比较不同提交之间的性能。
+#
+# 使用方法:
+#    python ws2_bench.py parse [--instructions N] [--repeat R] [--seed S]
+#    python ws2_bench.py pipeline [--files N] [--instructions N] [--dialogue P] [--choices P] [--decrypted]
+#                                 [--corpus 目录] [--stages 环节,...] [--output 结果.json]
+#    python ws2_bench.py corpus --corpus <输出目录> [--files N] [--instructions N] ...
+#    python ws2_bench.py cipher [--sizes 1,10,100] [--repeat R]
+#    python ws2_bench.py decode [--files N] [--instructions N] [--dialogue P] [--repeat R]
+#    python ws2_bench.py memory [--size-mb 50] [--decrypted] [--tracemalloc]
+#
+
+import io
+import os
+import sys
+import json
+import ast
+import time
+import platform
+import contextlib
+import subprocess
+import random
+import struct
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+import disasm_ws2
+import ws2_json_handler
+
+SAMPLE_TEXTS = [
+    "「おはよう」",
+    "今日はいい天気ですね。",
+    "\\n……そうかな？",
+    "「%LC待って！」",
+    "選択肢",
+    "Hello, world.",
+]
+
+def _synth_value(type_code, rng):
+    if type_code == 0:
+        return rng.randrange(256)
+    if type_code == 1 or type_code == 2:
+        return rng.randrange(65536)
+    if type_code == 3 or type_code == 4:
+        return rng.randrange(1 << 32)
+    if type_code == 5:
+        # 1/4 的整数倍，float32 可精确表示，保证编解码往返一致
+        return rng.randint(-4000, 4000) / 4
+    if type_code == 6 or type_code == 9 or type_code == 10:
+        return rng.choice(SAMPLE_TEXTS)
+    if type_code == 8:
+        return "<M8>"
+    raise ValueError(f"Unknown type code {type_code}")
+
+def synth_args(signature, rng):
+    """按 OpcodeSignature 的解码步骤生成一组参数"""
+    args = []
+    for kind, type_code, _ in signature.steps:
+        if kind == disasm_ws2._STEP_FIXED:
+            args.extend(_synth_value(t, rng) for t in type_code)
+        elif kind == disasm_ws2._STEP_ARRAY:
+            count = rng.randrange(4) if type_code is not None else 0
+            args.append({"count": count, "items": [_synth_value(type_code, rng) for _ in range(count)]})
+        else:
+            args.append(_synth_value(type_code, rng))
+    return args
+
+SAMPLE_NAMES = ["%LC太郎", "%LC花子", "%LF先生", "???"]
+
+def _dialogue_instructions(rng):
+    """一句台词: 可能先设置说话人 (0x15)，然后是 DisplayMessage (0x14)"""
+    if rng.random() < 0.5:
+        yield 0x15, [rng.choice(SAMPLE_NAMES), "<M8>", 0]
+    message = rng.choice(SAMPLE_TEXTS) + rng.choice(["%K%P", "%K", ""])
+    yield 0x14, [rng.randrange(1 << 32), "", "<M8>", message, "<M8>", 0]
+
+def generate_script(instructions=10000, seed=0, dialogue=0.0, choices=0.01, jumps=0.02, max_choices=4):
+    """
+    生成明文 WS2 数据: 普通 opcode 按签名随机取参，按比例穿插台词 (0x15 + 0x14)、跳转 (0x06) 和选项 (0x0F，2~max_choices 项)，
+    指针指向随机选取的指令起点，末尾为 FileEnd。相同参数总是生成相同的数据。
+    dialogue / choices / jumps 为每条指令是台词 / 选项 / 跳转的概率。
+    """
+    rng = random.Random(seed)
+    plain_opcodes = [op for op in range(256)
+                     if disasm_ws2.OPCODE_TABLE[op] is not None and op not in disasm_ws2.SPECIAL_OPCODES]
+
+    out = bytearray()
+    offsets = []
+    fixups = [] # (输出偏移, 目标指令下标)
+    while len(offsets) < instructions:
+        roll = rng.random()
+        if roll < jumps:
+            generated = [(0x06, [0])]
+        elif roll < jumps + choices:
+            items = []
+            for choice_id in range(rng.randint(2, max_choices)):
+                items.append({"id": choice_id, "text": rng.choice(SAMPLE_TEXTS),
+                              "op1": 0, "op2": 0, "op3": 0, "opJump": 6, "pointer": 0})
+            generated = [(0x0F, [len(items), items])]
+        elif roll < jumps + choices + dialogue:
+            generated = _dialogue_instructions(rng)
+        else:
+            opcode = rng.choice(plain_opcodes)
+            generated = [(opcode, synth_args(disasm_ws2.OPCODE_TABLE[opcode], rng))]
+
+        for opcode, args in generated:
+            offsets.append(len(out))
+            instr_bytes, instr_fixups = disasm_ws2.encode_instruction(opcode, args)
+            for pos, _ in instr_fixups:
+                fixups.append((len(out) + pos, rng.randrange(instructions)))
+            out.extend(instr_bytes)
+
+    out.extend(disasm_ws2.encode_instruction(0xFF, [0, 0, 0, 0, 0])[0])
+    for pos, target in fixups:
+        struct.pack_into("<I", out, pos, offsets[target])
+    return bytes(out)
+
+def generate_corpus(out_dir, files=10, instructions=10000, seed=0, dialogue=0.3, choices=0.01, jumps=0.02,
+                    max_choices=4, encrypted=True):
+    """生成 files 个合成 .ws2 (第 i 个的种子为 seed + i)，返回文件路径列表"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(files):
+        data = generate_script(instructions, seed + i, dialogue, choices, jumps, max_choices)
+        if encrypted:
+            data = disasm_ws2.encrypt_ws2(data)
+        path = os.path.join(out_dir, f"bench_{i:04d}.ws2")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+def generate_asm(asm_path, instructions=10000, seed=0):
+    """生成合成脚本并按反汇编器格式写出 .asm.txt"""
+    data = generate_script(instructions, seed)
+    with open(asm_path, "w", encoding="utf-8") as f:
+        f.write(f"解密后大小: {len(data)}\n")
+        for instr in disasm_ws2.decode_instructions(data):
+            f.write(disasm_ws2.format_instruction(instr) + "\n")
+    return asm_path
+
+def _asm_arg_strings(asm_path):
+    """取出每条指令行的参数部分 (去掉 loc_ 前缀、opcode 和 (OpcodeName))"""
+    args_list = []
+    with open(asm_path, "r", encoding="utf-8") as f:
+        for line in f:
+            _, sep, args_str = line.rstrip("\n").partition(") ")
+            if sep:
+                args_list.append(args_str)
+    return args_list
+
+def _parse_args_generic(args_part):
+    # 原先的解析方式: json.loads，失败时 ast.literal_eval
+    args_part = args_part.strip()
+    if not args_part or args_part == "(End)":
+        return []
+    try:
+        return json.loads(args_part)
+    except json.JSONDecodeError:
+        return ast.literal_eval(args_part)
+
+def _best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_parse_args(asm_path, repeat=5):
+    """对比 parse_args 与 json.loads/ast 解析同一文件全部参数的耗时，返回结果字典"""
+    args_list = _asm_arg_strings(asm_path)
+    for args_str in args_list:
+        if disasm_ws2.parse_args(args_str) != _parse_args_generic(args_str):
+            raise ValueError(f"解析结果不一致: {args_str}")
+
+    generic = _best_time(lambda: [_parse_args_generic(a) for a in args_list], repeat)
+    fast = _best_time(lambda: [disasm_ws2.parse_args(a) for a in args_list], repeat)
+    return {"lines": len(args_list), "generic_s": generic, "parse_args_s": fast}
+
+def _decrypt_per_byte(data):
+    # 原先的逐字节实现，作为对照
+    return bytes([disasm_ws2.ror2(b) for b in data])
+
+def _encrypt_per_byte(data):
+    return bytes([disasm_ws2.rol2(b) for b in data])
+
+def bench_cipher(sizes_mb=(1, 10, 100), repeat=3, seed=0):
+    """
+    对比 decrypt_ws2 / encrypt_ws2 与逐字节实现在随机数据上的耗时，并校验输出一致。
+    逐字节实现很慢，只计时一次。返回 [{"mb", "per_byte_s", "table_s", "encrypt_s"}]。
+    """
+    rng = random.Random(seed)
+    results = []
+    for mb in sizes_mb:
+        data = rng.randbytes(mb << 20)
+        start = time.perf_counter()
+        expected = _decrypt_per_byte(data)
+        per_byte = time.perf_counter() - start
+        if disasm_ws2.decrypt_ws2(data) != expected:
+            raise ValueError(f"decrypt_ws2 与逐字节实现不一致 ({mb} MB)")
+        if disasm_ws2.encrypt_ws2(data) != _encrypt_per_byte(data):
+            raise ValueError(f"encrypt_ws2 与逐字节实现不一致 ({mb} MB)")
+        del expected
+        results.append({
+            "mb": mb,
+            "per_byte_s": per_byte,
+            "table_s": _best_time(lambda: disasm_ws2.decrypt_ws2(data), repeat),
+            "encrypt_s": _best_time(lambda: disasm_ws2.encrypt_ws2(data), repeat),
+        })
+    return results
+
+class _LegacyReader:
+    """原先的 BinaryReader: 切片后 struct.unpack，字符串逐字符查找结尾"""
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def read_byte(self):
+        if self.offset >= len(self.data):
+            raise EOFError("文件结束")
+        b = self.data[self.offset]
+        self.offset += 1
+        return b
+
+    def peek_byte(self):
+        if self.offset >= len(self.data):
+            return None
+        return self.data[self.offset]
+
+    def _unpack(self, fmt, size):
+        if self.offset + size > len(self.data):
+            raise EOFError("文件结束")
+        v = struct.unpack(fmt, self.data[self.offset:self.offset + size])[0]
+        self.offset += size
+        return v
+
+    def read_string_bytes(self):
+        start = self.offset
+        terminated = False
+        while self.offset + 1 < len(self.data):
+            if self.data[self.offset] == 0 and self.data[self.offset + 1] == 0:
+                terminated = True
+                break
+            self.offset += 2
+        end = self.offset
+        if not terminated and self.offset + 1 == len(self.data):
+            end = self.offset = len(self.data)
+        raw = self.data[start:end]
+        if terminated:
+            self.offset += 2
+        return raw, terminated
+
+    def value(self, type_code):
+        if type_code == 0:
+            return self.read_byte()
+        if type_code == 1 or type_code == 2:
+            return self._unpack('<H', 2)
+        if type_code == 3 or type_code == 4:
+            return self._unpack('<I', 4)
+        if type_code == 5:
+            return self._unpack('<f', 4)
+        if type_code == 6 or type_code == 9 or type_code == 10:
+            return disasm_ws2._decode_string_for_disasm(*self.read_string_bytes())
+        if type_code == 8:
+            return "<M8>"
+        return None
+
+    def pointer(self):
+        ptr = self._unpack('<I', 4)
+        return f"loc_{ptr:08X}" if ptr != 0 else ptr
+
+def _decode_legacy(data):
+    """
+    原先 disassemble 中的解码循环 (不含文本格式化)，作为对照:
+    每条指令 str(opcode) 查 OPCODES，逐个类型码解释执行。返回 [(偏移, opcode)]。
+    """
+    reader = _LegacyReader(data)
+    decoded = []
+    while reader.offset < len(data):
+        start_offset = reader.offset
+        opcode = reader.read_byte()
+        opcode_str = str(opcode)
+        args = []
+        try:
+            if opcode == 0x01:
+                val = reader.read_byte()
+                args.append(val)
+                peek_val = reader.peek_byte()
+                if val in [2, 128, 129, 130, 192] or (val == 3 and peek_val in [50, 51, 127, 128]):
+                    args += [reader.value(1), reader.value(5), reader.pointer(), reader.pointer()]
+            elif opcode == 0x02 or opcode == 0x06:
+                args.append(reader.pointer())
+            elif opcode == 0x0F:
+                count = reader.read_byte()
+                choices = []
+                for _ in range(count):
+                    item = {"id": reader.value(1), "text": reader.value(6), "op1": reader.read_byte(),
+                            "op2": reader.read_byte(), "op3": reader.read_byte()}
+                    op_jump = item["opJump"] = reader.read_byte()
+                    if op_jump == 6:
+                        item["pointer"] = reader.pointer()
+                    elif op_jump == 7:
+                        item["file"] = reader.value(6)
+                    choices.append(item)
+                args += [count, choices]
+            elif opcode == 0xE6:
+                args += [reader.pointer(), reader.pointer()]
+            elif opcode == 0xFF:
+                args += [reader.value(4)] + [reader.read_byte() for _ in range(4)]
+            elif opcode_str not in disasm_ws2.OPCODES:
+                break
+            else:
+                signature = disasm_ws2.OPCODES[opcode_str]
+                i = 0
+                while i < len(signature):
+                    type_code = signature[i]
+                    if type_code == -1:
+                        break
+                    if type_code == 7:
+                        count = reader.read_byte()
+                        next_type = signature[i + 1] if i + 1 < len(signature) else None
+                        items = [reader.value(next_type) for _ in range(count)] if next_type is not None else []
+                        args.append({"count": count, "items": items})
+                        i += 2
+                        continue
+                    val = reader.value(type_code)
+                    if val is not None:
+                        args.append(val)
+                    i += 1
+        except EOFError:
+            break
+        decoded.append((start_offset, opcode))
+    return decoded
+
+def bench_decode(scripts, repeat=3):
+    """
+    只解码不格式化: 对比 decode_instructions 与原先解释执行的解码循环，返回每秒指令数。
+    scripts 为明文数据列表；两者解码出的指令位置必须一致。
+    """
+    instructions = 0
+    for data in scripts:
+        current = [(instr.offset, instr.opcode) for instr in disasm_ws2.decode_instructions(data)
+                   if isinstance(instr.opcode, int)]
+        if current != _decode_legacy(data):
+            raise ValueError("decode_instructions 与原先的解码结果不一致")
+        instructions += len(current)
+
+    legacy = _best_time(lambda: [_decode_legacy(data) for data in scripts], repeat)
+    table = _best_time(lambda: [list(disasm_ws2.decode_instructions(data)) for data in scripts], repeat)
+    return {
+        "instructions": instructions,
+        "bytes": sum(len(data) for data in scripts),
+        "legacy_s": legacy,
+        "table_s": table,
+        "legacy_per_s": instructions / legacy if legacy > 0 else None,
+        "table_per_s": instructions / table if table > 0 else None,
+    }
+
+# 内存测试的各项任务: idle 只导入模块 (基线)；legacy_disasm 为原先的方式 (整个文件读入、完整解密副本、
+# 全部文本行保存在列表中后再写出)；disasm / extract 为当前的 disassemble_to_file / extract_text_with_mode
+MEMORY_WORKLOADS = ["idle", "legacy_disasm", "disasm", "extract"]
+
+def _memory_workload(workload, path, out_dir):
+    if workload == "legacy_disasm":
+        with open(path, "rb") as f:
+            raw = f.read()
+        mode = disasm_ws2.detect_ws2_type(raw)
+        data = disasm_ws2.decrypt_ws2(raw) if mode == "encrypted" else raw
+        lines = [disasm_ws2.format_instruction(instr) for instr in disasm_ws2.decode_instructions(data)]
+        with open(os.path.join(out_dir, "legacy.asm.txt"), "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+    elif workload == "disasm":
+        disasm_ws2.disassemble_to_file(path, out_dir)
+    elif workload == "extract":
+        ws2_json_handler.extract_text_with_mode(path)
+
+def _peak_rss():
+    """
+    当前进程的峰值 RSS (字节)。
+    Linux 上读取 /proc/self/status 的 VmHWM: 只统计本进程 exec 之后的地址空间，
+    而 ru_maxrss 会保留 fork 时父进程的峰值。
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _memory_child(workload, path, out_dir, use_tracemalloc):
+    """在单独的进程中执行一项任务，返回峰值内存 (字节)"""
+    disasm_ws2.set_detect_cache_enabled(False)
+    if use_tracemalloc:
+        tracemalloc.start()
+        _memory_workload(workload, path, out_dir)
+        return tracemalloc.get_traced_memory()[1]
+    _memory_workload(workload, path, out_dir)
+    return _peak_rss()
+
+def generate_sized_script(size_mb, seed=0, dialogue=0.3):
+    """生成约 size_mb MB 的明文合成脚本 (按小样本的平均指令长度估算指令数)"""
+    sample = generate_script(2000, seed, dialogue)
+    instructions = max(1, int((size_mb << 20) / (len(sample) / 2000)))
+    return generate_script(instructions, seed, dialogue)
+
+def write_sized_script(path, size_mb, seed=0, dialogue=0.3, encrypted=True):
+    data = generate_sized_script(size_mb, seed, dialogue)
+    if encrypted:
+        data = disasm_ws2.encrypt_ws2(data)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+def bench_memory(path, workloads=None, use_tracemalloc=False):
+    """
+    每项任务在新启动的进程中执行 (峰值 RSS 不受之前任务影响)，返回 {任务: 峰值字节数}。
+    use_tracemalloc 为 True (或没有 resource 模块) 时改用 tracemalloc 统计 Python 分配的峰值，
+    此时 mmap 映射的文件不计入。
+    """
+    use_tracemalloc = use_tracemalloc or resource is None
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as out_dir:
+        for workload in workloads or MEMORY_WORKLOADS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results[workload] = executor.submit(_memory_child, workload, path, out_dir, use_tracemalloc).result()
+    return results
+
+# 流水线各环节，按处理顺序排列
+PIPELINE_STAGES = ["detect", "decrypt", "decode", "format", "extract", "parse", "assemble", "import", "encrypt"]
+
+class _PreparedScript:
+    """单个脚本在各环节的输入，计时前准备好，保证每个环节只计自身的耗时"""
+    def __init__(self, path, work_dir):
+        with open(path, "rb") as f:
+            self.raw = f.read()
+        self.path = path
+        self.encrypted = disasm_ws2.detect_ws2_type(self.raw) == 'encrypted'
+        self.plain = disasm_ws2.decrypt_ws2(self.raw) if self.encrypted else self.raw
+        self.instructions = list(disasm_ws2.decode_instructions(self.plain))
+        self.lines = [disasm_ws2.format_instruction(instr) for instr in self.instructions]
+        self.args_list = [line.partition(") ")[2] for line in self.lines]
+        self.entries = ws2_json_handler.extract_text_with_mode(path)[0]
+
+        name = os.path.basename(path)
+        self.asm_path = os.path.join(work_dir, name + ".asm.txt")
+        with open(self.asm_path, "w", encoding="utf-8") as f:
+            f.write(f"解密后大小: {len(self.plain)}\n")
+            for line in self.lines:
+                f.write(line + "\n")
+        self.import_path = os.path.join(work_dir, name)
+
+def _stage_funcs(script):
+    """环节名 -> 对该脚本执行一次的函数；不适用的环节 (未加密脚本的 decrypt) 不出现"""
+    funcs = {
+        "detect": lambda: disasm_ws2.detect_ws2_type(script.raw),
+        "decode": lambda: list(disasm_ws2.decode_instructions(script.plain)),
+        "format": lambda: [disasm_ws2.format_instruction(instr) for instr in script.instructions],
+        "extract": lambda: list(ws2_json_handler.iter_text_records(script.instructions)),
+        "parse": lambda: [disasm_ws2.parse_args(args) for args in script.args_list],
+        "assemble": lambda: disasm_ws2.assemble_from_asm(script.asm_path),
+        "import": lambda: ws2_json_handler.import_entries_to_ws2(script.path, script.entries, script.import_path),
+        "encrypt": lambda: disasm_ws2.encrypt_ws2(script.plain),
+    }
+    if script.encrypted:
+        funcs["decrypt"] = lambda: disasm_ws2.decrypt_ws2(script.raw)
+    return funcs
+
+def bench_pipeline(paths, repeat=3, stages=None):
+    """
+    对一组 .ws2 的各处理环节计时: 每轮对全部文件执行该环节，取 repeat 轮中的最小值。
+    assemble 为 .asm.txt -> 明文 (含 parse)；import 为 JSON 条目导回文件 (含读取与检测)。
+    返回 {环节: {"seconds", "bytes", "mb_per_s"}}，bytes 为该环节处理的明文字节数。
+    """
+    stages = stages or PIPELINE_STAGES
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(io.StringIO()):
+        scripts = [_PreparedScript(path, work_dir) for path in paths]
+        funcs = [_stage_funcs(script) for script in scripts]
+        for stage in stages:
+            runs = [(script, f[stage]) for script, f in zip(scripts, funcs) if stage in f]
+            if not runs:
+                continue
+            total_bytes = sum(len(script.plain) for script, _ in runs)
+            seconds = _best_time(lambda: [func() for _, func in runs], repeat)
+            results[stage] = {
+                "seconds": seconds,
+                "bytes": total_bytes,
+                "mb_per_s": total_bytes / seconds / (1 << 20) if seconds > 0 else None,
+            }
+    return results
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WS2 性能测试")
+    parser.add_argument("bench", choices=["parse", "pipeline", "corpus", "cipher", "decode", "memory"],
+                        help="parse: 汇编参数解析; pipeline: 各处理环节计时; corpus: 只生成合成脚本; "
+                             "cipher: 加解密与逐字节实现对比; decode: 解码速度 (指令/秒) 与原先解码循环对比; "
+                             "memory: 反汇编/提取大脚本的峰值内存")
+    parser.add_argument("--instructions", type=int, default=None, help="每个合成脚本的指令数")
+    parser.add_argument("--repeat", type=int, default=None, help="重复次数 (取最小值)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--files", type=int, default=10, help="合成脚本个数")
+    parser.add_argument("--dialogue", type=float, default=0.3, help="每条指令是台词的概率")
+    parser.add_argument("--choices", type=float, default=0.01, help="每条指令是选项的概率")
+    parser.add_argument("--max-choices", type=int, default=4, help="每个选项指令的最大选项数")
+    parser.add_argument("--jumps", type=float, default=0.02, help="每条指令是跳转的概率")
+    parser.add_argument("--decrypted", action="store_true", help="生成未加密的脚本")
+    parser.add_argument("--corpus", help="pipeline: 使用已有目录中的 .ws2; corpus: 输出目录")
+    parser.add_argument("--stages", help=f"只测试这些环节 (逗号分隔，可选: {','.join(PIPELINE_STAGES)})")
+    parser.add_argument("--output", help="pipeline: 结果写入该 JSON 文件")
+    parser.add_argument("--sizes", default="1,10,100", help="cipher: 测试数据大小 (MB，逗号分隔)")
+    parser.add_argument("--size-mb", type=int, default=50, help="memory: 合成脚本大小 (MB)")
+    parser.add_argument("--tracemalloc", action="store_true", help="memory: 用 tracemalloc 代替峰值 RSS")
+    args = parser.parse_args(argv)
+
+    if args.bench == "cipher":
+        sizes = [int(size) for size in args.sizes.split(",")]
+        print(f"{'MB':>6}{'逐字节(ms)':>14}{'查表(ms)':>12}{'加密(ms)':>12}{'加速比':>10}")
+        for result in bench_cipher(sizes, args.repeat or 3, args.seed):
+            speedup = result["per_byte_s"] / result["table_s"] if result["table_s"] > 0 else float("inf")
+            print(f"{result['mb']:>6}{result['per_byte_s'] * 1000:>14.1f}{result['table_s'] * 1000:>12.1f}"
+                  f"{result['encrypt_s'] * 1000:>12.1f}{speedup:>9.0f}x")
+        return
+
+    if args.bench == "parse":
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            asm_path = generate_asm(os.path.join(tmp_dir, "bench.asm.txt"), args.instructions or 100000, args.seed)
+            result = bench_parse_args(asm_path, args.repeat or 5)
+
+        print(f"参数行数: {result['lines']}")
+        print(f"json.loads/ast: {result['generic_s'] * 1000:.1f} ms")
+        print(f"parse_args:     {result['parse_args_s'] * 1000:.1f} ms")
+        if result["parse_args_s"] > 0:
+            print(f"加速比: {result['generic_s'] / result['parse_args_s']:.2f}x")
+        return
+
+    config = {
+        "files": args.files, "instructions": args.instructions or 10000, "seed": args.seed,
+        "dialogue": args.dialogue, "choices": args.choices, "max_choices": args.max_choices,
+        "jumps": args.jumps, "encrypted": not args.decrypted,
+    }
+    if args.bench == "memory":
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "memory.ws2")
+            # 在单独的进程中生成脚本，本进程不持有数据，测试进程也不会继承其内存
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                size = executor.submit(write_sized_script, path, args.size_mb, args.seed, args.dialogue,
+                                       not args.decrypted).result()
+            results = bench_memory(path, use_tracemalloc=args.tracemalloc)
+
+        kind = "tracemalloc 峰值" if args.tracemalloc or resource is None else "峰值 RSS"
+        print(f"脚本: {size / (1 << 20):.1f} MB ({'未加密' if args.decrypted else '加密'})，{kind}:")
+        for workload, peak in results.items():
+            extra = "" if workload == "idle" else f"  (+{(peak - results['idle']) / (1 << 20):.1f} MB)"
+            print(f"  {workload:<14}{peak / (1 << 20):>10.1f} MB{extra}")
+        return
+
+    if args.bench == "decode":
+        scripts = [generate_script(config["instructions"], args.seed + i, args.dialogue, args.choices, args.jumps,
+                                   args.max_choices) for i in range(args.files)]
+        result = bench_decode(scripts, args.repeat or 3)
+        print(f"指令数: {result['instructions']}，明文: {result['bytes'] / (1 << 20):.1f} MB")
+        print(f"原先的解码循环:     {result['legacy_s'] * 1000:10.1f} ms  {result['legacy_per_s']:>12,.0f} 指令/秒")
+        print(f"decode_instructions: {result['table_s'] * 1000:10.1f} ms  {result['table_per_s']:>12,.0f} 指令/秒")
+        if result["table_s"] > 0:
+            print(f"加速比: {result['legacy_s'] / result['table_s']:.2f}x")
+        return
+
+    if args.bench == "corpus":
+        if not args.corpus:
+            parser.error("corpus 需要 --corpus 输出目录")
+        paths = generate_corpus(args.corpus, **config)
+        print(f"已生成 {len(paths)} 个脚本: {args.corpus}")
+        return
+
+    stages = args.stages.split(",") if args.stages else PIPELINE_STAGES
+    for stage in stages:
+        if stage not in PIPELINE_STAGES:
+            parser.error(f"未知环节: {stage}")
+
+    # 检测缓存会让 detect / import 的耗时失真
+    disasm_ws2.set_detect_cache_enabled(False)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.corpus:
+            paths = disasm_ws2.find_ws2_files(args.corpus)
+            config = {"corpus": os.path.abspath(args.corpus), "files": len(paths)}
+        else:
+            paths = generate_corpus(tmp_dir, **config)
+        results = bench_pipeline(paths, args.repeat or 3, stages)
+
+    for stage, result in results.items():
+        rate = f"{result['mb_per_s']:.1f} MB/s" if result["mb_per_s"] is not None else "-"
+        print(f"{stage:<9} {result['seconds'] * 1000:10.1f} ms  {rate}")
+
+    if args.output:
+        report = {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat or 3,
+            "corpus": config,
+            "stages": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+# WS2 二进制中间格式 (.ws2ir)
+#
+# 作为 .asm.txt 的快速替代: 不经过逐行 json.dumps / json.loads，构建时只需拼接字节并回填指针。
+#
+# 文件布局 (小端):
+#   头部      "WS2IR" + u8 版本 + u32 指令数 + u32 指针数 + u32 正文长度
+#   指令大小  u32 × 指令数          (各指令在正文中依次排列，偏移由大小累加得到)
+#   指针位置  u32 × 指针数          (正文中的字节偏移)
+#   指针类型  u8  × 指针数          (IR_TARGET_INSTR: 值为目标指令下标; IR_TARGET_LITERAL: 值为原样写入的整数)
+#   指针值    u32 × 指针数
+#   正文      指令按 WS2 明文编码依次拼接，指针位置为占位符
+#
+# 指针以目标指令下标记录，修改某条指令的字节后重新构建时所有指针自动重定位。
+# 目标下标等于指令数时表示脚本末尾。
+#
+# 使用方法:
+#    python ws2_ir.py --to-ir <输入.asm.txt> [输出.ws2ir]
+#    python ws2_ir.py --to-asm <输入.ws2ir> [输出.asm.txt]
+#    python ws2_ir.py --bench <输入.asm.txt> [重复次数]
+#
+
+import os
+import sys
+import time
+import array
+import struct
+import tempfile
+import contextlib
+from collections import namedtuple
+
+import disasm_ws2
+import ws2_profile
+
+IR_SUFFIX = ".ws2ir"
+IR_MAGIC = b"WS2IR"
+IR_VERSION = 1
+IR_HEADER = struct.Struct("<5sBIII")
+
+IR_TARGET_LITERAL = 0
+IR_TARGET_INSTR = 1
+
+# sizes / fixup_positions / fixup_values 为 array('I')，fixup_kinds 为 array('B')，body 为 bytes
+ScriptIR = namedtuple("ScriptIR", ["sizes", "fixup_positions", "fixup_kinds", "fixup_values", "body"])
+
+def _new_arrays():
+    return array.array("I"), array.array("I"), array.array("B"), array.array("I")
+
+def ir_from_plaintext(data):
+    """
+    由明文 WS2 数据生成 ScriptIR，指针解析规则与反汇编后 assemble_from_asm 相同:
+    指向指令起点 (包括末尾截断指令的 EOF 记录) 的指针重定位，其余 (如数据末尾) 写 0。
+    """
+    sizes, positions, kinds, values = _new_arrays()
+    body = bytearray()
+    index_of = {} # 原偏移 -> 指令下标
+    pending = [] # (正文偏移, 原指针值)
+
+    for instr in disasm_ws2.decode_instructions(data):
+        index_of[instr.offset] = len(sizes)
+        if instr.opcode == "EOF":
+            continue
+        base = len(body)
+        if instr.opcode in disasm_ws2.POINTER_OPCODES:
+            instr_bytes, instr_fixups = disasm_ws2.encode_instruction(instr.opcode, instr.args)
+            body.extend(instr_bytes)
+            for pos, ptr in instr_fixups:
+                pending.append((base + pos, ptr))
+        else:
+            body.extend(data[instr.offset:instr.offset + instr.size])
+        sizes.append(len(body) - base)
+
+    for pos, ptr in pending:
+        positions.append(pos)
+        if ptr != 0 and ptr in index_of:
+            kinds.append(IR_TARGET_INSTR)
+            values.append(index_of[ptr])
+        else:
+            if ptr != 0:
+                print(f"Warning: Label loc_{ptr:08X} not found, using 0")
+            kinds.append(IR_TARGET_LITERAL)
+            values.append(0)
+
+    return ScriptIR(sizes, positions, kinds, values, bytes(body))
+
+def ir_from_asm(asm_path):
+    """解析 .asm.txt 生成 ScriptIR，指针解析规则与 assemble_from_asm 相同"""
+    sizes, positions, kinds, values = _new_arrays()
+    body = bytearray()
+    labels = {} # name -> 指令下标
+    pending = [] # (正文偏移, 指针参数)
+
+    with open(asm_path, "r", encoding="utf-8") as f:
+        for label, instr_bytes, instr_fixups in disasm_ws2.iter_asm(f):
+            if label is not None:
+                labels[label] = len(sizes)
+            if not instr_bytes:
+                continue
+            base = len(body)
+            body.extend(instr_bytes)
+            for pos, ptr in instr_fixups:
+                pending.append((base + pos, ptr))
+            sizes.append(len(instr_bytes))
+
+    for pos, ptr in pending:
+        positions.append(pos)
+        if isinstance(ptr, str) and ptr in labels:
+            kinds.append(IR_TARGET_INSTR)
+            values.append(labels[ptr])
+        else:
+            kinds.append(IR_TARGET_LITERAL)
+            values.append(struct.unpack("<I", disasm_ws2.encode_pointer(ptr, labels))[0])
+
+    return ScriptIR(sizes, positions, kinds, values, bytes(body))
+
+def build_from_ir(ir):
+    """回填指针，返回明文 WS2 数据"""
+    offsets = array.array("I", [0]) * (len(ir.sizes) + 1)
+    pos = 0
+    for i, size in enumerate(ir.sizes):
+        offsets[i] = pos
+        pos += size
+    offsets[len(ir.sizes)] = pos
+
+    out = bytearray(ir.body)
+    for pos, kind, value in zip(ir.fixup_positions, ir.fixup_kinds, ir.fixup_values):
+        if kind == IR_TARGET_INSTR:
+            value = offsets[value]
+        struct.pack_into("<I", out, pos, value)
+    return bytes(out)
+
+def ir_to_asm_lines(ir):
+    """生成与反汇编器格式相同的汇编文本行 (标签按构建后的偏移命名)"""
+    data = build_from_ir(ir)
+    yield f"解密后大小: {len(data)}"
+    for instr in disasm_ws2.decode_instructions(data):
+        yield disasm_ws2.format_instruction(instr)
+
+def write_ir(path, ir):
+    try:
+        with open(path, "wb") as f:
+            f.write(IR_HEADER.pack(IR_MAGIC, IR_VERSION, len(ir.sizes), len(ir.fixup_positions), len(ir.body)))
+            for arr in (ir.sizes, ir.fixup_positions, ir.fixup_kinds, ir.fixup_values):
+                if sys.byteorder != "little":
+                    arr = array.array(arr.typecode, arr)
+                    arr.byteswap()
+                arr.tofile(f)
+            f.write(ir.body)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+        raise
+    return path
+
+def read_ir(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < IR_HEADER.size:
+        raise ValueError(f"不是有效的 {IR_SUFFIX} 文件: {path}")
+    magic, version, instr_count, fixup_count, body_len = IR_HEADER.unpack_from(data)
+    if magic != IR_MAGIC:
+        raise ValueError(f"不是有效的 {IR_SUFFIX} 文件: {path}")
+    if version != IR_VERSION:
+        raise ValueError(f"不支持的 {IR_SUFFIX} 版本: {version}")
+
+    pos = IR_HEADER.size
+    sizes, positions, kinds, values = _new_arrays()
+    for arr, count in ((sizes, instr_count), (positions, fixup_count), (kinds, fixup_count), (values, fixup_count)):
+        end = pos + count * arr.itemsize
+        arr.frombytes(data[pos:end])
+        if sys.byteorder != "little":
+            arr.byteswap()
+        pos = end
+    body = data[pos:pos + body_len]
+    if len(body) != body_len or len(sizes) != instr_count or len(values) != fixup_count:
+        raise ValueError(f"{IR_SUFFIX} 文件已截断: {path}")
+    return ScriptIR(sizes, positions, kinds, values, body)
+
+def ir_output_name(file_path):
+    """xxx.ws2 / xxx.asm.txt -> xxx.ws2ir"""
+    base = os.path.basename(file_path)
+    if base.lower().endswith(".asm.txt"):
+        base = base[:-8]
+    if base.lower().endswith(".ws2"):
+        base = base[:-4]
+    return base + IR_SUFFIX
+
+def disassemble_to_ir(file_path, output_dir, encryption_mode='auto'):
+    """反汇编 .ws2 为 .ws2ir，返回 (输出路径, 加密模式)"""
+    os.makedirs(output_dir, exist_ok=True)
+    with disasm_ws2.open_ws2(file_path, encryption_mode) as (data, detected_mode):
+        ir = ir_from_plaintext(data)
+    return write_ir(os.path.join(output_dir, ir_output_name(file_path)), ir), detected_mode
+
+def assemble_ir_to_file(ir_path, out_path, encrypt=True):
+    with ws2_profile.stage("read"):
+        ir = read_ir(ir_path)
+    with ws2_profile.stage("assemble"):
+        data = build_from_ir(ir)
+    if encrypt:
+        data = disasm_ws2.encrypt_ws2(data)
+    with ws2_profile.stage("write", len(data)), open(out_path, "wb") as f:
+        f.write(data)
+    return out_path
+
+def asm_to_ir(asm_path, ir_path):
+    return write_ir(ir_path, ir_from_asm(asm_path))
+
+def ir_to_asm(ir_path, asm_path):
+    lines = ir_to_asm_lines(read_ir(ir_path))
+    with open(asm_path, "w", encoding="utf-8", buffering=disasm_ws2.ASM_WRITE_CHUNK_SIZE) as f:
+        for line in lines:
+            f.write(line + "\n")
+    return asm_path
+
+def benchmark_build(asm_path, repeat=5):
+    """比较从 .asm.txt 和 .ws2ir 构建同一脚本的耗时，返回 (asm 秒数, ws2ir 秒数) 的最小值"""
+    ir = ir_from_asm(asm_path)
+    with contextlib.redirect_stdout(None):
+        expected = disasm_ws2.assemble_from_asm(asm_path)
+    if build_from_ir(ir) != expected:
+        raise ValueError("ws2ir 构建结果与 asm 构建结果不一致")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ir_path = write_ir(os.path.join(tmp_dir, ir_output_name(asm_path)), ir)
+        asm_times = []
+        ir_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(None):
+                disasm_ws2.assemble_from_asm(asm_path)
+            asm_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            build_from_ir(read_ir(ir_path))
+            ir_times.append(time.perf_counter() - start)
+    return min(asm_times), min(ir_times)
+
+def print_usage():
+    print("WS2 IR 工具")
+    print("-----------")
+    print("使用方法:")
+    print(f"1. ASM -> IR:   python ws2_ir.py --to-ir <输入.asm.txt> [输出{IR_SUFFIX}]")
+    print(f"2. IR -> ASM:   python ws2_ir.py --to-asm <输入{IR_SUFFIX}> [输出.asm.txt]")
+    print("3. 构建耗时对比: python ws2_ir.py --bench <输入.asm.txt> [重复次数]")
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print_usage()
+        sys.exit(1)
+
+    command, input_path = sys.argv[1], sys.argv[2]
+    try:
+        if command == "--to-ir":
+            out_path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(input_path), ir_output_name(input_path))
+            print(f"输出: {asm_to_ir(input_path, out_path)}")
+        elif command == "--to-asm":
+            if len(sys.argv) > 3:
+                out_path = sys.argv[3]
+            else:
+                out_path = os.path.join(os.path.dirname(input_path), ir_output_name(input_path)[:-len(IR_SUFFIX)] + ".ws2.asm.txt")
+            print(f"输出: {ir_to_asm(input_path, out_path)}")
+        elif command == "--bench":
+            repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+            asm_time, ir_time = benchmark_build(input_path, repeat)
+            print(f"asm.txt 构建: {asm_time * 1000:.2f} ms")
+            print(f"{IR_SUFFIX} 构建: {ir_time * 1000:.2f} ms (读取 + 回填)")
+            if ir_time > 0:
+                print(f"加速比: {asm_time / ir_time:.1f}x")
+        else:
+            print_usage()
+            sys.exit(1)
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
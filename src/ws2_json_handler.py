@@ -1,7 +1,12 @@
+import os
 import json
 import re
-import os
+import hashlib
+import contextlib
+from collections import namedtuple
+
 import disasm_ws2
+import ws2_profile
 
 # 匹配消息末尾的控制符 (%K, %P 等)，提取时需去除
 RE_CONTROL_CODES = re.compile(r'(%(?:K|P))+$')
@@ -17,44 +22,63 @@ def split_name_prefix(raw_name):
 
 def extract_text_from_ws2(file_path, encryption_mode='auto'):
     """从 .ws2 提取文本到 JSON"""
+    return extract_text_with_mode(file_path, encryption_mode)[0]
+
+def extract_text_with_mode(file_path, encryption_mode='auto'):
+    """同 extract_text_from_ws2，返回 (条目列表, 加密模式)"""
+    records, detected_mode = extract_text_records(file_path, encryption_mode)
+    return entries_from_records(records), detected_mode
+
+def entries_from_records(records):
+    """文本记录 -> JSON 条目 (name 记录只用于说话人，不单独成条)"""
+    entries = []
+    with ws2_profile.stage("text"):
+        for record in records:
+            if record.kind == "name":
+                continue
+            out_entry = {}
+            if record.speaker:
+                out_entry["name"] = record.speaker
+            out_entry["message"] = record.text
+            entries.append(out_entry)
+    return entries
+
+# 文本记录: kind 为 "message" / "choice" / "name"，offset 为所在指令的偏移；
+# entry_index 为对应 JSON 条目的下标 (name 记录为其后第一条条目的下标)；
+# speaker 为消息的说话人 (去掉名字前缀)，其他记录为 None
+TextRecord = namedtuple("TextRecord", ["entry_index", "offset", "kind", "speaker", "text"])
+
+def extract_text_records(file_path, encryption_mode='auto'):
+    """从 .ws2 提取带位置信息的文本记录，返回 (记录列表, 加密模式)"""
+    # 边解码边提取，不保留全部指令记录 (iter_text_records 内部忽略单条指令的错误，抛出的只有解码错误)
     try:
-        # 反汇编获取指令
-        lines = disasm_ws2.disassemble(file_path, encryption_mode=encryption_mode)
+        with disasm_ws2.open_ws2(file_path, encryption_mode=encryption_mode) as (data, detected_mode), \
+             ws2_profile.stage("text"):
+            records = list(iter_text_records(disasm_ws2.decode_instructions(data)))
     except Exception as e:
         raise RuntimeError(f"反汇编失败: {str(e)}")
+    return records, detected_mode
 
-    entries = []
-    current_name_raw = None
+def iter_text_records(instructions):
+    """按 JSON 提取规则遍历解码后的指令，生成 TextRecord"""
+    entry_index = 0
     current_name_clean = None
 
-    for line in lines:
-        line = line.strip()
-        if not line.startswith("loc_"):
-            continue
-            
+    for instr in instructions:
+        opcode = instr.opcode
+        args = instr.args
+
         try:
-            # 解析指令: loc_XXXX: Opcode (Name) [Args...]
-            args_start = line.find('[')
-            if args_start == -1:
-                continue
-                
-            opcode_part = line[:args_start].split()
-            if len(opcode_part) < 2:
-                continue
-                
-            opcode = int(opcode_part[1], 16)
-            args = disasm_ws2.parse_args(line[args_start:])
-            
             # SetDisplayName (0x15)
             if opcode == 0x15:
                 if len(args) > 0 and isinstance(args[0], str):
                     raw_name = args[0]
                     if not raw_name:
-                        current_name_raw = None
                         current_name_clean = None
                     else:
-                        current_name_raw = raw_name
                         _, current_name_clean = split_name_prefix(raw_name)
+                        if current_name_clean:
+                            yield TextRecord(entry_index, instr.offset, "name", None, current_name_clean)
                 continue
                 
             # DisplayMessage (0x14)
@@ -62,35 +86,17 @@ def extract_text_from_ws2(file_path, encryption_mode='auto'):
                 if len(args) >= 4 and isinstance(args[3], str):
                     raw_msg = args[3]
                     
-                    # 分离消息和后缀
+                    # 分离消息和后缀 (后缀在导入时按原文保留)
                     msg_text = raw_msg
-                    suffix = ""
                     match = RE_CONTROL_CODES.search(raw_msg)
                     if match:
-                        suffix = match.group(0)
-                        msg_text = raw_msg[:-len(suffix)]
+                        msg_text = raw_msg[:-len(match.group(0))]
                         
                     if not msg_text:
                         continue
 
-                    entry = {
-                        "message": msg_text,
-                        "suffix": suffix # 内部保留后缀状态
-                    }
-                    
-                    if current_name_clean:
-                        entry["name"] = current_name_clean
-                        prefix, _ = split_name_prefix(current_name_raw)
-                        if prefix:
-                            entry["name_prefix"] = prefix
-                    
-                    # 输出条目
-                    out_entry = {}
-                    if "name" in entry:
-                        out_entry["name"] = entry["name"]
-                    out_entry["message"] = entry["message"]
-                    
-                    entries.append(out_entry)
+                    yield TextRecord(entry_index, instr.offset, "message", current_name_clean or None, msg_text)
+                    entry_index += 1
                 continue
                 
             # ShowChoice (0x0F)
@@ -98,79 +104,252 @@ def extract_text_from_ws2(file_path, encryption_mode='auto'):
                 if len(args) >= 2 and isinstance(args[1], list):
                     for choice in args[1]:
                         if isinstance(choice, dict) and "text" in choice:
-                            entries.append({"message": choice["text"]})
+                            yield TextRecord(entry_index, instr.offset, "choice", None, choice["text"])
+                            entry_index += 1
                 continue
                 
         except Exception:
             continue
-            
-    return entries
 
-def import_text_to_ws2(ws2_path, json_path, output_path, encryption_mode='auto', output_encrypt_mode='auto'):
+# 去重导出: 每个文件的 JSON 只保存字符串 ID，文本统一存放在同目录的共享字符串表中
+STRING_TABLE_NAME = "strings.json"
+# 版本 2: ID 为 128 位哈希，表中另存每个 ID 的原文 (sources) 用于检查冲突
+STRING_TABLE_VERSION = 2
+
+def text_id(text):
+    """按原文内容生成稳定的字符串 ID，同一原文在所有文件、所有次导出中 ID 相同"""
+    return "t" + hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def legacy_text_id(text):
+    """版本 1 字符串表使用的 48 位 ID，仅用于沿用旧表中的译文"""
+    return "t" + hashlib.blake2b(text.encode("utf-8"), digest_size=6).hexdigest()
+
+def _id_collision(sid, text, other):
+    return ValueError(f"字符串 ID 冲突: {sid} 同时对应 {text!r} 和 {other!r}")
+
+def merge_strings(target, strings):
+    """将 ID -> 原文合并到 target；同一 ID 对应不同原文时抛出 ValueError，返回 target"""
+    for sid, text in strings.items():
+        existing = target.setdefault(sid, text)
+        if existing != text:
+            raise _id_collision(sid, existing, text)
+    return target
+
+def dedup_entries(entries):
+    """
+    将条目中的 name / message 替换为 name_id / message_id。
+    返回 (引用条目列表, 字符串 ID -> 原文)；非字符串文本 (无法解码的原始字节) 保持内联。
+    同一 ID 对应不同原文 (哈希冲突) 时抛出 ValueError，不会让两句不同的文本共用译文。
+    """
+    strings = {}
+    ref_entries = []
+    for entry in entries:
+        ref_entry = {}
+        for key in ("name", "message"):
+            if key not in entry:
+                continue
+            value = entry[key]
+            if isinstance(value, str):
+                sid = text_id(value)
+                existing = strings.setdefault(sid, value)
+                if existing != value:
+                    raise _id_collision(sid, existing, value)
+                ref_entry[key + "_id"] = sid
+            else:
+                ref_entry[key] = value
+        ref_entries.append(ref_entry)
+    return ref_entries, strings
+
+def resolve_entries(entries, strings):
+    """将 name_id / message_id 引用解析回文本，普通条目原样返回"""
+    resolved = []
+    for entry in entries:
+        if "name_id" not in entry and "message_id" not in entry:
+            resolved.append(entry)
+            continue
+        out_entry = {}
+        for key in ("name", "message"):
+            sid = entry.get(key + "_id")
+            if sid is None:
+                if key in entry:
+                    out_entry[key] = entry[key]
+            elif sid in strings:
+                out_entry[key] = strings[sid]
+            else:
+                raise KeyError(f"字符串表中找不到 {sid}")
+        resolved.append(out_entry)
+    return resolved
+
+def uses_string_table(entries):
+    return any("name_id" in entry or "message_id" in entry for entry in entries)
+
+def string_table_path(json_path):
+    return os.path.join(os.path.dirname(os.path.abspath(json_path)), STRING_TABLE_NAME)
+
+# 已加载的字符串表: 路径 -> (大小, 修改时间, 字符串字典)；批量导入时每个进程只解析一次
+_string_table_cache = {}
+
+def load_string_table(path):
+    st = os.stat(path)
+    cached = _string_table_cache.get(path)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached[2]
+    with open(path, 'r', encoding='utf-8') as f:
+        strings = json.load(f).get("strings", {})
+    _string_table_cache[path] = (st.st_size, st.st_mtime_ns, strings)
+    return strings
+
+def write_string_table(path, strings):
+    """
+    写入共享字符串表。已有表中同一 ID 的文本 (可能已翻译) 保持不变，只追加新出现的字符串。
+    表中 sources 记录每个 ID 的原文，已有 ID 的原文与本次不同 (哈希冲突) 时抛出 ValueError，不写入。
+    版本 1 的表按 48 位 ID 保存，新 ID 首次出现时沿用旧 ID 下已有的译文 (旧条目保留，旧 JSON 仍可导入)。
+    返回新增的字符串数。
+    """
+    merged = {}
+    sources = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        merged = table.get("strings", {})
+        sources = table.get("sources", {})
+    added = 0
+    for sid, text in strings.items():
+        source = sources.get(sid)
+        if source is not None and source != text:
+            raise _id_collision(sid, source, text)
+        if sid not in merged:
+            merged[sid] = merged.get(legacy_text_id(text), text)
+            added += 1
+        sources[sid] = text
+    # 先写入同目录的临时文件再替换，中途失败时原有 (已翻译的) 表保持完整
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": STRING_TABLE_VERSION, "strings": merged, "sources": sources},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return added
+
+def import_text_to_ws2(ws2_path, json_path, output_path, encryption_mode='auto', output_encrypt_mode='auto', strings_path=None):
     """
     将 JSON 文本导回 WS2。
     ws2_path: 原始 WS2 模板
     encryption_mode: 读取模板的解密模式 (auto/encrypted/decrypted)
     output_encrypt_mode: 输出文件的加密模式 (auto/encrypted/decrypted)，auto 则跟随原文件
+    strings_path: 去重导出的共享字符串表，默认为 JSON 同目录的 strings.json (仅 JSON 含字符串 ID 时读取)
+    返回模板的加密模式 (auto 时为检测结果)
     """
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
+        with ws2_profile.stage("text"), open(json_path, 'r', encoding='utf-8') as f:
             json_entries = json.load(f)
+    except Exception as e:
+        raise RuntimeError(f"准备导回数据失败: {str(e)}")
+    return import_entries_to_ws2(ws2_path, json_entries, output_path, encryption_mode, output_encrypt_mode,
+                                 strings_path or string_table_path(json_path))
+
+def import_entries_to_ws2(ws2_path, json_entries, output_path, encryption_mode='auto', output_encrypt_mode='auto', strings_path=None):
+    """同 import_text_to_ws2，条目已解析好 (如来自合并 JSON 的一节)；条目含字符串 ID 时从 strings_path 解析"""
+    # 模板数据在重建完成前保持打开 (未加密模板为 mmap)
+    template = contextlib.ExitStack()
+    try:
+        if uses_string_table(json_entries):
+            if not strings_path:
+                raise ValueError("条目引用了字符串 ID，但未指定字符串表")
+            with ws2_profile.stage("text"):
+                json_entries = resolve_entries(json_entries, load_string_table(strings_path))
             
-        # 1. 检测原文件加密状态 (用于 auto 模式)
-        original_is_encrypted = False
-        if encryption_mode == 'encrypted':
-            original_is_encrypted = True
-        elif encryption_mode == 'decrypted':
-            original_is_encrypted = False
-        else:
-            # Auto detect
-            with open(ws2_path, 'rb') as f:
-                raw_data = f.read()
-                original_is_encrypted = disasm_ws2.detect_ws2_type(raw_data) == 'encrypted'
-
-        # 2. 反汇编模板
-        # 读取时始终建议用 auto 或正确匹配的模式，否则反汇编会乱码
-        lines = disasm_ws2.disassemble(ws2_path, encryption_mode=encryption_mode)
+        # 1. 读取并解码模板 (auto 模式下同时得到原文件加密状态)
+        # 读取时始终建议用 auto 或正确匹配的模式，否则解码会乱码
+        data, detected_mode = template.enter_context(disasm_ws2.open_ws2(ws2_path, encryption_mode=encryption_mode))
+        original_is_encrypted = detected_mode == 'encrypted'
+        instructions = list(disasm_ws2.decode_instructions(data))
         
     except Exception as e:
+        template.close()
         raise RuntimeError(f"准备导回数据失败: {str(e)}")
 
-    # 3. 替换文本
-    lines_to_process = lines
-    processed_lines = [None] * len(lines)
+    with template, ws2_profile.stage("text"):
+        assembled_data = _apply_json_entries(data, instructions, json_entries)
+
+    # 决定输出加密
+    should_encrypt = original_is_encrypted # Default to original
+
+    if output_encrypt_mode == 'encrypted':
+        should_encrypt = True
+    elif output_encrypt_mode == 'decrypted':
+        should_encrypt = False
+    # else auto: keep original
+
+    final_data = assembled_data
+    if should_encrypt:
+        final_data = disasm_ws2.encrypt_ws2(assembled_data)
+
+    with ws2_profile.stage("write", len(final_data)), open(output_path, 'wb') as f:
+        f.write(final_data)
+
+    return detected_mode
+
+# 合并 JSON: 整个游戏的文本放在一个文件中，按脚本键 (相对 WS2 根目录的路径) 分节。
+# .jsonl 每行一节 {"script": 键, "entries": [...]}，可边读边分发；
+# 其他后缀为单个 JSON 对象 {键: [...]}，需整体读取
+MERGED_JSONL_SUFFIX = ".jsonl"
+
+def script_key(ws2_path, root_dir):
+    return os.path.relpath(os.path.abspath(ws2_path), os.path.abspath(root_dir)).replace(os.sep, "/")
+
+def merged_line(key, entries):
+    """合并 JSONL 的一行 (不含换行)"""
+    return json.dumps({"script": key, "entries": entries}, ensure_ascii=False)
+
+def iter_merged_entries(merged_path):
+    """流式读取合并 JSON，生成 (脚本键, 条目列表)"""
+    if merged_path.lower().endswith(MERGED_JSONL_SUFFIX):
+        with open(merged_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    section = json.loads(line)
+                    key, entries = section["script"], section["entries"]
+                except (ValueError, KeyError, TypeError) as e:
+                    raise ValueError(f"{merged_path} 第 {line_no} 行格式错误: {e}")
+                yield key, entries
+    else:
+        with open(merged_path, 'r', encoding='utf-8') as f:
+            sections = json.load(f)
+        if not isinstance(sections, dict):
+            raise ValueError(f"{merged_path} 应为 {{脚本: 条目列表}} 形式的对象")
+        for key, entries in sections.items():
+            yield key, entries
+
+def _apply_json_entries(data, instructions, json_entries):
+    """按顺序将 JSON 条目替换进解码后的指令，返回重建后的明文数据"""
+    # 2. 替换文本 (new_args: 指令下标 -> 替换后的参数)
+    new_args = {}
     
     current_json_idx = 0
-    last_set_name_line_idx = -1
+    last_set_name_idx = -1
     current_name_raw = None
     
-    for i, line in enumerate(lines_to_process):
-        line_stripped = line.strip()
-        if not line_stripped.startswith("loc_"):
-            processed_lines[i] = line
-            continue
-            
+    for i, instr in enumerate(instructions):
+        opcode = instr.opcode
+        
         try:
-            args_start = line.find('[')
-            if args_start == -1:
-                processed_lines[i] = line
-                continue
-                
-            opcode_part = line[:args_start].split()
-            opcode = int(opcode_part[1], 16)
-            args_str = line[args_start:]
-            args = disasm_ws2.parse_args(args_str)
-            
             if opcode == 0x15: # SetDisplayName
+                args = instr.args
                 if len(args) > 0 and isinstance(args[0], str) and args[0]:
-                    last_set_name_line_idx = i
+                    last_set_name_idx = i
                     current_name_raw = args[0]
                 elif len(args) > 0 and args[0] == "":
-                    last_set_name_line_idx = i
+                    last_set_name_idx = i
                     current_name_raw = ""
-                processed_lines[i] = line
                 
             elif opcode == 0x14: # DisplayMessage
+                args = list(instr.args)
                 orig_msg = args[3]
                 orig_text = orig_msg
                 orig_match = RE_CONTROL_CODES.search(orig_msg)
@@ -178,7 +357,6 @@ def import_text_to_ws2(ws2_path, json_path, output_path, encryption_mode='auto',
                     orig_text = orig_msg[:-len(orig_match.group(0))]
                 
                 if not orig_text:
-                    processed_lines[i] = line
                     continue
 
                 if current_json_idx < len(json_entries):
@@ -193,74 +371,36 @@ def import_text_to_ws2(ws2_path, json_path, output_path, encryption_mode='auto',
                         args[3] = new_msg + suffix
                         
                     # 检查 Name 并回溯
-                    if "name" in json_entry and last_set_name_line_idx != -1:
+                    if "name" in json_entry and last_set_name_idx != -1:
                         target_name = json_entry["name"]
                         prefix, curr_clean = split_name_prefix(current_name_raw)
                             
                         if target_name != curr_clean:
-                            set_name_line = lines_to_process[last_set_name_line_idx]
-                            sn_start = set_name_line.find('[')
-                            sn_args = disasm_ws2.parse_args(set_name_line[sn_start:])
+                            sn_args = list(instructions[last_set_name_idx].args)
                             
                             new_raw_name = prefix + target_name
                             sn_args[0] = new_raw_name
                             current_name_raw = new_raw_name
                             
-                            new_sn_line = set_name_line[:sn_start] + json.dumps(sn_args, ensure_ascii=False)
-                            processed_lines[last_set_name_line_idx] = new_sn_line
+                            new_args[last_set_name_idx] = sn_args
                             
-                    new_line = line[:args_start] + json.dumps(args, ensure_ascii=False)
-                    processed_lines[i] = new_line
+                    new_args[i] = args
                     current_json_idx += 1
-                else:
-                    processed_lines[i] = line
                     
             elif opcode == 0x0F: # ShowChoice
-                if len(args) >= 2:
-                    for choice in args[1]:
+                if len(instr.args) >= 2:
+                    choices = [dict(choice) for choice in instr.args[1]]
+                    for choice in choices:
                         if "text" in choice and current_json_idx < len(json_entries):
                             choice["text"] = json_entries[current_json_idx]["message"]
                             current_json_idx += 1
-                    new_line = line[:args_start] + f"[{args[0]}, {json.dumps(args[1], ensure_ascii=False)}]"
-                    processed_lines[i] = new_line
-                else:
-                    processed_lines[i] = line
-            
-            else:
-                processed_lines[i] = line
+                    new_args[i] = [instr.args[0], choices]
                 
         except Exception:
-            processed_lines[i] = line
-
-    # 4. 重新汇编
-    temp_asm = output_path + ".temp.asm"
-    with open(temp_asm, 'w', encoding='utf-8') as f:
-        for l in processed_lines:
-            if l is not None:
-                f.write(l + "\n")
-        
-    try:
-        assembled_data = disasm_ws2.assemble_from_asm(temp_asm)
-        
-        # 决定输出加密
-        should_encrypt = original_is_encrypted # Default to original
-        
-        if output_encrypt_mode == 'encrypted':
-            should_encrypt = True
-        elif output_encrypt_mode == 'decrypted':
-            should_encrypt = False
-        # else auto: keep original
-            
-        final_data = assembled_data
-        if should_encrypt:
-            final_data = disasm_ws2.encrypt_ws2(assembled_data)
-            
-        with open(output_path, 'wb') as f:
-            f.write(final_data)
-            
-    finally:
-        if os.path.exists(temp_asm):
-            os.remove(temp_asm)
+            new_args.pop(i, None)
+
+    # 3. 在内存中重建 (只重新编码被修改的指令，并修正所有指针)
+    return disasm_ws2.rebuild_instructions(data, instructions, new_args)
 
 if __name__ == "__main__":
     import argparse
@@ -268,12 +408,16 @@ if __name__ == "__main__":
     
     def main():
         parser = argparse.ArgumentParser(description="WS2 JSON 工具")
+        parser.add_argument("--no-detect-cache", action="store_true", help="不使用检测缓存")
+        parser.add_argument("--profile", action="store_true", help="结束时输出各环节耗时汇总")
+        parser.add_argument("--pstats", help="同时记录 cProfile 并写入该文件")
         subparsers = parser.add_subparsers(dest="command", help="命令")
         
         # Extract
         p_ext = subparsers.add_parser("extract", help="提取 WS2 到 JSON")
         p_ext.add_argument("input", help="输入 WS2")
         p_ext.add_argument("output", help="输出 JSON")
+        p_ext.add_argument("--dedup", action="store_true", help="去重导出: JSON 只保存字符串 ID，文本写入同目录的 strings.json")
         
         # Import
         p_imp = subparsers.add_parser("import", help="导入 JSON 到 WS2")
@@ -282,12 +426,52 @@ if __name__ == "__main__":
         p_imp.add_argument("output", help="输出 WS2")
         p_imp.add_argument("--encrypt", choices=['auto', 'encrypted', 'decrypted'], default='auto', help="读取解密模式")
         p_imp.add_argument("--output-encrypt", choices=['auto', 'encrypted', 'decrypted'], default='auto', help="输出加密模式")
+        p_imp.add_argument("--strings", help="共享字符串表 (默认为 JSON 同目录的 strings.json)")
+        
+        # Merged
+        p_mext = subparsers.add_parser("extract-merged", help="提取目录中所有 WS2 到一个合并 JSONL")
+        p_mext.add_argument("dir", help="WS2 目录")
+        p_mext.add_argument("output", help="输出 .jsonl")
+        p_mext.add_argument("--dedup", action="store_true", help="去重导出，文本写入同目录的 strings.json")
+        p_mext.add_argument("--jobs", type=int, default=1, help="并行进程数")
+        
+        p_mimp = subparsers.add_parser("import-merged", help="从合并 JSON/JSONL 导入到目录中所有 WS2")
+        p_mimp.add_argument("dir", help="原始 WS2 目录 (模板)")
+        p_mimp.add_argument("json_input", help="合并 .jsonl 或 {脚本: 条目列表} 形式的 .json")
+        p_mimp.add_argument("output_dir", help="输出目录")
+        p_mimp.add_argument("--output-encrypt", choices=['auto', 'encrypted', 'decrypted'], default='auto', help="输出加密模式")
+        p_mimp.add_argument("--jobs", type=int, default=1, help="并行进程数")
+        
+        # Index / Search
+        p_idx = subparsers.add_parser("index", help="建立/增量更新目录的文本索引")
+        p_idx.add_argument("dir", help="WS2 目录")
+        p_idx.add_argument("--db", help="索引文件路径 (默认保存在目录下，目录只读时保存在用户缓存目录)")
+        p_idx.add_argument("--jobs", type=int, default=1, help="并行进程数")
+        
+        p_search = subparsers.add_parser("search", help="在文本索引中搜索 (先增量更新索引)")
+        p_search.add_argument("dir", help="WS2 目录")
+        p_search.add_argument("query", nargs="?", default="", help="搜索的文本 (子串)")
+        p_search.add_argument("--speaker", help="只显示该说话人的消息")
+        p_search.add_argument("--kind", choices=['message', 'name', 'choice'], help="只显示该类型的记录")
+        p_search.add_argument("--limit", type=int, default=200, help="最多显示的结果数")
+        p_search.add_argument("--db", help="索引文件路径 (默认保存在目录下，目录只读时保存在用户缓存目录)")
+        p_search.add_argument("--jobs", type=int, default=1, help="更新索引的并行进程数")
+        p_search.add_argument("--no-update", action="store_true", help="不更新索引，直接搜索")
         
         args = parser.parse_args()
+        if args.no_detect_cache:
+            disasm_ws2.set_detect_cache_enabled(False)
+        if args.profile or args.pstats:
+            disasm_ws2.start_profiling(args.pstats)
         
         if args.command == "extract":
             try:
                 entries = extract_text_from_ws2(args.input)
+                if args.dedup:
+                    entries, strings = dedup_entries(entries)
+                    table_path = string_table_path(args.output)
+                    added = write_string_table(table_path, strings)
+                    print(f"String table {table_path}: {added} new")
                 with open(args.output, 'w', encoding='utf-8') as f:
                     json.dump(entries, f, ensure_ascii=False, indent=2)
                 print(f"Extracted to {args.output}")
@@ -296,11 +480,67 @@ if __name__ == "__main__":
                 
         elif args.command == "import":
             try:
-                import_text_to_ws2(args.ws2_input, args.json_input, args.output, encryption_mode=args.encrypt, output_encrypt_mode=args.output_encrypt)
+                import_text_to_ws2(args.ws2_input, args.json_input, args.output, encryption_mode=args.encrypt, output_encrypt_mode=args.output_encrypt, strings_path=args.strings)
                 print(f"Imported to {args.output}")
             except Exception as e:
                 print(f"Error: {e}")
                 
+        elif args.command == "extract-merged":
+            import ws2_batch
+            try:
+                files = disasm_ws2.find_ws2_files(args.dir)
+                strings = {}
+                failed = 0
+                for result in ws2_batch.run_merged_extract(files, args.dir, args.output, jobs=args.jobs, dedup=args.dedup):
+                    if not result.ok:
+                        failed += 1
+                        print(f"Failed {result.task[0]}: {result.error}")
+                    elif result.value.strings:
+                        merge_strings(strings, result.value.strings)
+                if args.dedup:
+                    table_path = string_table_path(args.output)
+                    added = write_string_table(table_path, strings)
+                    print(f"String table {table_path}: {added} new")
+                print(f"Extracted {len(files) - failed} script(s) to {args.output}, failed {failed}")
+            except Exception as e:
+                print(f"Error: {e}")
+                
+        elif args.command == "import-merged":
+            import ws2_batch
+            try:
+                plan = ws2_batch.MergedImport(args.dir, args.json_input, args.output_dir, output_encrypt_mode=args.output_encrypt)
+                done = failed = 0
+                for result in ws2_batch.run_batch(ws2_batch.json_import_section_job, plan.tasks(), jobs=args.jobs):
+                    if result.ok:
+                        done += 1
+                    else:
+                        failed += 1
+                        print(f"Failed {result.task[0]}: {result.error}")
+                for key in plan.missing:
+                    print(f"Missing in JSON: {key}")
+                for key in plan.extra:
+                    print(f"No such script: {key}")
+                print(f"Imported {done}, failed {failed}, missing {len(plan.missing)}, extra {len(plan.extra)}")
+            except Exception as e:
+                print(f"Error: {e}")
+                
+        elif args.command in ("index", "search"):
+            import ws2_text_index
+            try:
+                with ws2_text_index.TextIndex(args.dir, args.db) as index:
+                    if args.command == "index" or not args.no_update:
+                        stats = index.update(jobs=args.jobs)
+                        for path, error in stats.failed:
+                            print(f"Failed {path}: {error}")
+                        print(f"Indexed {stats.indexed}, unchanged {stats.reused}, removed {stats.removed}, failed {len(stats.failed)}")
+                    if args.command == "search":
+                        hits = index.search(args.query, speaker=args.speaker, kind=args.kind, limit=args.limit)
+                        for hit in hits:
+                            print(ws2_text_index.format_hit(hit))
+                        print(f"{len(hits)} result(s)")
+            except Exception as e:
+                print(f"Error: {e}")
+                
         else:
             parser.print_help()
             
@@ -0,0 +1,188 @@
+# WS2 性能分析
+#
+# 可选的计时层: 启用后 disasm_ws2 / ws2_json_handler 在各处理环节记录耗时和字节数，
+# 解码时按 opcode 类别记录指令数、字节数和耗时。未启用时各环节只多一次函数调用。
+#
+# 环节计时为独占时间: 环节嵌套时 (如写出时边解码边格式化)，内层环节的耗时不计入外层。
+# 以 mmap 读取的文件在解码等环节按需换页，这部分读取时间计入使用数据的环节。
+#
+# 批处理的进程池模式下，每个任务在子进程中单独计时，结果由 ws2_batch 合并回主进程。
+#
+
+import os
+import time
+import tempfile
+import contextlib
+
+# 表格中的环节顺序；其他环节名排在后面
+STAGES = ["read", "detect", "decrypt", "decode", "format", "text", "assemble", "encrypt", "write"]
+
+_clock = time.perf_counter
+
+class Profile:
+    def __init__(self, cprofile=False):
+        self.stages = {} # 环节 -> [秒数, 字节数, 次数]
+        self.opcodes = {} # opcode 类别 -> [秒数, 指令数, 字节数]
+        self._stack = [] # [环节, 开始时间, 内层环节耗时, 字节数]
+        self._cprofile = None
+        self._cprofile_paths = [] # 子进程任务的 cProfile 结果文件
+        if cprofile:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def enter(self, stage, nbytes=0):
+        self._stack.append([stage, _clock(), 0.0, nbytes])
+
+    def exit(self, nbytes=None):
+        stage, start, inner, entered_bytes = self._stack.pop()
+        elapsed = _clock() - start
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        self.add(stage, elapsed - inner, entered_bytes if nbytes is None else nbytes)
+
+    def record(self, stage, seconds, nbytes=0):
+        """记录一段已测得的耗时，同样从外层环节中扣除"""
+        if self._stack:
+            self._stack[-1][2] += seconds
+        self.add(stage, seconds, nbytes)
+
+    def add(self, stage, seconds, nbytes=0, calls=1):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [seconds, nbytes, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += nbytes
+            entry[2] += calls
+
+    def add_opcode(self, opcode_class, seconds, nbytes, count=1):
+        entry = self.opcodes.get(opcode_class)
+        if entry is None:
+            self.opcodes[opcode_class] = [seconds, count, nbytes]
+        else:
+            entry[0] += seconds
+            entry[1] += count
+            entry[2] += nbytes
+
+    @property
+    def cprofile_enabled(self):
+        return self._cprofile is not None
+
+    def snapshot(self):
+        """可跨进程传递的计时结果"""
+        return {"stages": self.stages, "opcodes": self.opcodes}
+
+    def merge(self, snapshot):
+        for stage, (seconds, nbytes, calls) in snapshot["stages"].items():
+            self.add(stage, seconds, nbytes, calls)
+        for opcode_class, (seconds, count, nbytes) in snapshot["opcodes"].items():
+            self.add_opcode(opcode_class, seconds, nbytes, count)
+
+    def add_cprofile_file(self, path):
+        self._cprofile_paths.append(path)
+
+    def dump_pstats(self, path):
+        """合并本进程和子进程的 cProfile 结果写入 pstats 文件 (可用 pstats / snakeviz 查看)"""
+        import pstats
+        if self._cprofile is None:
+            raise ValueError("未启用 cProfile")
+        self._cprofile.disable()
+        stats = pstats.Stats(self._cprofile)
+        for worker_path in self._cprofile_paths:
+            stats.add(worker_path)
+        stats.dump_stats(path)
+        for worker_path in self._cprofile_paths:
+            with contextlib.suppress(OSError):
+                os.remove(worker_path)
+        self._cprofile_paths = []
+        return path
+
+    def format_table(self, wall_seconds=None):
+        """汇总表的文本行"""
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        lines = [f"{'环节':<10}{'耗时(s)':>10}{'占比':>8}{'次数':>8}{'MB':>10}{'MB/s':>10}"]
+        total = sum(entry[0] for entry in self.stages.values())
+        for stage in sorted(self.stages, key=lambda s: (order.get(s, len(order)), s)):
+            seconds, nbytes, calls = self.stages[stage]
+            share = seconds / total * 100 if total > 0 else 0.0
+            mb = nbytes / (1 << 20)
+            rate = f"{mb / seconds:.1f}" if nbytes and seconds > 0 else "-"
+            lines.append(f"{stage:<10}{seconds:>10.3f}{share:>7.1f}%{calls:>8}{mb:>10.1f}{rate:>10}")
+        lines.append(f"{'合计':<10}{total:>10.3f}")
+        if wall_seconds is not None:
+            lines.append(f"{'实际耗时':<10}{wall_seconds:>10.3f}")
+
+        if self.opcodes:
+            lines.append("")
+            lines.append(f"{'opcode 类别':<12}{'解码(s)':>10}{'指令数':>12}{'MB':>10}")
+            for opcode_class, (seconds, count, nbytes) in sorted(self.opcodes.items(), key=lambda kv: -kv[1][0]):
+                lines.append(f"{opcode_class:<12}{seconds:>10.3f}{count:>12}{nbytes / (1 << 20):>10.1f}")
+        return lines
+
+_active = None
+
+def enable(cprofile=False):
+    """开始记录，返回新的 Profile"""
+    global _active
+    _active = Profile(cprofile)
+    return _active
+
+def disable():
+    """停止记录，返回之前的 Profile (未启用时为 None)"""
+    global _active
+    profile, _active = _active, None
+    if profile is not None and profile._cprofile is not None:
+        profile._cprofile.disable()
+    return profile
+
+def active():
+    return _active
+
+@contextlib.contextmanager
+def stage(name, nbytes=0):
+    """在 with 块内记录环节 name 的耗时"""
+    profile = _active
+    if profile is None:
+        yield
+        return
+    profile.enter(name, nbytes)
+    try:
+        yield
+    finally:
+        profile.exit()
+
+def count_bytes(name, nbytes):
+    """只累加环节 name 处理的字节数 (字节数在计时结束后才知道时使用)"""
+    if _active is not None:
+        _active.add(name, 0.0, nbytes, calls=0)
+
+def print_report(pstats_path=None, start_time=None):
+    """停止记录并打印汇总表；pstats_path 不为空时写出 cProfile 结果"""
+    profile = _active
+    if profile is None:
+        return
+    wall = _clock() - start_time if start_time is not None else None
+    disable()
+    print("")
+    for line in profile.format_table(wall):
+        print(line)
+    if pstats_path and profile.cprofile_enabled:
+        print(f"cProfile 结果: {profile.dump_pstats(pstats_path)}")
+
+def run_job(func, task, cprofile=False):
+    """
+    子进程中执行一个任务并单独计时，返回 (任务结果, 计时快照, cProfile 结果文件或 None)。
+    任务抛出异常时照常抛出，计时结果丢弃。
+    """
+    profile = enable(cprofile)
+    try:
+        value = func(*task)
+    finally:
+        disable()
+    stats_path = None
+    if cprofile:
+        fd, stats_path = tempfile.mkstemp(prefix="ws2_profile_", suffix=".pstats")
+        os.close(fd)
+        profile._cprofile.dump_stats(stats_path)
+    return value, profile.snapshot(), stats_path
@@ -0,0 +1,285 @@
+# WS2 统计报告
+#
+# 只解码不格式化: 统计每个脚本的指令数、opcode 频率、字符串字节数、台词和选项数量，
+# 以及无法解析的 RAW 区域和未知 opcode (OPCODE_NAMES 中的 UnkXX)，用于评估新游戏的脚本规模，
+# 并找出妨碍往返构建的 opcode 签名。
+#
+# 使用方法:
+#    python ws2_stats.py <WS2文件或目录> [--csv 报告.csv] [--json 报告.json] [--jobs N] [--top N]
+#
+
+import os
+import csv
+import json
+import argparse
+from collections import namedtuple, Counter
+
+import disasm_ws2
+import ws2_batch
+
+# opcodes: opcode -> 指令数；string_bytes: 参数中字符串的 UTF-16LE 字节数 (含结尾 00 00)；
+# dialogue: DisplayMessage (0x14) 数；choices / choice_items: ShowChoice (0x0F) 数及其中的选项总数；
+# raw_offset / raw_bytes: 第一处无法解析的区域 (无则为 None / 0)；
+# raw_opcode: 该处没有签名的 opcode (有签名的 opcode 只会因被截断而成为 RAW，此时为 None)；
+# truncated / truncated_opcode: 最后一条指令被文件结尾截断及其 opcode
+FileStats = namedtuple("FileStats", [
+    "path", "mode", "size", "instructions", "opcodes", "string_bytes",
+    "dialogue", "choices", "choice_items", "raw_offset", "raw_bytes", "raw_opcode", "truncated",
+    "truncated_opcode",
+])
+
+CSV_FIELDS = [
+    "path", "mode", "size", "instructions", "string_bytes", "dialogue", "choices", "choice_items",
+    "unknown_instructions", "unknown_opcodes", "raw_offset", "raw_bytes", "raw_opcode", "truncated", "truncated_opcode",
+]
+
+_STRING_TYPES = (6, 9, 10)
+
+def _string_arg_indexes(signature):
+    """签名中字符串参数 (含字符串数组) 在参数列表中的下标"""
+    indexes = []
+    arg_index = 0
+    for kind, type_code, _ in signature.steps:
+        if kind == disasm_ws2._STEP_FIXED:
+            arg_index += len(type_code)
+            continue
+        if kind == disasm_ws2._STEP_STRING or (kind == disasm_ws2._STEP_ARRAY and type_code in _STRING_TYPES):
+            indexes.append(arg_index)
+        arg_index += 1
+    return tuple(indexes)
+
+# opcode -> 字符串参数下标；特殊 opcode 中只有 ShowChoice 含字符串，单独处理
+STRING_ARG_INDEXES = [
+    _string_arg_indexes(sig) if sig is not None and op not in disasm_ws2.SPECIAL_OPCODES else ()
+    for op, sig in enumerate(disasm_ws2.OPCODE_TABLE)
+]
+
+def _string_bytes(value):
+    if isinstance(value, str):
+        return len(value.encode("utf-16le", errors="surrogatepass")) + 2
+    if isinstance(value, dict):
+        if "raw" in value:
+            return len(value["raw"]) // 2 + (2 if value.get("terminated", True) else 0)
+        # 字符串数组
+        return sum(_string_bytes(item) for item in value.get("items", ()))
+    return 0
+
+def scan_plaintext(data, path="", mode=None):
+    """统计明文 WS2 数据，返回 FileStats"""
+    opcodes = Counter()
+    string_bytes = 0
+    choices = 0
+    choice_items = 0
+    raw_offset = None
+    raw_bytes = 0
+    raw_opcode = None
+    truncated_opcode = None
+    instructions = 0
+
+    for instr in disasm_ws2.decode_instructions(data):
+        opcode = instr.opcode
+        if opcode == "RAW":
+            raw_offset = instr.offset
+            raw_bytes = instr.size
+            # 截断的已知 opcode 也以 RAW 保留剩余字节 (其后紧跟 EOF 记录)，不计为无签名
+            if disasm_ws2.OPCODE_TABLE[data[instr.offset]] is None:
+                raw_opcode = data[instr.offset]
+            continue
+        if opcode == "EOF":
+            truncated_opcode = instr.args
+            continue
+        instructions += 1
+        opcodes[opcode] += 1
+        args = instr.args
+        for i in STRING_ARG_INDEXES[opcode]:
+            string_bytes += _string_bytes(args[i])
+        if opcode == 0x0F:
+            choices += 1
+            for choice in args[1]:
+                choice_items += 1
+                string_bytes += _string_bytes(choice.get("text")) + _string_bytes(choice.get("file"))
+
+    return FileStats(path, mode, len(data), instructions, dict(opcodes), string_bytes,
+                     opcodes.get(0x14, 0), choices, choice_items, raw_offset, raw_bytes, raw_opcode,
+                     truncated_opcode is not None, truncated_opcode)
+
+def stats_job(file_path, encryption_mode='auto'):
+    with disasm_ws2.open_ws2(file_path, encryption_mode) as (data, mode):
+        return scan_plaintext(data, file_path, mode)
+
+def unknown_opcodes(stats):
+    """该文件中名称为 UnkXX 的 opcode -> 指令数"""
+    return {op: count for op, count in stats.opcodes.items() if disasm_ws2.OPCODE_IS_UNKNOWN[op]}
+
+def csv_row(stats, root_dir=None):
+    unknown = unknown_opcodes(stats)
+    path = os.path.relpath(stats.path, root_dir) if root_dir else stats.path
+    return {
+        "path": path.replace(os.sep, "/"),
+        "mode": stats.mode,
+        "size": stats.size,
+        "instructions": stats.instructions,
+        "string_bytes": stats.string_bytes,
+        "dialogue": stats.dialogue,
+        "choices": stats.choices,
+        "choice_items": stats.choice_items,
+        "unknown_instructions": sum(unknown.values()),
+        "unknown_opcodes": " ".join(f"{op:02X}:{count}" for op, count in sorted(unknown.items())),
+        "raw_offset": "" if stats.raw_offset is None else f"loc_{stats.raw_offset:08X}",
+        "raw_bytes": stats.raw_bytes,
+        "raw_opcode": "" if stats.raw_opcode is None else f"{stats.raw_opcode:02X}",
+        "truncated": int(stats.truncated),
+        "truncated_opcode": "" if stats.truncated_opcode is None else f"{stats.truncated_opcode:02X}",
+    }
+
+class StatsReport:
+    """汇总多个文件的 FileStats"""
+    def __init__(self, root_dir=None):
+        self.root = root_dir
+        self.files = []
+        self.failed = [] # (路径, 错误信息)
+        self.opcodes = Counter()
+        self.opcode_files = Counter() # opcode -> 出现该 opcode 的文件数
+        self.raw_opcodes = Counter() # 导致 RAW 的无签名 opcode -> 文件数
+        self.truncated_opcodes = Counter() # 被文件结尾截断的 opcode -> 文件数
+
+    def add(self, stats):
+        self.files.append(stats)
+        self.opcodes.update(stats.opcodes)
+        self.opcode_files.update(stats.opcodes.keys())
+        if stats.raw_opcode is not None:
+            self.raw_opcodes[stats.raw_opcode] += 1
+        if stats.truncated_opcode is not None:
+            self.truncated_opcodes[stats.truncated_opcode] += 1
+
+    def totals(self):
+        return {
+            "files": len(self.files),
+            "failed": len(self.failed),
+            "size": sum(s.size for s in self.files),
+            "instructions": sum(s.instructions for s in self.files),
+            "string_bytes": sum(s.string_bytes for s in self.files),
+            "dialogue": sum(s.dialogue for s in self.files),
+            "choices": sum(s.choices for s in self.files),
+            "choice_items": sum(s.choice_items for s in self.files),
+            "raw_files": sum(1 for s in self.files if s.raw_offset is not None),
+            "raw_bytes": sum(s.raw_bytes for s in self.files),
+            "truncated_files": sum(1 for s in self.files if s.truncated),
+        }
+
+    def hotspots(self):
+        """
+        妨碍往返构建的 opcode，按影响排序:
+        没有签名、导致 RAW 的 opcode 在前 (按文件数)，其后为签名未确认的 UnkXX (按指令数)，
+        最后为在文件结尾被截断的 opcode (按文件数，签名可能读取了过多参数)。
+        """
+        result = []
+        for op, files in self.raw_opcodes.most_common():
+            result.append({"opcode": f"{op:02X}", "name": disasm_ws2.OPCODE_DISPLAY_NAMES[op],
+                           "kind": "raw", "files": files, "instructions": None})
+        unknown = [(op, count) for op, count in self.opcodes.items() if disasm_ws2.OPCODE_IS_UNKNOWN[op]]
+        for op, count in sorted(unknown, key=lambda kv: -kv[1]):
+            result.append({"opcode": f"{op:02X}", "name": disasm_ws2.OPCODE_DISPLAY_NAMES[op],
+                           "kind": "unknown", "files": self.opcode_files[op], "instructions": count})
+        for op, files in self.truncated_opcodes.most_common():
+            result.append({"opcode": f"{op:02X}", "name": disasm_ws2.OPCODE_DISPLAY_NAMES[op],
+                           "kind": "truncated", "files": files, "instructions": None})
+        return result
+
+    def histogram(self):
+        """全部文件的 opcode 频率 (降序)"""
+        return [{"opcode": f"{op:02X}", "name": disasm_ws2.OPCODE_DISPLAY_NAMES[op],
+                 "instructions": count, "files": self.opcode_files[op]}
+                for op, count in self.opcodes.most_common()]
+
+    def write_csv(self, path):
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for stats in self.files:
+                writer.writerow(csv_row(stats, self.root))
+        return path
+
+    def write_json(self, path):
+        files = []
+        for stats in self.files:
+            row = csv_row(stats, self.root)
+            row["opcodes"] = {f"{op:02X}": count for op, count in sorted(stats.opcodes.items())}
+            files.append(row)
+        report = {
+            "totals": self.totals(),
+            "hotspots": self.hotspots(),
+            "histogram": self.histogram(),
+            "files": files,
+            "failed": [{"path": p, "error": e} for p, e in self.failed],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+
+def scan_files(files, root_dir=None, jobs=1, encryption_mode='auto'):
+    """并行统计多个文件，返回 StatsReport"""
+    report = StatsReport(root_dir)
+    tasks = [(path, encryption_mode) for path in files]
+    for result in ws2_batch.run_batch(stats_job, tasks, jobs=jobs):
+        if result.ok:
+            report.add(result.value)
+        else:
+            report.failed.append((result.task[0], result.error))
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WS2 统计报告")
+    parser.add_argument("input", help="WS2 文件或目录")
+    parser.add_argument("--csv", help="每个文件一行的 CSV 报告")
+    parser.add_argument("--json", help="含汇总、opcode 频率和每个文件统计的 JSON 报告")
+    parser.add_argument("--jobs", type=int, default=1, help="并行进程数")
+    parser.add_argument("--top", type=int, default=10, help="显示的 opcode 个数")
+    parser.add_argument("--no-detect-cache", action="store_true", help="不使用检测缓存")
+    args = parser.parse_args(argv)
+
+    if args.no_detect_cache:
+        disasm_ws2.set_detect_cache_enabled(False)
+    files = disasm_ws2.find_ws2_files(args.input)
+    if not files:
+        print(f"在 {args.input} 未找到 .ws2 文件")
+        return 1
+
+    root = args.input if os.path.isdir(args.input) else os.path.dirname(args.input)
+    report = scan_files(files, root, jobs=args.jobs)
+    for path, error in report.failed:
+        print(f"失败 {path}: {error}")
+
+    totals = report.totals()
+    print(f"文件: {totals['files']} (失败 {totals['failed']})，大小: {totals['size'] / (1 << 20):.1f} MB")
+    print(f"指令: {totals['instructions']}，字符串: {totals['string_bytes'] / (1 << 20):.1f} MB")
+    print(f"台词: {totals['dialogue']}，选项: {totals['choices']} 组 / {totals['choice_items']} 项")
+    print(f"含 RAW 区域的文件: {totals['raw_files']} ({totals['raw_bytes']} 字节)，被截断: {totals['truncated_files']}")
+
+    print("")
+    print(f"最常见的 {args.top} 个 opcode:")
+    for entry in report.histogram()[:args.top]:
+        print(f"  {entry['opcode']} {entry['name']:<20} {entry['instructions']:>10}  ({entry['files']} 个文件)")
+
+    hotspots = report.hotspots()
+    if hotspots:
+        print("")
+        print("!! 妨碍往返构建的 opcode:")
+        for entry in hotspots[:args.top]:
+            if entry["kind"] == "raw":
+                print(f"  {entry['opcode']} {entry['name']:<20} 无签名，{entry['files']} 个文件在此处中断解析")
+            elif entry["kind"] == "truncated":
+                print(f"  {entry['opcode']} {entry['name']:<20} 在文件结尾被截断，{entry['files']} 个文件")
+            else:
+                print(f"  {entry['opcode']} {entry['name']:<20} 签名未确认，{entry['instructions']} 条 ({entry['files']} 个文件)")
+
+    if args.csv:
+        print(f"CSV: {report.write_csv(args.csv)}")
+    if args.json:
+        print(f"JSON: {report.write_json(args.json)}")
+    return 0
+
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
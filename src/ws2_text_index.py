@@ -0,0 +1,159 @@
+# WS2 文本索引
+#
+# 对目录中所有 .ws2 的消息、名字和选项建立持久化全文索引 (SQLite FTS5，trigram 分词，支持日文/中文子串搜索)，
+# 用于查找某句台词或某个说话人出现在哪个脚本中。
+# 索引文件默认保存在被索引的目录下 (目录只读时保存在用户缓存目录)；更新时只重新提取大小/修改时间/内容哈希发生变化的文件。
+# SQLite 不支持 FTS5 时退化为普通表 + LIKE 搜索。
+
+import os
+import sqlite3
+from collections import namedtuple
+
+import disasm_ws2
+import ws2_batch
+
+TEXT_INDEX_NAME = ".ws2_text_index.sqlite3"
+# 表结构或提取规则变化时递增版本号，旧索引会被清空重建
+TEXT_INDEX_VERSION = 1
+
+# path 为相对索引根目录的路径 ("/" 分隔)
+SearchHit = namedtuple("SearchHit", ["path", "offset", "entry_index", "kind", "speaker", "text"])
+# indexed: 重新提取的文件数; reused: 未变化的文件数; removed: 已删除的文件数; failed: [(路径, 错误信息)]
+IndexUpdate = namedtuple("IndexUpdate", ["indexed", "reused", "removed", "failed"])
+
+class TextIndex:
+    def __init__(self, root_dir, db_path=None):
+        self.root = os.path.abspath(root_dir)
+        self.conn, self.path = ws2_batch.connect_dir_database(self.root, TEXT_INDEX_NAME, db_path)
+        self.fts = self._init_schema()
+
+    def _init_schema(self):
+        conn = self.conn
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != str(TEXT_INDEX_VERSION):
+            conn.execute("DROP TABLE IF EXISTS files")
+            conn.execute("DROP TABLE IF EXISTS entries")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(TEXT_INDEX_VERSION),))
+
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT, mode TEXT)"
+        )
+        exists = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'entries'").fetchone()
+        if exists is None:
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE entries USING fts5("
+                    "text, speaker, path UNINDEXED, kind UNINDEXED, offset UNINDEXED, entry_index UNINDEXED, "
+                    "tokenize='trigram')"
+                )
+            except sqlite3.OperationalError:
+                conn.execute(
+                    "CREATE TABLE entries ("
+                    "text TEXT, speaker TEXT, path TEXT, kind TEXT, offset INTEGER, entry_index INTEGER)"
+                )
+                conn.execute("CREATE INDEX entries_path ON entries (path)")
+            conn.commit()
+            exists = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'entries'").fetchone()
+        conn.commit()
+        return "VIRTUAL TABLE" in exists[0].upper()
+
+    def _key(self, file_path):
+        return os.path.relpath(os.path.abspath(file_path), self.root).replace(os.sep, "/")
+
+    def update(self, jobs=1):
+        """增量更新索引，返回 IndexUpdate"""
+        conn = self.conn
+        known = {row[0]: row[1:] for row in conn.execute("SELECT path, size, mtime_ns, digest FROM files")}
+
+        stale = [] # (文件路径, 索引键, stat, 内容哈希)
+        seen = set()
+        reused = 0
+        for file_path in disasm_ws2.find_ws2_files(self.root):
+            key = self._key(file_path)
+            seen.add(key)
+            st = os.stat(file_path)
+            entry = known.get(key)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                reused += 1
+                continue
+            digest = ws2_batch.hash_file(file_path)
+            if entry and entry[2] == digest:
+                # 只是修改时间变化，内容相同
+                conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?", (st.st_size, st.st_mtime_ns, key))
+                reused += 1
+                continue
+            stale.append((file_path, key, st, digest))
+
+        removed = [key for key in known if key not in seen]
+        for key in removed:
+            self._remove(key)
+
+        failed = []
+        tasks = [(file_path,) for file_path, _, _, _ in stale]
+        try:
+            for result in ws2_batch.run_batch(ws2_batch.text_records_job, tasks, jobs=jobs):
+                file_path, key, st, digest = stale[result.index]
+                self._remove(key)
+                if not result.ok:
+                    failed.append((file_path, result.error))
+                    continue
+                records, mode = result.value
+                conn.executemany(
+                    "INSERT INTO entries (text, speaker, path, kind, offset, entry_index) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(r.text, r.speaker, key, r.kind, r.offset, r.entry_index)
+                     for r in records if isinstance(r.text, str)]
+                )
+                conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)", (key, st.st_size, st.st_mtime_ns, digest, mode))
+        finally:
+            conn.commit()
+        return IndexUpdate(len(stale) - len(failed), reused, len(removed), failed)
+
+    def _remove(self, key):
+        self.conn.execute("DELETE FROM entries WHERE path = ?", (key,))
+        self.conn.execute("DELETE FROM files WHERE path = ?", (key,))
+
+    def search(self, query, speaker=None, kind=None, limit=200):
+        """
+        在消息/名字/选项文本和说话人中搜索子串 query，可按说话人 (完全匹配) 和记录类型过滤。
+        query 为空时只按过滤条件列出。返回按文件和偏移排序的 SearchHit 列表。
+        """
+        where = []
+        params = []
+        if query:
+            if self.fts and len(query) >= 3:
+                # trigram 分词下短语查询即子串匹配
+                where.append("entries MATCH ?")
+                params.append('{text speaker} : "' + query.replace('"', '""') + '"')
+            else:
+                pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                where.append("(text LIKE ? ESCAPE '\\' OR speaker LIKE ? ESCAPE '\\')")
+                params.extend([pattern, pattern])
+        if speaker:
+            where.append("speaker = ?")
+            params.append(speaker)
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+
+        sql = "SELECT path, offset, entry_index, kind, speaker, text FROM entries"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY path, offset, entry_index LIMIT ?"
+        params.append(limit)
+        return [SearchHit(*row) for row in self.conn.execute(sql, params)]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def format_hit(hit):
+    """path:loc_XXXXXXXX #条目下标 [类型] 说话人: 文本"""
+    text = hit.text if hit.speaker is None else f"{hit.speaker}: {hit.text}"
+    return f"{hit.path}:loc_{hit.offset:08X} #{hit.entry_index} [{hit.kind}] {text}"
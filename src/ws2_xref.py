@@ -0,0 +1,335 @@
+# WS2 交叉引用与控制流分析
+#
+# 单遍扫描解码结果，得到:
+#   - 交叉引用表: 跳转目标偏移 -> 引用它的指令偏移 (0x01 / 0x02 / 0x06 / 0xE6 / ShowChoice)
+#   - 基本块控制流图
+#   - RunFile (0x04) / NextFile (0x07) / ShowChoice 跳转脚本 构成的跨文件调用图
+# 目录的分析结果缓存在目录下的 SQLite 文件中 (目录只读时保存在用户缓存目录)，
+# 按大小/修改时间/内容哈希增量更新，之后的查询无需重新解码。
+#
+# 使用方法:
+#    python ws2_xref.py <WS2目录> [--xrefs 脚本 偏移] [--cfg 脚本] [--calls] [--jobs N] [--db 路径]
+#
+
+import os
+import json
+import bisect
+import sqlite3
+import argparse
+from collections import namedtuple
+
+import disasm_ws2
+import ws2_batch
+
+XREF_CACHE_NAME = ".ws2_xref_cache.sqlite3"
+# 分析规则或缓存格式变化时递增版本号，旧缓存会被清空
+XREF_CACHE_VERSION = 1
+
+# 不会继续执行下一条指令的 opcode: 无条件跳转、选项 (跳到所选分支)、切换脚本、脚本结束
+NO_FALLTHROUGH_OPCODES = {0x06, 0x07, 0x0F, 0xFF}
+# 跨文件调用: 0x04 / 0x07 的第一个参数为脚本名，ShowChoice 中 opJump 为 7 的选项带 "file"
+FILE_CALL_OPCODES = {0x04, 0x07}
+
+# start / end 为块的起止偏移 (end 不含)；successors 为后继块起点 (升序)
+BasicBlock = namedtuple("BasicBlock", ["start", "end", "count", "successors"])
+# offset 为调用指令的偏移，name 为脚本中写的名字
+FileCall = namedtuple("FileCall", ["offset", "opcode", "name"])
+# xrefs: 目标偏移 -> 引用它的指令偏移列表 (升序)；
+# bad_targets: [(指令偏移, 目标)]，目标不是指令起点 (汇编时会被写成 0)
+ScriptAnalysis = namedtuple("ScriptAnalysis", ["size", "instructions", "blocks", "xrefs", "calls", "bad_targets"])
+# target 为解析到的脚本键，找不到时为 None
+CallEdge = namedtuple("CallEdge", ["source", "offset", "opcode", "name", "target"])
+# analyzed: 重新分析的文件数; reused: 未变化的文件数; removed: 已删除的文件数; failed: [(路径, 错误信息)]
+XrefUpdate = namedtuple("XrefUpdate", ["analyzed", "reused", "removed", "failed"])
+
+def branch_targets(instr):
+    """指令中的跳转目标偏移 (0 表示无目标，不计入)"""
+    opcode, args = instr.opcode, instr.args
+    if opcode == 0x01:
+        targets = args[3:5]
+    elif opcode == 0x02 or opcode == 0x06:
+        targets = args[:1]
+    elif opcode == 0xE6:
+        targets = args[:2]
+    elif opcode == 0x0F:
+        targets = [choice["pointer"] for choice in args[1] if "pointer" in choice]
+    else:
+        return []
+    return [t for t in targets if t != 0]
+
+def _file_calls(instr):
+    if instr.opcode in FILE_CALL_OPCODES:
+        names = instr.args[:1]
+    elif instr.opcode == 0x0F:
+        names = [choice["file"] for choice in instr.args[1] if "file" in choice]
+    else:
+        return []
+    return [FileCall(instr.offset, instr.opcode, name) for name in names if isinstance(name, str)]
+
+def analyze_plaintext(data):
+    """分析明文 WS2 数据，返回 ScriptAnalysis"""
+    starts = [] # 指令偏移
+    ends = [] # 指令是否结束基本块
+    fallthrough = [] # 指令结束基本块时能否顺序执行到下一条
+    targets_of = {} # 指令偏移 -> 跳转目标
+    calls = []
+
+    for instr in disasm_ws2.decode_instructions(data):
+        if instr.opcode == "EOF":
+            continue
+        starts.append(instr.offset)
+        if instr.opcode == "RAW":
+            ends.append(True)
+            fallthrough.append(False)
+            continue
+        targets = branch_targets(instr)
+        if targets:
+            targets_of[instr.offset] = targets
+        calls.extend(_file_calls(instr))
+        no_fallthrough = instr.opcode in NO_FALLTHROUGH_OPCODES
+        ends.append(no_fallthrough or bool(targets))
+        fallthrough.append(not no_fallthrough)
+
+    instr_starts = set(starts)
+    xrefs = {}
+    bad_targets = []
+    for source, targets in targets_of.items():
+        for target in targets:
+            if target in instr_starts:
+                xrefs.setdefault(target, []).append(source)
+            else:
+                bad_targets.append((source, target))
+
+    # 基本块起点: 脚本开头、跳转目标、结束基本块的指令之后
+    leaders = set(xrefs)
+    if starts:
+        leaders.add(starts[0])
+    for i, is_end in enumerate(ends[:-1]):
+        if is_end:
+            leaders.add(starts[i + 1])
+
+    blocks = []
+    block_start = 0
+    for i, start in enumerate(starts):
+        last = i + 1 == len(starts)
+        if not last and not ends[i] and starts[i + 1] not in leaders:
+            continue
+        end = len(data) if last else starts[i + 1]
+        successors = {t for t in targets_of.get(start, ()) if t in instr_starts}
+        if fallthrough[i] and not last:
+            successors.add(end)
+        blocks.append(BasicBlock(starts[block_start], end, i + 1 - block_start, sorted(successors)))
+        block_start = i + 1
+
+    return ScriptAnalysis(len(data), len(starts), blocks, xrefs, calls, bad_targets)
+
+def analyze_file(file_path, encryption_mode='auto'):
+    """返回 (ScriptAnalysis, 加密模式)"""
+    with disasm_ws2.open_ws2(file_path, encryption_mode) as (data, detected_mode):
+        return analyze_plaintext(data), detected_mode
+
+def analysis_to_json(analysis):
+    return json.dumps({
+        "size": analysis.size,
+        "instructions": analysis.instructions,
+        "blocks": [list(b) for b in analysis.blocks],
+        "xrefs": sorted(analysis.xrefs.items()),
+        "calls": [list(c) for c in analysis.calls],
+        "bad_targets": analysis.bad_targets,
+    }, ensure_ascii=False, separators=(",", ":"))
+
+def analysis_from_json(text):
+    obj = json.loads(text)
+    return ScriptAnalysis(
+        obj["size"], obj["instructions"],
+        [BasicBlock(*b) for b in obj["blocks"]],
+        {target: sources for target, sources in obj["xrefs"]},
+        [FileCall(*c) for c in obj["calls"]],
+        [tuple(b) for b in obj["bad_targets"]],
+    )
+
+def analysis_job(file_path):
+    """进程池任务: 返回 (序列化的分析结果, 加密模式)"""
+    analysis, mode = analyze_file(file_path)
+    return analysis_to_json(analysis), mode
+
+def _call_name_key(name):
+    name = name.replace("\\", "/").lower()
+    if name.endswith(".ws2"):
+        name = name[:-4]
+    return name
+
+class XrefIndex:
+    def __init__(self, root_dir, db_path=None):
+        self.root = os.path.abspath(root_dir)
+        self.conn, self.path = ws2_batch.connect_dir_database(self.root, XREF_CACHE_NAME, db_path)
+        self._loaded = {}
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = self.conn
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != str(XREF_CACHE_VERSION):
+            conn.execute("DROP TABLE IF EXISTS files")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(XREF_CACHE_VERSION),))
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT, mode TEXT, analysis TEXT)"
+        )
+        conn.commit()
+
+    def _key(self, file_path):
+        if not os.path.isabs(file_path) and not os.path.exists(file_path):
+            return file_path.replace(os.sep, "/")
+        return os.path.relpath(os.path.abspath(file_path), self.root).replace(os.sep, "/")
+
+    def update(self, jobs=1):
+        """增量更新缓存，返回 XrefUpdate"""
+        conn = self.conn
+        known = {row[0]: row[1:] for row in conn.execute("SELECT path, size, mtime_ns, digest FROM files")}
+
+        stale = [] # (文件路径, 缓存键, stat, 内容哈希)
+        seen = set()
+        reused = 0
+        for file_path in disasm_ws2.find_ws2_files(self.root):
+            key = self._key(file_path)
+            seen.add(key)
+            st = os.stat(file_path)
+            entry = known.get(key)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                reused += 1
+                continue
+            digest = ws2_batch.hash_file(file_path)
+            if entry and entry[2] == digest:
+                conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?", (st.st_size, st.st_mtime_ns, key))
+                reused += 1
+                continue
+            stale.append((file_path, key, st, digest))
+
+        removed = [key for key in known if key not in seen]
+        for key in removed:
+            conn.execute("DELETE FROM files WHERE path = ?", (key,))
+
+        failed = []
+        tasks = [(file_path,) for file_path, _, _, _ in stale]
+        try:
+            for result in ws2_batch.run_batch(analysis_job, tasks, jobs=jobs):
+                file_path, key, st, digest = stale[result.index]
+                self._loaded.pop(key, None)
+                if not result.ok:
+                    conn.execute("DELETE FROM files WHERE path = ?", (key,))
+                    failed.append((file_path, result.error))
+                    continue
+                analysis, mode = result.value
+                conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, st.st_size, st.st_mtime_ns, digest, mode, analysis))
+        finally:
+            conn.commit()
+        for key in removed:
+            self._loaded.pop(key, None)
+        return XrefUpdate(len(stale) - len(failed), reused, len(removed), failed)
+
+    def scripts(self):
+        """已分析的脚本键 (升序)"""
+        return [row[0] for row in self.conn.execute("SELECT path FROM files ORDER BY path")]
+
+    def analysis(self, script):
+        """返回脚本 (路径或相对根目录的键) 的 ScriptAnalysis，未分析时抛出 KeyError"""
+        key = self._key(script)
+        if key not in self._loaded:
+            row = self.conn.execute("SELECT analysis FROM files WHERE path = ?", (key,)).fetchone()
+            if row is None:
+                raise KeyError(f"脚本未分析: {key}")
+            self._loaded[key] = analysis_from_json(row[0])
+        return self._loaded[key]
+
+    def xrefs_to(self, script, offset):
+        """跳转到 offset 的指令偏移列表"""
+        return self.analysis(script).xrefs.get(offset, [])
+
+    def block_at(self, script, offset):
+        """包含 offset 的基本块，不在任何块内时返回 None"""
+        blocks = self.analysis(script).blocks
+        i = bisect.bisect_right([b.start for b in blocks], offset) - 1
+        if i >= 0 and offset < blocks[i].end:
+            return blocks[i]
+        return None
+
+    def predecessors(self, script, block_start):
+        """后继中包含 block_start 的基本块"""
+        return [b for b in self.analysis(script).blocks if block_start in b.successors]
+
+    def call_graph(self):
+        """脚本键 -> [CallEdge]，调用名按相对路径或文件名 (不区分大小写，可省略 .ws2) 解析"""
+        scripts = self.scripts()
+        by_name = {}
+        for key in scripts:
+            by_name.setdefault(_call_name_key(os.path.basename(key)), key)
+        for key in scripts:
+            by_name[_call_name_key(key)] = key
+
+        graph = {}
+        for key in scripts:
+            edges = []
+            for call in self.analysis(key).calls:
+                name = _call_name_key(call.name)
+                target = by_name.get(name) or by_name.get(name.rsplit("/", 1)[-1])
+                edges.append(CallEdge(key, call.offset, call.opcode, call.name, target))
+            graph[key] = edges
+        return graph
+
+    def callers(self, script):
+        """调用 script 的 CallEdge 列表"""
+        key = self._key(script)
+        return [edge for edges in self.call_graph().values() for edge in edges if edge.target == key]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def parse_offset(text):
+    """接受 loc_XXXXXXXX、0x 前缀或十六进制数"""
+    text = text.strip()
+    if text.lower().startswith("loc_"):
+        text = text[4:]
+    return int(text, 16)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WS2 交叉引用与控制流分析")
+    parser.add_argument("dir", help="WS2 目录")
+    parser.add_argument("--xrefs", nargs=2, metavar=("脚本", "偏移"), help="列出跳转到该偏移的指令")
+    parser.add_argument("--cfg", metavar="脚本", help="输出脚本的基本块和后继")
+    parser.add_argument("--calls", action="store_true", help="输出跨文件调用图")
+    parser.add_argument("--jobs", type=int, default=1, help="并行进程数")
+    parser.add_argument("--db", help="缓存文件路径 (默认保存在目录下，目录只读时保存在用户缓存目录)")
+    args = parser.parse_args(argv)
+
+    with XrefIndex(args.dir, args.db) as index:
+        stats = index.update(jobs=args.jobs)
+        for path, error in stats.failed:
+            print(f"Failed {path}: {error}")
+        print(f"Analyzed {stats.analyzed}, unchanged {stats.reused}, removed {stats.removed}, failed {len(stats.failed)}")
+
+        if args.xrefs:
+            script, offset = args.xrefs[0], parse_offset(args.xrefs[1])
+            for source in index.xrefs_to(script, offset):
+                print(f"loc_{source:08X} -> loc_{offset:08X}")
+        if args.cfg:
+            for block in index.analysis(args.cfg).blocks:
+                successors = ", ".join(f"loc_{s:08X}" for s in block.successors)
+                print(f"loc_{block.start:08X}-loc_{block.end:08X} ({block.count}) -> [{successors}]")
+        if args.calls:
+            for key, edges in index.call_graph().items():
+                for edge in edges:
+                    target = edge.target or "(未找到)"
+                    name = disasm_ws2.OPCODE_DISPLAY_NAMES[edge.opcode]
+                    print(f"{key}:loc_{edge.offset:08X} {name} {edge.name} -> {target}")
+
+if __name__ == '__main__':
+    main()
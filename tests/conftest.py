@@ -0,0 +1,10 @@
+import os
+import sys
+
+# 工具脚本都是 src/ 下的平铺模块
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+import disasm_ws2
+
+# 测试不读写用户目录下的检测缓存
+disasm_ws2.set_detect_cache_enabled(False)
@@ -0,0 +1,79 @@
+# 批处理辅助函数测试: 并行列目录的 scan_ws2_files 与 find_ws2_files 返回相同的文件和顺序；
+# 目录只读时 connect_dir_database 改用用户缓存目录，不同目录互不冲突。
+
+import os
+
+import pytest
+
+import disasm_ws2
+import ws2_batch
+
+def make_tree(root):
+    # 名称故意与创建顺序、字典序都不一致
+    layout = {
+        "": ["b.ws2", "A.WS2", "note.txt"],
+        "z": ["1.ws2"],
+        "z/deep/er": ["x.ws2", "c.ws2"],
+        "a": ["q.ws2"],
+        "a/sub": ["m.ws2"],
+        "m.ws2": ["inside.ws2"], # 名为 .ws2 的目录
+        "empty": [],
+    }
+    for rel, names in layout.items():
+        directory = os.path.join(root, rel)
+        os.makedirs(directory, exist_ok=True)
+        for name in names:
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(b"\x00")
+
+def test_scan_matches_find_order(tmp_path):
+    make_tree(str(tmp_path))
+    expected = disasm_ws2.find_ws2_files(str(tmp_path))
+    assert len(expected) == 8
+    for threads in (1, 4):
+        assert ws2_batch.scan_ws2_files(str(tmp_path), threads=threads) == expected
+
+def test_scan_single_file(tmp_path):
+    path = tmp_path / "one.ws2"
+    path.write_bytes(b"\x00")
+    assert ws2_batch.scan_ws2_files(str(path)) == disasm_ws2.find_ws2_files(str(path)) == [str(path)]
+
+def test_dir_database_falls_back_to_user_cache(tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache))
+    monkeypatch.setenv("LOCALAPPDATA", str(cache))
+    for name in ("a", "b"):
+        os.makedirs(tmp_path / name)
+
+    conn, path = ws2_batch.connect_dir_database(str(tmp_path / "a"), ".db")
+    conn.close()
+    assert path == str(tmp_path / "a" / ".db")
+
+    monkeypatch.setattr(ws2_batch, "_dir_database_writable", lambda root_dir, path: False)
+    paths = []
+    for name in ("a", "b", "a"):
+        conn, path = ws2_batch.connect_dir_database(str(tmp_path / name), ".db")
+        conn.execute("CREATE TABLE IF NOT EXISTS t (x)")
+        conn.close()
+        paths.append(path)
+    assert paths[0] == paths[2] != paths[1]
+    assert all(path.startswith(str(cache)) and os.path.exists(path) for path in paths)
+
+    explicit = str(tmp_path / "explicit.db")
+    conn, path = ws2_batch.connect_dir_database(str(tmp_path / "a"), ".db", explicit)
+    conn.close()
+    assert path == explicit
+
+@pytest.mark.skipif(os.name == "nt" or os.geteuid() == 0, reason="需要非 root 的 POSIX 权限")
+def test_dir_database_read_only_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    root = tmp_path / "ro"
+    os.makedirs(root)
+    os.chmod(root, 0o555)
+    try:
+        conn, path = ws2_batch.connect_dir_database(str(root), ".db")
+        conn.execute("CREATE TABLE t (x)")
+        conn.close()
+    finally:
+        os.chmod(root, 0o755)
+    assert path.startswith(str(tmp_path / "cache"))
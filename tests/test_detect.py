@@ -0,0 +1,99 @@
+# 加密检测回归测试: 合成的明文/加密脚本及其截断、篡改版本，
+# 期望结果由改为并行逐条扫描之前的 detect_ws2_type 生成。
+
+import os
+import random
+
+import pytest
+
+import disasm_ws2
+import ws2_bench
+
+def detect_corpus():
+    cases = [("empty", b""), ("ff", b"\xff"), ("zero", b"\x00"), ("two_ff", b"\xff\xff")]
+    rng = random.Random(2024)
+    cases.append(("random_1k", rng.randbytes(1024)))
+    cases.append(("random_8k", rng.randbytes(8192)))
+    for seed in range(16):
+        plain = ws2_bench.generate_script(instructions=40 + seed * 37, seed=seed,
+                                          dialogue=0.3 if seed % 2 else 0.0, choices=0.05, jumps=0.05)
+        encrypted = disasm_ws2.encrypt_ws2(plain)
+        cut = rng.randrange(1, len(plain))
+        mutated = bytearray(plain)
+        for _ in range(1 + seed % 4):
+            pos = rng.randrange(len(mutated))
+            mutated[pos] = rng.randrange(256)
+        mutated = bytes(mutated)
+        cases += [
+            (f"plain_{seed}", plain),
+            (f"encrypted_{seed}", encrypted),
+            (f"plain_truncated_{seed}", plain[:cut]),
+            (f"encrypted_truncated_{seed}", encrypted[:cut]),
+            (f"plain_mutated_{seed}", mutated),
+            (f"encrypted_mutated_{seed}", disasm_ws2.encrypt_ws2(mutated)),
+            (f"plain_no_end_{seed}", plain[:-1]),
+            (f"encrypted_no_end_{seed}", encrypted[:-1]),
+        ]
+    return cases
+
+# 与 detect_corpus() 的顺序一一对应 (6 个特殊输入，之后每个种子 8 个变体): E = encrypted, D = decrypted, U = unknown
+EXPECTED = (
+    "UDDDDD"
+    "DEDEDEDEDEDEDEDEDEDEDEDEDEDEDEDE"  # seed 0-3
+    "DEDEDEDEDEDEDEDEDEDEDEDEDEDEEDDE"  # seed 4-7
+    "DEDEDEDEDEDEDEDEDEDEDEDEDEDEDEDE"  # seed 8-11
+    "DEDDDEDDDEDEDEDEDEDEDEDEDEDEDEDE"  # seed 12-15
+)
+VERDICTS = {"E": "encrypted", "D": "decrypted", "U": "unknown"}
+
+CORPUS = detect_corpus()
+
+def test_corpus_matches_expected_length():
+    assert len(CORPUS) == len(EXPECTED)
+
+@pytest.mark.parametrize("chunk_sizes", [None, (64, 16), (7, 3)], ids=["default", "small_chunks", "tiny_chunks"])
+def test_detect_verdicts(monkeypatch, chunk_sizes):
+    # 小的分块大小让按需解密在指令中间跨越缓冲区边界
+    if chunk_sizes:
+        monkeypatch.setattr(disasm_ws2, "DETECT_CHUNK_SIZE", chunk_sizes[0])
+        monkeypatch.setattr(disasm_ws2, "DECRYPT_CHUNK_SIZE", chunk_sizes[1])
+    mismatches = []
+    for (name, data), code in zip(CORPUS, EXPECTED):
+        verdict = disasm_ws2.detect_ws2_type(data)
+        if verdict != VERDICTS[code]:
+            mismatches.append((name, verdict, VERDICTS[code]))
+    assert mismatches == []
+
+def test_detect_reuses_full_decryption(monkeypatch):
+    monkeypatch.setattr(disasm_ws2, "DETECT_CHUNK_SIZE", 64)
+    monkeypatch.setattr(disasm_ws2, "DECRYPT_CHUNK_SIZE", 16)
+    # 检测结果为 encrypted 时，open_ws2 直接使用检测中已完整解密的缓冲区
+    reused = 0
+    for name, data in CORPUS:
+        mode, decrypted = disasm_ws2._detect_ws2(data)
+        if mode == "encrypted" and decrypted is not None:
+            assert bytes(decrypted) == disasm_ws2.decrypt_ws2(data), name
+            reused += 1
+    assert reused > 0
+
+def test_detect_cache_hits_skip_recent_refresh(tmp_path, monkeypatch):
+    path = tmp_path / "a.ws2"
+    data = disasm_ws2.encrypt_ws2(ws2_bench.generate_script(instructions=50, seed=1, dialogue=0.3))
+    path.write_bytes(data)
+    st = os.stat(path)
+    cache = disasm_ws2.DetectCache(str(tmp_path / "cache.sqlite3"))
+    try:
+        cache.store(str(path), st, data, "encrypted")
+        assert cache.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        last_used = lambda: cache.conn.execute("SELECT last_used FROM detect_cache").fetchone()[0]
+        stored = last_used()
+        # 最近使用过的条目命中时不写数据库
+        assert cache.lookup(str(path), st, data) == "encrypted"
+        assert last_used() == stored
+        monkeypatch.setattr(disasm_ws2, "DETECT_CACHE_TOUCH_INTERVAL_NS", -1)
+        assert cache.lookup(str(path), st, data) == "encrypted"
+        assert last_used() > stored
+        # 内容变化后不命中
+        assert cache.lookup(str(path), st, data[:-1] + bytes([data[-1] ^ 0xFF])) is None
+    finally:
+        cache.close()
@@ -0,0 +1,77 @@
+# .ws2ir 构建与 .asm.txt 构建的一致性测试: 完整、截断 (末尾为 RAW / EOF 记录) 和
+# 指针指向数据末尾或截断指令的脚本，ir_from_plaintext / ir_from_asm / rebuild_instructions
+# 的输出与反汇编后 assemble_from_asm 逐字节一致。
+
+import random
+import struct
+
+import pytest
+
+import disasm_ws2
+import ws2_bench
+import ws2_ir
+
+def build_all(data, tmp_path):
+    path = tmp_path / "script.ws2"
+    path.write_bytes(data)
+    asm_path, _ = disasm_ws2.disassemble_to_file(str(path), str(tmp_path), "decrypted")
+    return {
+        "asm": disasm_ws2.assemble_from_asm(asm_path),
+        "ir_plaintext": ws2_ir.build_from_ir(ws2_ir.ir_from_plaintext(data)),
+        "ir_asm": ws2_ir.build_from_ir(ws2_ir.ir_from_asm(asm_path)),
+        "rebuild": disasm_ws2.rebuild_instructions(data, list(disasm_ws2.decode_instructions(data))),
+    }
+
+def assert_same(data, tmp_path):
+    results = build_all(data, tmp_path)
+    expected = results.pop("asm")
+    for name, built in results.items():
+        assert built == expected, name
+    return expected
+
+def jump_script(seed):
+    plain = ws2_bench.generate_script(instructions=80, seed=seed, dialogue=0.3, choices=0.1, jumps=0.2)
+    jumps = [instr for instr in disasm_ws2.decode_instructions(plain) if instr.opcode == 0x06]
+    assert jumps
+    return plain, jumps
+
+@pytest.mark.parametrize("seed", range(12))
+def test_truncated_scripts(seed, tmp_path):
+    plain = ws2_bench.generate_script(instructions=60, seed=seed, dialogue=0.3, choices=0.2, jumps=0.3)
+    rng = random.Random(seed)
+    # 截断到 100 字节以上: 更短时 "解密后大小: NN" 一行会被汇编器当作 opcode 解析
+    for cut in [len(plain)] + [rng.randrange(100, len(plain)) for _ in range(8)]:
+        assert_same(plain[:cut], tmp_path)
+
+def test_truncated_tail_has_raw_and_eof():
+    # 确认语料覆盖 RAW 区域后紧跟截断指令 (同一偏移上的 RAW 与 EOF 记录)
+    found = 0
+    for seed in range(12):
+        plain = ws2_bench.generate_script(instructions=60, seed=seed, dialogue=0.3, choices=0.2, jumps=0.3)
+        for cut in range(100, len(plain), 7):
+            instrs = list(disasm_ws2.decode_instructions(plain[:cut]))
+            if len(instrs) >= 2 and instrs[-2].opcode == "RAW" and instrs[-1].opcode == "EOF":
+                found += 1
+    assert found
+
+@pytest.mark.parametrize("seed", range(4))
+def test_jump_to_end_of_data(seed, tmp_path):
+    plain, jumps = jump_script(seed)
+    data = bytearray(plain)
+    struct.pack_into("<I", data, jumps[0].offset + 1, len(data))
+    built = assert_same(bytes(data), tmp_path)
+    # 数据末尾不是指令起点，与汇编器一致写 0
+    assert struct.unpack_from("<I", built, jumps[0].offset + 1)[0] == 0
+
+@pytest.mark.parametrize("seed", range(4))
+def test_jump_to_truncated_instruction(seed, tmp_path):
+    plain, jumps = jump_script(seed)
+    instrs = list(disasm_ws2.decode_instructions(plain))
+    # 截断最后一条多字节指令，使其成为 EOF 记录，再让第一个跳转指向它
+    last = next(instr for instr in reversed(instrs) if instr.size > 1 and instr.offset > jumps[0].offset)
+    data = bytearray(plain[:last.offset + 1])
+    struct.pack_into("<I", data, jumps[0].offset + 1, last.offset)
+    assert list(disasm_ws2.decode_instructions(bytes(data)))[-1].opcode == "EOF"
+    built = assert_same(bytes(data), tmp_path)
+    # 截断的指令不输出，指针指向脚本末尾
+    assert struct.unpack_from("<I", built, jumps[0].offset + 1)[0] == len(built)
@@ -0,0 +1,125 @@
+# JSON 导入: 直接修补二进制的导入结果必须与原先 "反汇编 -> 改写 .asm.txt -> 汇编" 的流程逐字节一致。
+
+import os
+import json
+import random
+
+import pytest
+
+import disasm_ws2
+import ws2_bench
+import ws2_json_handler
+
+def import_via_asm(ws2_path, json_entries, output_path, work_dir):
+    """原先的导入流程 (参照实现): 逐行改写反汇编文本后用 assemble_from_asm 重新汇编"""
+    with open(ws2_path, 'rb') as f:
+        original_is_encrypted = disasm_ws2.detect_ws2_type(f.read()) == 'encrypted'
+    lines = disasm_ws2.disassemble(ws2_path)
+
+    processed_lines = list(lines)
+    current_json_idx = 0
+    last_set_name_line_idx = -1
+    current_name_raw = None
+    for i, line in enumerate(lines):
+        if not line.strip().startswith("loc_"):
+            continue
+        args_start = line.find('[')
+        if args_start == -1:
+            continue
+        opcode = int(line[:args_start].split()[1], 16)
+        args = disasm_ws2.parse_args(line[args_start:])
+
+        if opcode == 0x15:
+            if len(args) > 0 and isinstance(args[0], str):
+                last_set_name_line_idx = i
+                current_name_raw = args[0]
+        elif opcode == 0x14:
+            orig_msg = args[3]
+            match = ws2_json_handler.RE_CONTROL_CODES.search(orig_msg)
+            orig_text = orig_msg[:-len(match.group(0))] if match else orig_msg
+            if not orig_text or current_json_idx >= len(json_entries):
+                continue
+            json_entry = json_entries[current_json_idx]
+            if "message" in json_entry:
+                args[3] = json_entry["message"] + (match.group(0) if match else "")
+            if "name" in json_entry and last_set_name_line_idx != -1:
+                target_name = json_entry["name"]
+                prefix, curr_clean = ws2_json_handler.split_name_prefix(current_name_raw)
+                if target_name != curr_clean:
+                    set_name_line = lines[last_set_name_line_idx]
+                    sn_start = set_name_line.find('[')
+                    sn_args = disasm_ws2.parse_args(set_name_line[sn_start:])
+                    current_name_raw = sn_args[0] = prefix + target_name
+                    processed_lines[last_set_name_line_idx] = set_name_line[:sn_start] + json.dumps(sn_args, ensure_ascii=False)
+            processed_lines[i] = line[:args_start] + json.dumps(args, ensure_ascii=False)
+            current_json_idx += 1
+        elif opcode == 0x0F and len(args) >= 2:
+            for choice in args[1]:
+                if "text" in choice and current_json_idx < len(json_entries):
+                    choice["text"] = json_entries[current_json_idx]["message"]
+                    current_json_idx += 1
+            processed_lines[i] = line[:args_start] + f"[{args[0]}, {json.dumps(args[1], ensure_ascii=False)}]"
+
+    temp_asm = os.path.join(work_dir, os.path.basename(output_path) + ".temp.asm")
+    with open(temp_asm, 'w', encoding='utf-8') as f:
+        for line in processed_lines:
+            f.write(line + "\n")
+    data = disasm_ws2.assemble_from_asm(temp_asm)
+    with open(output_path, 'wb') as f:
+        f.write(disasm_ws2.encrypt_ws2(data) if original_is_encrypted else data)
+
+def edit_entries(entries, kind, rng):
+    """按 kind 修改提取出的条目: unchanged / longer / shorter / names / mixed"""
+    edited = []
+    for entry in entries:
+        entry = dict(entry)
+        action = rng.choice(["unchanged", "longer", "shorter", "names"]) if kind == "mixed" else kind
+        if action == "longer":
+            entry["message"] = entry["message"] + "（訳文が原文より長い場合）"
+        elif action == "shorter":
+            entry["message"] = entry["message"][:1]
+        elif action == "names" and "name" in entry:
+            entry["name"] = rng.choice(["Taro", "花子さん", "", "先生"])
+        edited.append(entry)
+    return edited
+
+EDITS = ["unchanged", "longer", "shorter", "names", "mixed"]
+
+@pytest.fixture(scope="module")
+def scripts(tmp_path_factory):
+    root = tmp_path_factory.mktemp("json_import")
+    paths = []
+    for seed in range(6):
+        data = ws2_bench.generate_script(instructions=300, seed=seed, dialogue=0.4, choices=0.05, jumps=0.05)
+        if seed % 2:
+            data = disasm_ws2.encrypt_ws2(data)
+        path = root / f"script_{seed}.ws2"
+        path.write_bytes(data)
+        paths.append(str(path))
+    return paths
+
+@pytest.mark.parametrize("kind", EDITS)
+def test_import_matches_asm_pipeline(scripts, kind, tmp_path):
+    rng = random.Random(kind)
+    for ws2_path in scripts:
+        entries = edit_entries(ws2_json_handler.extract_text_from_ws2(ws2_path), kind, rng)
+        name = os.path.basename(ws2_path)
+        expected_path = str(tmp_path / ("expected_" + name))
+        actual_path = str(tmp_path / ("actual_" + name))
+        import_via_asm(ws2_path, entries, expected_path, str(tmp_path))
+        ws2_json_handler.import_entries_to_ws2(ws2_path, entries, actual_path)
+        with open(expected_path, 'rb') as f1, open(actual_path, 'rb') as f2:
+            assert f1.read() == f2.read(), f"{name} ({kind})"
+
+def test_edits_move_pointers(scripts, tmp_path):
+    # 长度变化后指针确实被修正 (否则上面的比较可能只覆盖了不含指针的情况)
+    ws2_path = scripts[0]
+    entries = edit_entries(ws2_json_handler.extract_text_from_ws2(ws2_path), "longer", random.Random(0))
+    out_path = str(tmp_path / "longer.ws2")
+    ws2_json_handler.import_entries_to_ws2(ws2_path, entries, out_path)
+    with disasm_ws2.open_ws2(ws2_path) as (data, _):
+        before = [instr for instr in disasm_ws2.decode_instructions(data) if instr.opcode in disasm_ws2.POINTER_OPCODES]
+    with disasm_ws2.open_ws2(out_path) as (data, _):
+        after = [instr for instr in disasm_ws2.decode_instructions(data) if instr.opcode in disasm_ws2.POINTER_OPCODES]
+    assert len(before) == len(after) > 0
+    assert any(a.args != b.args for a, b in zip(before, after))
@@ -0,0 +1,75 @@
+# 反汇编 -> .asm.txt -> 汇编 往返测试: 合成的明文/加密脚本 (含大量 ShowChoice 和跳转指针)
+# 重新汇编后与原文件逐字节一致，流式的 assemble_to_file 与 assemble_from_asm (+ 加密) 一致。
+
+import pytest
+
+import disasm_ws2
+import ws2_bench
+
+SCRIPTS = {
+    "plain": dict(instructions=400, seed=1, dialogue=0.3),
+    "encrypted": dict(instructions=400, seed=2, dialogue=0.3),
+    "choices": dict(instructions=600, seed=3, dialogue=0.2, choices=0.2, jumps=0.2, max_choices=8),
+    "choices_encrypted": dict(instructions=600, seed=4, dialogue=0.2, choices=0.2, jumps=0.2, max_choices=8),
+}
+
+@pytest.fixture(params=sorted(SCRIPTS))
+def script(request, tmp_path):
+    name = request.param
+    plain = ws2_bench.generate_script(**SCRIPTS[name])
+    encrypted = name.endswith("encrypted")
+    data = disasm_ws2.encrypt_ws2(plain) if encrypted else plain
+    path = tmp_path / f"{name}.ws2"
+    path.write_bytes(data)
+    asm_path, mode = disasm_ws2.disassemble_to_file(str(path), str(tmp_path))
+    assert mode == ("encrypted" if encrypted else "decrypted")
+    return plain, data, asm_path, encrypted
+
+def test_pointer_heavy_scripts_have_choices():
+    plain = ws2_bench.generate_script(**SCRIPTS["choices"])
+    opcodes = [instr.opcode for instr in disasm_ws2.decode_instructions(plain)]
+    assert opcodes.count(0x0F) > 50
+    assert sum(op in disasm_ws2.POINTER_OPCODES for op in opcodes) > 100
+
+def test_assemble_from_asm_roundtrip(script):
+    plain, _, asm_path, _ = script
+    assert disasm_ws2.assemble_from_asm(asm_path) == plain
+
+@pytest.mark.parametrize("chunk_size", [None, 1000, 1])
+def test_assemble_to_file_matches_assemble_from_asm(script, tmp_path, monkeypatch, chunk_size):
+    plain, data, asm_path, encrypted = script
+    if chunk_size is not None:
+        # 小块写出，使指针回填跨越已写出的块
+        monkeypatch.setattr(disasm_ws2, "ASM_WRITE_CHUNK_SIZE", chunk_size)
+    out_path = tmp_path / "out.ws2"
+    disasm_ws2.assemble_to_file(asm_path, str(out_path), encrypt=encrypted)
+    expected = disasm_ws2.assemble_from_asm(asm_path)
+    if encrypted:
+        expected = disasm_ws2.encrypt_ws2(expected)
+    assert out_path.read_bytes() == expected == data
+
+HAND_EDITED_ASM = """解密后大小: 0
+loc_00000010: 06 (Jump) ["loc_00000005"]
+start:
+loc_00000020: 06 (Jump) ["start"]
+loc_00000005: 06 (Jump) ["loc_00000010"]
+loc_00000030: 02 (Jump2) ["loc_00000040"]
+loc_00000030: 06 (Jump) [1234]
+loc_10: 06 (Jump) ["loc_10"]
+loc_00000040: 06 (Jump) ["loc_00000030"]
+loc_00000005: 06 (Jump) ["missing"]
+loc_00000050: 06 (Jump) ["loc_00000099"]
+"""
+
+@pytest.mark.parametrize("encrypt", [False, True])
+def test_assemble_to_file_hand_edited_labels(tmp_path, capsys, encrypt):
+    # 手工编辑的汇编: 顺序颠倒、重复、非 loc_XXXXXXXX 形式和不存在的标签，以及字面值指针
+    asm_path = tmp_path / "edited.asm.txt"
+    asm_path.write_text(HAND_EDITED_ASM, encoding="utf-8")
+    expected = disasm_ws2.assemble_from_asm(str(asm_path))
+    expected_warnings = capsys.readouterr().out
+    out_path = tmp_path / "out.ws2"
+    disasm_ws2.assemble_to_file(str(asm_path), str(out_path), encrypt=encrypt)
+    assert out_path.read_bytes() == (disasm_ws2.encrypt_ws2(expected) if encrypt else expected)
+    assert sorted(capsys.readouterr().out.splitlines()) == sorted(expected_warnings.splitlines())
+    assert "loc_00000099" in expected_warnings
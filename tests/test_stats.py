@@ -0,0 +1,40 @@
+# 统计报告测试: 无签名 opcode 导致的 RAW 与被文件结尾截断的已知 opcode 分开统计。
+
+import disasm_ws2
+import ws2_bench
+import ws2_stats
+
+NO_SIGNATURE = next(op for op in range(256)
+                    if disasm_ws2.OPCODE_TABLE[op] is None and op not in disasm_ws2.SPECIAL_OPCODES)
+
+def report_for(*scripts):
+    report = ws2_stats.StatsReport()
+    for i, data in enumerate(scripts):
+        report.add(ws2_stats.scan_plaintext(data, f"{i}.ws2", "decrypted"))
+    return report
+
+def test_signature_less_opcode_is_raw():
+    plain = ws2_bench.generate_script(instructions=50, seed=1, dialogue=0.3)
+    stats = ws2_stats.scan_plaintext(plain + bytes([NO_SIGNATURE, 1, 2, 3]))
+    assert (stats.raw_offset, stats.raw_bytes, stats.raw_opcode) == (len(plain), 4, NO_SIGNATURE)
+    assert not stats.truncated and stats.truncated_opcode is None
+
+def test_truncated_known_opcode_is_not_signature_less():
+    plain = ws2_bench.generate_script(instructions=50, seed=2, dialogue=0.3)
+    # DisplayMessage (0x14) 只剩 opcode 和一个字节: RAW 区域后紧跟 EOF 记录
+    stats = ws2_stats.scan_plaintext(plain + b"\x14\x01")
+    assert (stats.raw_offset, stats.raw_bytes) == (len(plain), 2)
+    assert stats.raw_opcode is None
+    assert stats.truncated and stats.truncated_opcode == 0x14
+    row = ws2_stats.csv_row(stats)
+    assert (row["raw_opcode"], row["truncated_opcode"]) == ("", "14")
+
+def test_hotspot_kinds():
+    plain = ws2_bench.generate_script(instructions=50, seed=3, dialogue=0.3)
+    report = report_for(plain + bytes([NO_SIGNATURE]), plain + b"\x14", plain + b"\x14\x01\x02", plain + b"\x0F")
+    kinds = {(entry["kind"], entry["opcode"]): entry["files"] for entry in report.hotspots()}
+    assert kinds[("raw", f"{NO_SIGNATURE:02X}")] == 1
+    assert kinds[("truncated", "14")] == 2
+    # 特殊 opcode 被截断时只有 EOF 记录
+    assert kinds[("truncated", "0F")] == 1
+    assert not any(kind == "raw" and op != f"{NO_SIGNATURE:02X}" for kind, op in kinds)
@@ -0,0 +1,63 @@
+# 去重导出的字符串表测试: ID 冲突检测、已有译文保留和旧版 (48 位 ID) 表的译文沿用。
+
+import json
+
+import pytest
+
+import ws2_json_handler
+
+def read_table(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def test_dedup_entries_shares_identical_text():
+    entries = [{"name": "A", "message": "x"}, {"message": "x"}, {"message": "y"}]
+    refs, strings = ws2_json_handler.dedup_entries(entries)
+    assert refs[0]["message_id"] == refs[1]["message_id"] != refs[2]["message_id"]
+    assert len(strings) == 3
+    assert ws2_json_handler.resolve_entries(refs, strings) == entries
+
+def test_dedup_entries_rejects_id_collision(monkeypatch):
+    monkeypatch.setattr(ws2_json_handler, "text_id", lambda text: "tsame")
+    with pytest.raises(ValueError, match="tsame"):
+        ws2_json_handler.dedup_entries([{"message": "x"}, {"message": "y"}])
+
+def test_merge_strings_rejects_id_collision():
+    strings = ws2_json_handler.merge_strings({}, {"t1": "x"})
+    ws2_json_handler.merge_strings(strings, {"t1": "x", "t2": "y"})
+    assert strings == {"t1": "x", "t2": "y"}
+    with pytest.raises(ValueError):
+        ws2_json_handler.merge_strings(strings, {"t1": "z"})
+
+def test_write_string_table_keeps_translations_and_checks_sources(tmp_path):
+    path = str(tmp_path / "strings.json")
+    _, strings = ws2_json_handler.dedup_entries([{"message": "x"}, {"message": "y"}])
+    assert ws2_json_handler.write_string_table(path, strings) == 2
+    table = read_table(path)
+    sid = ws2_json_handler.text_id("x")
+    assert table["version"] == ws2_json_handler.STRING_TABLE_VERSION
+    assert table["sources"][sid] == "x"
+    # 翻译后重新导出: 译文保持不变，不新增
+    table["strings"][sid] = "译文"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    assert ws2_json_handler.write_string_table(path, strings) == 0
+    assert read_table(path)["strings"][sid] == "译文"
+    # 已有 ID 的原文不同: 报错且不改写表
+    before = read_table(path)
+    with pytest.raises(ValueError):
+        ws2_json_handler.write_string_table(path, {sid: "z"})
+    assert read_table(path) == before
+
+def test_write_string_table_reuses_legacy_translations(tmp_path):
+    path = str(tmp_path / "strings.json")
+    legacy = ws2_json_handler.legacy_text_id("x")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "strings": {legacy: "旧译文"}}, f, ensure_ascii=False)
+    _, strings = ws2_json_handler.dedup_entries([{"message": "x"}, {"message": "y"}])
+    assert ws2_json_handler.write_string_table(path, strings) == 2
+    table = read_table(path)
+    assert table["strings"][ws2_json_handler.text_id("x")] == "旧译文"
+    assert table["strings"][ws2_json_handler.text_id("y")] == "y"
+    # 旧 JSON 引用的旧 ID 仍可解析
+    assert table["strings"][legacy] == "旧译文"
@@ -0,0 +1,65 @@
+# UTF-16LE 字符串读取测试: find_string_terminator / BinaryReader.read_string_bytes
+# 与改为 find 整块搜索之前的逐字符循环结果一致。
+
+import random
+
+import pytest
+
+import disasm_ws2
+
+def legacy_read_string(data, start):
+    """原先的逐字符循环，返回 (字符串字节, 下一个偏移, 是否终止)"""
+    offset = start
+    terminated = False
+    while offset + 1 < len(data):
+        if data[offset] == 0 and data[offset + 1] == 0:
+            terminated = True
+            break
+        offset += 2
+    end = offset
+    if not terminated and offset + 1 == len(data):
+        end = offset = len(data)
+    raw = data[start:end]
+    if terminated:
+        offset += 2
+    return raw, offset, terminated
+
+def read_string(data, start):
+    reader = disasm_ws2.BinaryReader(data)
+    reader.offset = start
+    raw, raw_start, raw_end, terminated = reader.read_string_bytes()
+    assert (raw_start, raw_end) == (start, start + len(raw))
+    return raw, reader.offset, terminated
+
+@pytest.mark.parametrize("data, start, expected", [
+    (b"", 0, (b"", 0, False)),
+    (b"A\x00B\x00", 0, (b"A\x00B\x00", 4, False)),
+    (b"A\x00B", 0, (b"A\x00B", 3, False)),
+    (b"A", 0, (b"A", 1, False)),
+    (b"\x00\x00", 0, (b"", 2, True)),
+    (b"\x00", 0, (b"\x00", 1, False)),
+    # 00 00 落在奇数位置 (跨越 "A\x00" 与 "\x00B" 两个字符)，不是终止符
+    (b"A\x00\x00B\x00\x00", 0, (b"A\x00\x00B", 6, True)),
+    (b"A\x00\x00B", 0, (b"A\x00\x00B", 4, False)),
+    (b"A\x00\x00B\x00", 0, (b"A\x00\x00B\x00", 5, False)),
+    (b"\x00\x00\x00\x00", 1, (b"", 3, True)),
+    (b"XA\x00\x00\x00", 1, (b"A\x00", 5, True)),
+])
+def test_read_string_bytes_edges(data, start, expected):
+    assert read_string(data, start) == expected
+    assert legacy_read_string(data, start) == expected
+
+def test_terminator_skips_odd_offsets():
+    data = b"\x01\x00\x00\x02\x00\x00\x00"
+    assert disasm_ws2.find_string_terminator(data, 0) == 4
+    assert disasm_ws2.find_string_terminator(data, 1) == 1
+    assert disasm_ws2.find_string_terminator(b"\x01\x00\x00", 0) == -1
+
+@pytest.mark.parametrize("seed", range(8))
+def test_matches_legacy_loop_on_random_data(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        # 零字节较多，使终止符和奇数位置的 00 00 都经常出现
+        data = bytes(rng.choice((0, 0, 0, rng.randrange(256))) for _ in range(rng.randrange(0, 40)))
+        start = rng.randrange(0, len(data) + 1)
+        assert read_string(data, start) == legacy_read_string(data, start), (data.hex(), start)
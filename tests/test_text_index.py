@@ -0,0 +1,114 @@
+# 文本索引测试: 增量更新 (新增/未变化/修改/只改修改时间/删除)，FTS 与 LIKE 两种搜索路径的结果
+# 与直接提取文本记录后逐条匹配一致，目录只读时索引保存在用户缓存目录。
+
+import os
+import sqlite3
+
+import pytest
+
+import disasm_ws2
+import ws2_batch
+import ws2_bench
+import ws2_json_handler
+import ws2_text_index
+
+def write_script(path, seed, encrypted=False):
+    data = ws2_bench.generate_script(instructions=300, seed=seed, dialogue=0.4, choices=0.1)
+    if encrypted:
+        data = disasm_ws2.encrypt_ws2(data)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "game"
+    write_script(str(root / "a.ws2"), 1)
+    write_script(str(root / "b.ws2"), 2, encrypted=True)
+    write_script(str(root / "sub" / "c.ws2"), 3)
+    return str(root)
+
+def scan(root, query="", speaker=None, kind=None):
+    """逐文件提取文本记录后按 search 的规则匹配"""
+    hits = []
+    for file_path in disasm_ws2.find_ws2_files(root):
+        key = os.path.relpath(file_path, root).replace(os.sep, "/")
+        records, _ = ws2_json_handler.extract_text_records(file_path)
+        for r in records:
+            if not isinstance(r.text, str):
+                continue
+            if query and query not in r.text and query not in (r.speaker or ""):
+                continue
+            if speaker and r.speaker != speaker:
+                continue
+            if kind and r.kind != kind:
+                continue
+            hits.append(ws2_text_index.SearchHit(key, r.offset, r.entry_index, r.kind, r.speaker, r.text))
+    return sorted(hits)
+
+QUERIES = ["おはよう", "天気ですね", "待って", "Hello", "ね", "…", "%", "_", "見つからない文字列"]
+
+def test_incremental_update(corpus):
+    with ws2_text_index.TextIndex(corpus) as index:
+        assert index.path == os.path.join(corpus, ws2_text_index.TEXT_INDEX_NAME)
+        assert index.update() == (3, 0, 0, [])
+        assert index.update() == (0, 3, 0, [])
+
+        write_script(os.path.join(corpus, "a.ws2"), 10)
+        st = os.stat(os.path.join(corpus, "b.ws2"))
+        os.utime(os.path.join(corpus, "b.ws2"), ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        assert index.update() == (1, 2, 0, [])
+        assert index.search("", limit=10**6) == scan(corpus)
+
+        os.remove(os.path.join(corpus, "sub", "c.ws2"))
+        assert index.update() == (0, 2, 1, [])
+        assert index.search("", limit=10**6) == scan(corpus)
+
+    # 重新打开后沿用已有索引
+    with ws2_text_index.TextIndex(corpus) as index:
+        assert index.update() == (0, 2, 0, [])
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_scan(corpus, query):
+    with ws2_text_index.TextIndex(corpus) as index:
+        assert index.fts
+        index.update()
+        assert index.search(query, limit=10**6) == scan(corpus, query)
+
+def test_search_filters(corpus):
+    with ws2_text_index.TextIndex(corpus) as index:
+        index.update()
+        speakers = {hit.speaker for hit in index.search("", kind="message", limit=10**6)} - {None}
+        assert speakers
+        for speaker in sorted(speakers):
+            assert index.search("", speaker=speaker, limit=10**6) == scan(corpus, speaker=speaker)
+        for kind in ("name", "message", "choice"):
+            assert index.search("ね", kind=kind, limit=10**6) == scan(corpus, "ね", kind=kind)
+        assert len(index.search("", limit=5)) == 5
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_like_search_without_fts(corpus, query):
+    # 预先建好普通表，模拟不支持 FTS5 的 SQLite
+    conn = sqlite3.connect(os.path.join(corpus, ws2_text_index.TEXT_INDEX_NAME))
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT INTO meta VALUES ('version', ?)", (str(ws2_text_index.TEXT_INDEX_VERSION),))
+    conn.execute("CREATE TABLE entries (text TEXT, speaker TEXT, path TEXT, kind TEXT, offset INTEGER, entry_index INTEGER)")
+    conn.commit()
+    conn.close()
+    with ws2_text_index.TextIndex(corpus) as index:
+        assert not index.fts
+        index.update()
+        assert index.search(query, limit=10**6) == scan(corpus, query)
+
+def test_read_only_directory_uses_user_cache(corpus, tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache))
+    monkeypatch.setenv("LOCALAPPDATA", str(cache))
+    monkeypatch.setattr(ws2_batch, "_dir_database_writable", lambda root_dir, path: False)
+    with ws2_text_index.TextIndex(corpus) as index:
+        assert index.path.startswith(str(cache))
+        assert index.update() == (3, 0, 0, [])
+        assert index.search("おはよう", limit=10**6) == scan(corpus, "おはよう")
+    assert not os.path.exists(os.path.join(corpus, ws2_text_index.TEXT_INDEX_NAME))
+    with ws2_text_index.TextIndex(corpus) as index:
+        assert index.update() == (0, 3, 0, [])
@@ -0,0 +1,165 @@
+# 交叉引用与控制流分析测试: 手工构造脚本的基本块/交叉引用，合成脚本的块划分与跳转指针一致，
+# 跨文件调用按文件名或相对路径 (不区分大小写、可省略 .ws2) 解析，以及缓存的增量更新。
+
+import os
+import struct
+
+import pytest
+
+import disasm_ws2
+import ws2_batch
+import ws2_bench
+import ws2_xref
+
+def encode(opcode, args):
+    return disasm_ws2.encode_instruction(opcode, args)[0]
+
+def jump(target):
+    # 指针由汇编器回填，这里直接写入目标偏移
+    data, fixups = disasm_ws2.encode_instruction(0x06, [target])
+    data = bytearray(data)
+    for pos, _ in fixups:
+        struct.pack_into("<I", data, pos, target)
+    return bytes(data)
+
+NAME = encode(0x15, ["%LC太郎", "<M8>", 0])
+MESSAGE = encode(0x14, [1, "", "<M8>", "「おはよう」", "<M8>", 0])
+JUMP_SIZE = len(jump(0))
+FILE_END = encode(0xFF, [0, 0, 0, 0, 0])
+
+def test_hand_built_script():
+    # 0: 名字  1: 跳转到 3  2: 名字 (只能顺序执行到 3)  3: 消息  4: FileEnd
+    starts = [0, len(NAME), len(NAME) + JUMP_SIZE, 2 * len(NAME) + JUMP_SIZE]
+    data = NAME + jump(starts[3]) + NAME + MESSAGE + FILE_END
+    starts.append(starts[3] + len(MESSAGE))
+
+    analysis = ws2_xref.analyze_plaintext(data)
+    assert analysis.instructions == 5
+    assert analysis.xrefs == {starts[3]: [starts[1]]}
+    assert analysis.bad_targets == []
+    assert analysis.blocks == [
+        ws2_xref.BasicBlock(0, starts[2], 2, [starts[3]]),
+        ws2_xref.BasicBlock(starts[2], starts[3], 1, [starts[3]]),
+        ws2_xref.BasicBlock(starts[3], len(data), 2, []),
+    ]
+
+def test_bad_jump_target():
+    data = jump(3) + FILE_END
+    analysis = ws2_xref.analyze_plaintext(data)
+    assert analysis.xrefs == {}
+    assert analysis.bad_targets == [(0, 3)]
+
+@pytest.mark.parametrize("seed", range(4))
+def test_generated_script_blocks_and_xrefs(seed):
+    data = ws2_bench.generate_script(instructions=500, seed=seed, dialogue=0.3, choices=0.1, jumps=0.1)
+    instrs = [instr for instr in disasm_ws2.decode_instructions(data) if instr.opcode != "EOF"]
+    starts = [instr.offset for instr in instrs]
+    analysis = ws2_xref.analyze_plaintext(data)
+    assert analysis.instructions == len(instrs)
+
+    # 生成的指针都指向指令起点
+    expected = {}
+    for instr in instrs:
+        for target in ws2_xref.branch_targets(instr):
+            expected.setdefault(target, []).append(instr.offset)
+    assert expected
+    assert analysis.xrefs == expected
+    assert analysis.bad_targets == []
+
+    # 基本块首尾相接覆盖整个脚本，跳转目标和后继都是块起点
+    blocks = analysis.blocks
+    assert blocks[0].start == 0 and blocks[-1].end == len(data)
+    assert all(a.end == b.start for a, b in zip(blocks, blocks[1:]))
+    assert sum(b.count for b in blocks) == len(instrs)
+    block_starts = {b.start for b in blocks}
+    assert set(expected) <= block_starts
+    assert all(set(b.successors) <= block_starts for b in blocks)
+    assert all(b.start in starts for b in blocks)
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+@pytest.fixture
+def game(tmp_path):
+    root = tmp_path / "game"
+    data = ws2_bench.generate_script(instructions=200, seed=7, dialogue=0.3, choices=0.1, jumps=0.1)
+    write(str(root / "main.ws2"), disasm_ws2.encrypt_ws2(data))
+    # 按文件名 (大小写不同)、带 .ws2 的相对路径、反斜杠路径调用，以及不存在的脚本
+    calls = (encode(0x07, ["Route_A", ""]) + encode(0x04, ["sub/Route_B.ws2", ""])
+             + encode(0x04, ["SUB\\route_b", ""]) + encode(0x07, ["missing", ""]) + FILE_END)
+    write(str(root / "start.ws2"), calls)
+    write(str(root / "chapter" / "route_a.ws2"), MESSAGE + FILE_END)
+    write(str(root / "sub" / "route_b.ws2"), encode(0x07, ["route_a.ws2", ""]) + FILE_END)
+    return str(root), data
+
+def test_index_queries(game):
+    root, data = game
+    with ws2_xref.XrefIndex(root) as index:
+        assert index.update() == (4, 0, 0, [])
+        assert index.scripts() == ["chapter/route_a.ws2", "main.ws2", "start.ws2", "sub/route_b.ws2"]
+        analysis = index.analysis(os.path.join(root, "main.ws2"))
+        assert analysis == ws2_xref.analyze_plaintext(data)
+        assert index.analysis("main.ws2") is analysis
+        with pytest.raises(KeyError):
+            index.analysis("nothing.ws2")
+
+        target, sources = next(iter(analysis.xrefs.items()))
+        assert index.xrefs_to("main.ws2", target) == sources
+        assert index.xrefs_to("main.ws2", target + 1) == []
+        for block in analysis.blocks:
+            assert index.block_at("main.ws2", block.start) == block
+            assert index.block_at("main.ws2", block.end - 1) == block
+            for successor in block.successors:
+                assert block in index.predecessors("main.ws2", successor)
+        assert index.block_at("main.ws2", len(data)) is None
+
+def test_call_graph(game):
+    root, _ = game
+    with ws2_xref.XrefIndex(root) as index:
+        index.update()
+        graph = index.call_graph()
+        assert [(e.opcode, e.name, e.target) for e in graph["start.ws2"]] == [
+            (0x07, "Route_A", "chapter/route_a.ws2"),
+            (0x04, "sub/Route_B.ws2", "sub/route_b.ws2"),
+            (0x04, "SUB\\route_b", "sub/route_b.ws2"),
+            (0x07, "missing", None),
+        ]
+        assert [e.target for e in graph["sub/route_b.ws2"]] == ["chapter/route_a.ws2"]
+        assert graph["chapter/route_a.ws2"] == []
+        assert sorted(e.source for e in index.callers("chapter/route_a.ws2")) == ["start.ws2", "sub/route_b.ws2"]
+
+def test_incremental_update(game):
+    root, _ = game
+    with ws2_xref.XrefIndex(root) as index:
+        index.update()
+        assert index.update() == (0, 4, 0, [])
+        assert index.call_graph()["start.ws2"][-1].target is None
+
+        # 新增被调用的脚本、修改调用方、只改修改时间、删除
+        write(os.path.join(root, "Missing.ws2"), FILE_END)
+        write(os.path.join(root, "sub", "route_b.ws2"), encode(0x07, ["start", ""]) + FILE_END)
+        path = os.path.join(root, "main.ws2")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        os.remove(os.path.join(root, "chapter", "route_a.ws2"))
+        assert index.update() == (2, 2, 1, [])
+
+        graph = index.call_graph()
+        assert [e.target for e in graph["start.ws2"]] == [None, "sub/route_b.ws2", "sub/route_b.ws2", "Missing.ws2"]
+        assert [e.target for e in graph["sub/route_b.ws2"]] == ["start.ws2"]
+
+    with ws2_xref.XrefIndex(root) as index:
+        assert index.update() == (0, 4, 0, [])
+
+def test_read_only_directory_uses_user_cache(game, tmp_path, monkeypatch):
+    root, _ = game
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache))
+    monkeypatch.setenv("LOCALAPPDATA", str(cache))
+    monkeypatch.setattr(ws2_batch, "_dir_database_writable", lambda root_dir, path: False)
+    with ws2_xref.XrefIndex(root) as index:
+        assert index.path.startswith(str(cache))
+        assert index.update() == (4, 0, 0, [])
+    assert not os.path.exists(os.path.join(root, ws2_xref.XREF_CACHE_NAME))